@@ -0,0 +1,64 @@
+"""
+Бенчмарк аналитики удержания (src.analytics) на синтетических кейсах.
+
+Для каждого размера замеряет сборку колонок из строк курсора (CaseTimeline.from_columns) и расчёт
+отчёта — кривые удержания когорт, отток по типам предложений и LTV (build_report).
+
+    python -m benchmarks.bench_analytics --sizes 100000 1000000 5000000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from src.analytics import CaseTimeline, build_report
+
+OFFER_TYPES = ["Скидка 10%", "Скидка 25%", "Бесплатный месяц", "Апгрейд тарифа", "Бонусные баллы", "Не указано"]
+
+# Январь 2021 — декабрь 2025 в ключах месяцев
+FIRST_MONTH = 2021 * 12
+MONTHS = 60
+
+
+def make_rows(cases: int, seed: int = 1) -> list:
+    """Колонки в том виде, в каком их отдаёт курсор: списки Python-значений."""
+    rng = np.random.default_rng(seed)
+    contracts = max(cases // 3, 1)
+
+    return [
+        [f"SYN{code:010d}" for code in rng.integers(0, contracts, cases)],
+        (FIRST_MONTH + rng.integers(0, MONTHS, cases)).tolist(),
+        (rng.random(cases) < 0.35).astype(int).tolist(),
+        np.round(rng.lognormal(7, 0.8, cases), 2).tolist(),
+        np.array(OFFER_TYPES)[rng.integers(0, len(OFFER_TYPES), cases)].tolist(),
+        np.round(rng.uniform(0, 500, cases), 2).tolist(),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="повторов на размер, в отчёт идёт медиана")
+    args = parser.parse_args()
+
+    print(f"{'Кейсов':>9} {'columns':>10} {'report':>10}   (медиана, мс)")
+
+    for cases in args.sizes:
+        rows = make_rows(cases)
+        columns, report = [], []
+
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            timeline = CaseTimeline.from_columns(*rows)
+            columns.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            build_report(timeline, FIRST_MONTH + MONTHS - 1)
+            report.append(time.perf_counter() - started)
+
+        print(f"{cases:>9} {statistics.median(columns) * 1000:>10.1f} {statistics.median(report) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Бенчмарк колбэков дашборда на синтетических данных dcc.Store.
+
+Для каждого размера (по умолчанию 1k → 1M строк) замеряет этапы построения представления —
+восстановление DataFrame, фильтрацию, агрегацию KPI, построение и сериализацию графиков, —
+а также колбэки всех блоков дашборда подряд (с пустым и с прогретым кэшем графиков). Результаты дописываются в JSONL-историю; медианы сравниваются
+с предыдущим прогоном, рост больше --threshold считается регрессией.
+
+    python -m benchmarks.bench_dashboard --sizes 1000 10000 100000 1000000
+    python -m benchmarks.bench_dashboard --fail-on-regression   # для CI: код возврата 1 при регрессии
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from plotly.utils import PlotlyJSONEncoder
+
+from src.dashboard import dash_app, dataset, figures as dashboard_figures
+
+DEFAULT_HISTORY = Path(__file__).parent / "results" / "bench_dashboard.jsonl"
+
+BLOCK_CALLBACKS = [
+    dash_app.update_kpis,
+    dash_app.update_revenue_graph,
+    dash_app.update_pie_charts,
+    dash_app.update_profit_histogram,
+    dash_app.update_profit_scatter,
+]
+
+OFFER_TYPES = ["Скидка 10%", "Скидка 25%", "Бесплатный месяц", "Апгрейд тарифа", "Бонусные баллы", "Не указано"]
+
+
+def make_store(rows: int, seed: int = 1) -> dict:
+    """Payload в формате load_data_and_store (Dataset.store_payload) из синтетических агрегатов."""
+    rng = np.random.default_rng(seed)
+
+    months = pd.period_range("2021-01", "2025-12", freq="M").astype(str).to_numpy()
+    income = np.round(rng.lognormal(9, 1, rows), 2)
+    expenses = np.round(income * rng.uniform(0.05, 0.6, rows), 2)
+
+    df = pd.DataFrame({
+        'Дата': months[rng.integers(0, len(months), rows)],
+        'Тип предложения удержания': np.array(OFFER_TYPES)[rng.integers(0, len(OFFER_TYPES), rows)],
+        'Доход': income,
+        'Расходы': expenses,
+        'Ушло клиентов': rng.integers(0, 50, rows),
+        'Клиентов удержано': rng.integers(0, 80, rows),
+    })
+    df['Прибыль'] = df['Доход'] - df['Расходы']
+
+    return dataset.make_store_payload(dataset.prepare_frame(df))
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run_once(store: dict, period_level, period_value, selected_types) -> dict:
+    timings = {}
+
+    df, timings['frame'] = timed(dataset.frame_from_store, store)
+
+    started = time.perf_counter()
+    df_final = dataset.filter_data_by_period(df, period_level, period_value)
+    df_final = dataset.filter_by_types(df_final, selected_types)
+    timings['filter'] = time.perf_counter() - started
+
+    kpis, timings['aggregate'] = timed(dataset.compute_kpis, df_final)
+    figures, timings['figures'] = timed(dashboard_figures.build_figures, df_final)
+
+    started = time.perf_counter()
+    json.loads(json.dumps({'kpis': kpis, 'figures': figures}, cls=PlotlyJSONEncoder))
+    timings['serialize'] = time.perf_counter() - started
+
+    # Колбэки всех блоков, как их вызывает Dash после изменения фильтра: с пустым кэшем графиков
+    # (представление строит первый колбэк) и повторно для того же представления
+    dash_app.FIGURE_CACHE.clear()
+    _, timings['update_blocks'] = timed(run_blocks, store, period_level, period_value, selected_types)
+    _, timings['blocks_cached'] = timed(run_blocks, store, period_level, period_value, selected_types)
+
+    return timings
+
+
+def run_blocks(store: dict, period_level, period_value, selected_types):
+    for block_callback in BLOCK_CALLBACKS:
+        block_callback(store, period_level, period_value, selected_types)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_previous(history: Path) -> dict:
+    """Последний записанный прогон по каждому размеру: {rows: {этап: медиана}}."""
+    previous = {}
+    if not history.exists():
+        return previous
+
+    with history.open(encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                previous[entry["rows"]] = entry["median"]
+
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5, help="повторов на размер, в отчёт идёт медиана")
+    parser.add_argument("--period-level", default="quarter", choices=["year", "quarter", "month", "none"])
+    parser.add_argument("--period-value", default="2024Q2")
+    parser.add_argument("--types", nargs="*", default=OFFER_TYPES[:3], help="выбранные типы предложений")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSONL-файл с историей прогонов")
+    parser.add_argument("--no-save", action="store_true", help="не дописывать результат в историю")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимый рост медианы относительно прошлого прогона")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    period_level = None if args.period_level == "none" else args.period_level
+    period_value = args.period_value if period_level else None
+
+    previous = load_previous(args.history)
+    revision = git_revision()
+    regressions = []
+
+    stages = ['frame', 'filter', 'aggregate', 'figures', 'serialize', 'update_blocks', 'blocks_cached']
+    print(f"{'Строк':>9} " + " ".join(f"{s:>15}" for s in stages) + "   (медиана, мс)")
+
+    for rows in args.sizes:
+        store = make_store(rows)
+
+        # Первый прогон прогревает plotly/pandas и в статистику не идёт
+        run_once(store, period_level, period_value, args.types)
+        runs = [run_once(store, period_level, period_value, args.types) for _ in range(args.repeat)]
+        median = {stage: statistics.median(run[stage] for run in runs) for stage in stages}
+
+        line = f"{rows:>9} "
+        for stage in stages:
+            cell = f"{median[stage] * 1000:.1f}"
+
+            before = previous.get(rows, {}).get(stage)
+            if before:
+                change = median[stage] / before - 1
+                cell += f" ({change:+.0%})"
+                if change > args.threshold:
+                    regressions.append((rows, stage, before, median[stage]))
+
+            line += f" {cell:>15}"
+        print(line)
+
+        if not args.no_save:
+            args.history.parent.mkdir(parents=True, exist_ok=True)
+            with args.history.open("a", encoding="utf-8") as file:
+                file.write(json.dumps({
+                    "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                    "revision": revision,
+                    "python": platform.python_version(),
+                    "pandas": pd.__version__,
+                    "plotly": plotly.__version__,
+                    "rows": rows,
+                    "repeat": args.repeat,
+                    "filters": [period_level, period_value, args.types],
+                    "median": median,
+                    "min": {stage: min(run[stage] for run in runs) for stage in stages},
+                }, ensure_ascii=False) + "\n")
+
+    if regressions:
+        print(f"\nРегрессии (рост больше {args.threshold:.0%}):")
+        for rows, stage, before, after in regressions:
+            print(f"  {rows} строк, {stage}: {before * 1000:.1f} → {after * 1000:.1f} мс")
+
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Микробенчмарк отображения строк БД в модели.
+
+Сравнивает прежнюю схему (DictCursor + класс с __dict__ + Contract(*row.values()))
+с текущей (кортежи обычного курсора + dataclass(slots=True) + Contract(*row)).
+
+    python -m benchmarks.bench_models --rows 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from decimal import Decimal
+
+from src.models import Contract
+from src.repositories.contract_repository import CONTRACT_COLUMNS
+
+
+class LegacyContract:
+    # Копия модели до перехода на __slots__ — только для сравнения
+    def __init__(self, contract_id, client_telegram_id, last_name, first_name, middle_name,
+                 email, phone, can_be_retained, monthly_profit, active):
+        self.contract_id = contract_id
+        self.client_telegram_id = client_telegram_id
+        self.last_name = last_name
+        self.first_name = first_name
+        self.middle_name = middle_name
+        self.email = email
+        self.phone = phone
+        self.can_be_retained = can_be_retained
+        self.monthly_profit = monthly_profit
+        self.active = active
+
+
+def make_rows(n: int):
+    profit = Decimal("1499.90")
+    return [
+        (f"C{i:09d}", 100000 + i, "Иванов", "Иван", "Иванович", f"user{i}@mail.ru", "+79990000000", 1, profit, 1)
+        for i in range(n)
+    ]
+
+
+def measure(label: str, build, rows):
+    gc.collect()
+    started = time.perf_counter()
+    models = build(rows)
+    elapsed = time.perf_counter() - started
+    del models
+
+    gc.collect()
+    tracemalloc.start()
+    models = build(rows)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+
+    print(f"{label:<40} {elapsed:8.3f} s   {retained / 2 ** 20:8.1f} MiB")
+    return elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    columns = [c.strip() for c in CONTRACT_COLUMNS.split(",")]
+    rows = make_rows(args.rows)
+
+    print(f"Строк: {args.rows}\n")
+    print(f"{'Вариант':<40} {'Время':>10}   {'Память':>12}")
+
+    # Прежний путь: DictCursor строил словарь на каждую строку, модель собиралась из .values()
+    legacy_time, legacy_mem = measure(
+        "dict-строки + __dict__ модель",
+        lambda rs: [LegacyContract(*dict(zip(columns, r)).values()) for r in rs],
+        rows
+    )
+    slots_time, slots_mem = measure(
+        "кортежи + dataclass(slots=True)",
+        lambda rs: [Contract(*r) for r in rs],
+        rows
+    )
+
+    print(f"\nУскорение: x{legacy_time / slots_time:.2f}, экономия памяти: x{legacy_mem / slots_mem:.2f}")
+
+
+if __name__ == "__main__":
+    main()
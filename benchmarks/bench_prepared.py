@@ -0,0 +1,106 @@
+"""
+Сравнение задержки горячих запросов репозиториев: обычный текстовый протокол
+против подготовленных на сервере запросов (PREPARE один раз на соединение пула).
+
+Нужна доступная MySQL из настроек .env с заполненными таблицами.
+
+    python -m benchmarks.bench_prepared --iterations 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from src.config import Settings
+from src.repositories import Database, Repositories, create_shard_router
+
+
+async def sample_keys(repos: Repositories):
+    async with repos.database:
+        user = await repos.database.select_one("SELECT telegram_id FROM users LIMIT 1")
+
+    # contracts и retention_cases — на шардах; берём ключи с первого
+    async with repos.shards.shards[0] as shard:
+        contract = await shard.select_one("SELECT client_telegram_id FROM contracts LIMIT 1")
+        case = await shard.select_one("SELECT case_id FROM retention_cases LIMIT 1")
+
+    return (
+        user[0] if user else 0,
+        contract[0] if contract else 0,
+        case[0] if case else 0,
+    )
+
+
+async def run_variant(prepared: bool, iterations: int):
+    settings = Settings()
+    settings.db_prepared_statements = prepared
+
+    database = Database(settings)
+    repos = Repositories(database, create_shard_router(settings, database))
+    await database.open_pool()
+    await repos.shards.open_pool()
+
+    try:
+        user_id, client_id, case_id = await sample_keys(repos)
+        case = None
+        if case_id:
+            async with database:
+                case = await repos.cases.get_one(case_id)
+
+        calls = {
+            "contracts.get_by_client_telegram_id": lambda: repos.contracts.get_by_client_telegram_id(client_id),
+            "users.get_one": lambda: repos.users.get_one(user_id),
+            "cases.get_one": lambda: repos.cases.get_one(case_id),
+        }
+        if case is not None:
+            # Перезапись кейса теми же значениями — запрос честно выполняется, данные не меняются
+            calls["cases.update"] = lambda: repos.cases.update(case)
+
+        results = {}
+        async with database:
+            for name, call in calls.items():
+                # Прогрев: PREPARE выполняется на первом вызове и в замеры не попадает
+                await call()
+
+                timings = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    await call()
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                results[name] = timings
+
+        return results
+    finally:
+        await repos.shards.close()
+        await database.close()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def main_async(iterations: int):
+    text = await run_variant(False, iterations)
+    prepared = await run_variant(True, iterations)
+
+    print(f"{'Запрос':<38} {'вариант':<10} {'mean, мс':>9} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for name in text:
+        for label, timings in (("текст", text[name]), ("prepared", prepared[name])):
+            print(
+                f"{name:<38} {label:<10} {statistics.fmean(timings):9.3f} "
+                f"{percentile(timings, 0.5):7.3f} {percentile(timings, 0.95):7.3f} {percentile(timings, 0.99):7.3f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Бенчмарк запуска бота: время от старта интерпретатора до готового диспетчера aiogram.
+
+Каждый прогон — отдельный процесс Python (холодные импорты, как при перезапуске или выкладке).
+Замеряются импорт модулей точки входа и сборка TelegramApp + Bot + Dispatcher без обращения к сети;
+заодно проверяется, что тяжёлые модули дашборда и Selenium не импортируются, а Chrome не запускается.
+
+Нижняя граница — импорт самого aiogram (aiogram.types тянет все методы Bot API): около 3.5–4 с из ~4–4.6 с
+до готового диспетчера на машине разработки. Поэтому бюджет задаётся как надбавка проекта к этому полу
+(--overhead-budget, по умолчанию 1 с): регрессия ленивых импортов видна независимо от скорости машины.
+
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --entry src.main --budget 5.0   # ещё и абсолютный бюджет
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Модули, которые не должны попадать в процесс бота до первого запроса, которому они нужны
+HEAVY_MODULES = ["dash", "plotly.express", "pandas", "selenium", "pyarrow", "src.dashboard.dash_app"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+
+import {entry}
+from src.config import Settings
+from src.repositories import Database, Repositories
+from src.services import DashboardScreenshotService
+from src.telegram.tg_app import TelegramApp
+imported = time.perf_counter()
+
+settings = Settings()
+settings.telegram_bot_token = "123456:startup-benchmark"
+screenshot_service = DashboardScreenshotService(settings.dashboard_url)
+app = TelegramApp(Repositories(Database(settings)), screenshot_service, settings)
+app.create_bot()
+app.create_dispatcher()
+ready = time.perf_counter()
+
+print(json.dumps({{
+    "import": imported - started,
+    "ready": ready - started,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+    "chrome": screenshot_service._driver is not None,
+}}))
+"""
+
+# Пол: только то, без чего бота на aiogram не собрать
+FLOOR_PROBE = """
+import json, time
+started = time.perf_counter()
+
+import aiogram.types
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.context import FSMContext
+
+print(json.dumps({"ready": time.perf_counter() - started}))
+"""
+
+
+def probe(code: str) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", default="src.supervisor.components",
+                        help="модуль точки входа бота (src.supervisor.components или src.main)")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов, в отчёт идёт медиана")
+    parser.add_argument("--overhead-budget", type=float, default=1.0,
+                        help="допустимая медиана сверх импорта aiogram, с; превышение — код возврата 1")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="допустимая медиана до готового диспетчера, с; превышение — код возврата 1")
+    args = parser.parse_args()
+
+    code = PROBE.format(entry=args.entry, heavy=HEAVY_MODULES)
+
+    # Первый прогон только прогревает кэш байткода (__pycache__) и не учитывается
+    probe(code)
+    probe(FLOOR_PROBE)
+    # Прогоны бота и пола чередуются: фоновая нагрузка машины сказывается на обоих одинаково
+    runs, floors = [], []
+    for _ in range(args.repeat):
+        runs.append(probe(code))
+        floors.append(probe(FLOOR_PROBE)["ready"])
+    floor = statistics.median(floors)
+    overhead = statistics.median(run["ready"] - floor_ready for run, floor_ready in zip(runs, floors))
+
+    print(f"{'Этап':>10} {'медиана, мс':>12} {'макс, мс':>10}")
+    for stage in ("import", "ready", "process"):
+        values = [run[stage] for run in runs]
+        print(f"{stage:>10} {statistics.median(values) * 1000:>12.1f} {max(values) * 1000:>10.1f}")
+
+    ready = statistics.median(run["ready"] for run in runs)
+    print(f"{'aiogram':>10} {floor * 1000:>12.1f}    (пол: импорт aiogram)")
+    print(f"{'сверх':>10} {overhead * 1000:>12.1f}")
+
+    failed = False
+
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    if heavy:
+        print(f"Тяжёлые модули импортированы при запуске бота: {', '.join(heavy)}")
+        failed = True
+
+    if any(run["chrome"] for run in runs):
+        print("Chrome запущен при создании сервиса скриншотов")
+        failed = True
+
+    if overhead > args.overhead_budget:
+        print(f"Запуск сверх импорта aiogram {overhead:.3f} с превышает бюджет {args.overhead_budget:.3f} с")
+        failed = True
+
+    if args.budget is not None and ready > args.budget:
+        print(f"Медиана запуска {ready:.3f} с превышает бюджет {args.budget:.3f} с")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Нагрузочный прогон клиентского сценария бота без сети.
+
+Настоящие роутеры и middleware (TelegramApp.create_dispatcher) получают апдейты через
+Dispatcher.feed_update, бот работает на фейковой сессии, данные — в MySQL из настроек .env.
+Каждый виртуальный клиент проходит /start → «Отказаться от услуг» → причина → принять/отказаться.
+
+    python -m benchmarks.load_test --users 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import random
+import statistics
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Update, Message, Chat, User as TgUser, CallbackQuery
+
+from src.config import Settings
+from src.metrics import REGISTRY
+from src.models import Contract, Offer
+from src.repositories import Database, Repositories, create_shard_router, ensure_schema
+from src.telegram.tg_app import TelegramApp
+
+# Синтетические клиенты живут в отдельном диапазоне Telegram ID и помечены префиксом контракта
+CLIENT_ID_BASE = 9_000_000_000
+CONTRACT_PREFIX = "LT"
+OFFER_TYPE_PREFIX = "LOADTEST"
+
+REASONS = [
+    "Дорого",
+    "Переезжаю в другой город",
+    "Нашёл тариф дешевле у конкурента",
+    "Плохое качество связи",
+    "Не пользуюсь услугой",
+]
+
+
+class FakeSession(BaseSession):
+    """Сессия бота без сети: отвечает на методы Telegram API заглушками с заданной задержкой."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.requests = 0
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method, timeout=None):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method.__returning__ is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.datetime.now(),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                text=getattr(method, "text", None)
+            )
+
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class VirtualClient:
+    def __init__(self, index: int, decline: bool, rng: random.Random):
+        self.telegram_id = CLIENT_ID_BASE + index
+        self.decline = decline
+        self.reason = rng.choice(REASONS)
+
+        self._user = TgUser(id=self.telegram_id, is_bot=False, first_name=f"Load{index}")
+        self._chat = Chat(id=self.telegram_id, type="private")
+
+    def message(self, update_id: int, text: str) -> Update:
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id,
+            date=datetime.datetime.now(),
+            chat=self._chat,
+            from_user=self._user,
+            text=text
+        ))
+
+    def callback(self, update_id: int, data: str) -> Update:
+        return Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id),
+            from_user=self._user,
+            chat_instance=str(self.telegram_id),
+            data=data,
+            message=Message(
+                message_id=update_id,
+                date=datetime.datetime.now(),
+                chat=self._chat,
+                text="Вы согласны принять это предложение?"
+            )
+        ))
+
+
+async def seed(repos: Repositories, users: int, rng: random.Random):
+    # Таблицы на primary и на каждом шарде — как при старте бота
+    await ensure_schema(repos)
+
+    async with repos.database:
+        offers = [o for o in await repos.offers.get_all() if o.offer_type.startswith(OFFER_TYPE_PREFIX)]
+        if not offers:
+            for name, threshold, cost in (("скидка 10%", 0, 150), ("бесплатный месяц", 500, 900), ("апгрейд тарифа", 1500, 400)):
+                await repos.offers.insert(Offer(0, f"{OFFER_TYPE_PREFIX} {name}", "Синтетический оффер нагрузочного теста",
+                                                threshold, cost))
+
+        for i in range(users):
+            contract_id = f"{CONTRACT_PREFIX}{i:08d}"
+            contract = Contract(
+                contract_id, CLIENT_ID_BASE + i, "Тестов", "Тест", "Тестович",
+                f"load{i}@example.com", "+70000000000", True,
+                Decimal(rng.randrange(300, 5000)), True
+            )
+
+            if await repos.contracts.get_one(contract_id) is None:
+                await repos.contracts.insert(contract)
+            else:
+                await repos.contracts.update(contract)
+
+
+async def cleanup(repos: Repositories):
+    async def cleanup_shard(shard):
+        await shard.execute("DELETE FROM retention_cases WHERE contract_id LIKE %s", f"{CONTRACT_PREFIX}%")
+        await shard.execute("DELETE FROM contracts WHERE contract_id LIKE %s", f"{CONTRACT_PREFIX}%")
+
+    async with repos.database:
+        await repos.shards.each(cleanup_shard)
+        await repos.database.execute("DELETE FROM client_contracts WHERE contract_id LIKE %s", f"{CONTRACT_PREFIX}%")
+        await repos.database.execute("DELETE FROM users WHERE telegram_id >= %s", CLIENT_ID_BASE)
+        # Синтетические офферы с нулевым порогом иначе предлагались бы настоящим клиентам
+        await repos.database.execute("DELETE FROM offers WHERE offer_type LIKE %s", f"{OFFER_TYPE_PREFIX}%")
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+
+    settings = Settings()
+    database = Database(settings)
+    repos = Repositories(database, create_shard_router(settings, database))
+    await database.open_pool()
+    await repos.shards.open_pool()
+
+    try:
+        print(f"Подготовка данных для {args.users} клиентов...")
+        await seed(repos, args.users, rng)
+
+        app = TelegramApp(repos, None, settings)
+        session = FakeSession(args.api_latency / 1000)
+        bot = app.create_bot(session)
+        dp = app.create_dispatcher()
+
+        update_ids = itertools.count(1)
+        timings: Dict[str, List[float]] = defaultdict(list)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def step(name: str, update: Update):
+            started = time.perf_counter()
+            await dp.feed_update(bot, update)
+            timings[name].append(time.perf_counter() - started)
+
+        async def scenario(client: VirtualClient):
+            async with semaphore:
+                started = time.perf_counter()
+
+                await step("/start", client.message(next(update_ids), "/start"))
+                await step("Отказаться от услуг", client.message(next(update_ids), "Отказаться от услуг"))
+                await step("причина", client.message(next(update_ids), client.reason))
+                await step("решение по офферу", client.callback(next(update_ids), "decline" if client.decline else "accept"))
+
+                timings["весь сценарий"].append(time.perf_counter() - started)
+
+        clients = [VirtualClient(i, rng.random() < args.decline_ratio, rng) for i in range(args.users)]
+
+        print(f"Прогон: {args.users} клиентов, параллельно {args.concurrency}...")
+        started = time.perf_counter()
+        await asyncio.gather(*(scenario(client) for client in clients))
+        elapsed = time.perf_counter() - started
+
+        updates = sum(len(v) for k, v in timings.items() if k != "весь сценарий")
+        print(f"\nВремя: {elapsed:.2f} с, сценариев/с: {args.users / elapsed:.1f}, апдейтов/с: {updates / elapsed:.1f}, "
+              f"запросов к API: {session.requests}\n")
+
+        print(f"{'Шаг':<22} {'mean, мс':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for name, values in timings.items():
+            ms = [v * 1000 for v in values]
+            print(f"{name:<22} {statistics.fmean(ms):9.1f} {percentile(ms, 0.5):8.1f} {percentile(ms, 0.95):8.1f} "
+                  f"{percentile(ms, 0.99):8.1f} {max(ms):8.1f}")
+
+        if args.metrics:
+            print("\n" + REGISTRY.render())
+    finally:
+        if not args.keep_data:
+            await cleanup(repos)
+
+        await repos.shards.close()
+        await database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="количество виртуальных клиентов")
+    parser.add_argument("--concurrency", type=int, default=100, help="сколько клиентов проходят сценарий одновременно")
+    parser.add_argument("--decline-ratio", type=float, default=0.4, help="доля клиентов, отклоняющих оффер")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="имитация задержки Telegram API, мс")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-data", action="store_true",
+                        help="не удалять синтетические данные после прогона (офферы LOADTEST останутся доступны клиентам)")
+    parser.add_argument("--metrics", action="store_true", help="вывести метрики обработчиков и запросов к БД")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
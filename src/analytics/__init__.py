@@ -0,0 +1,5 @@
+from src.analytics.timeline import CaseTimeline, load_case_timeline
+from src.analytics.cohorts import AnalyticsReport, build_report, churn_by_offer, cohort_retention, estimate_ltv, \
+    month_label
+from src.analytics.cache import ReportCache
+from src.analytics.reasons import ReasonIndex, load_new_reasons
\ No newline at end of file
@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from src.analytics.cohorts import AnalyticsReport, build_report
+from src.analytics.timeline import CaseTimeline
+from src.models import current_month
+
+
+class ReportCache:
+    """
+    Последний отчёт аналитики, общий для всех сессий дашборда.
+
+    Отчёт считается на календарный месяц и пересчитывается, только если сменился месяц или
+    водяной знак БД (watermark() — тот же дешёвый запрос, что у агрегата дашборда), и не чаще
+    раза в max_age секунд: полная выборка кейсов тяжелее помесячного агрегата.
+    builder(timeline, month, watermark) строит отчёт — по умолчанию build_report в текущем процессе.
+    """
+
+    def __init__(self, loader: Callable[[], Optional[CaseTimeline]], max_age: float = 600,
+                 watermark: Optional[Callable[[], tuple]] = None,
+                 builder: Callable[..., Optional[AnalyticsReport]] = build_report):
+        self._loader = loader
+        self._watermark = watermark
+        self._builder = builder
+        self.max_age = max_age
+
+        self._report: Optional[AnalyticsReport] = None
+        self._month: Optional[int] = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[AnalyticsReport]:
+        if self._fresh():
+            return self._report
+
+        with self._lock:
+            if not self._fresh():
+                self._refresh()
+
+        return self._report
+
+    def invalidate(self):
+        self._checked_at = float('-inf')
+        self._month = None
+
+    def _fresh(self) -> bool:
+        return self._month == current_month() and time.monotonic() - self._checked_at < self.max_age
+
+    def _refresh(self):
+        month = current_month()
+
+        watermark = None
+        if self._watermark is not None:
+            try:
+                watermark = self._watermark()
+            except Exception as e:
+                print(f"Ошибка при чтении водяного знака для аналитики: {e}")
+
+        report = self._report
+        if (report is not None and self._month == month and watermark is not None
+                and watermark == report.watermark):
+            self._checked_at = time.monotonic()
+            return
+
+        try:
+            self._report = self._builder(self._loader(), month, watermark)
+        except Exception as e:
+            print(f"Ошибка при расчёте аналитики удержания: {e}")
+
+        self._month = month
+        self._checked_at = time.monotonic()
@@ -0,0 +1,191 @@
+"""
+Когортный анализ, отток и LTV по завершённым кейсам удержания.
+
+Все расчёты идут по колонкам CaseTimeline целиком (bincount, ufunc.at, cumsum) без группировок
+в Python, поэтому миллионы кейсов обрабатываются за секунды. Месяцы — целочисленные ключи
+year*12 + (month-1), как в агрегате дашборда.
+
+Когорта контракта — месяц его первого завершённого кейса (первого контакта с удержанием).
+Контракт «жив», пока у него нет кейса со статусом churned; удержание когорты на возрасте k —
+доля контрактов, не ушедших к концу k-го месяца после входа в когорту.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.timeline import CaseTimeline
+
+# Маркер «не ушёл»: больше любого реального ключа месяца
+NEVER = np.iinfo(np.int32).max
+
+# Ожидаемое время жизни ограничено: при почти нулевом оттоке LTV иначе уходит в бесконечность
+MAX_LIFETIME = 120
+
+
+def month_label(key: int) -> str:
+    return f"{key // 12}-{key % 12 + 1:02d}"
+
+
+def contract_months(timeline: CaseTimeline):
+    """Для каждого контракта: месяц первого кейса (когорта) и месяц ухода (NEVER, если не ушёл)."""
+    first = np.full(timeline.contracts, NEVER, dtype=np.int32)
+    np.minimum.at(first, timeline.contract, timeline.month)
+
+    churn = np.full(timeline.contracts, NEVER, dtype=np.int32)
+    np.minimum.at(churn, timeline.contract[timeline.churned], timeline.month[timeline.churned])
+
+    return first, churn
+
+
+def cohort_retention(timeline: CaseTimeline, now: int, first=None, churn=None) -> pd.DataFrame:
+    """
+    Кривые удержания когорт: строки — когорты (ключ месяца), колонки — возраст в месяцах 0..N,
+    значения — доля оставшихся контрактов. Возрасты, до которых когорта ещё не дожила, — NaN.
+    Колонка 'size' — число контрактов в когорте.
+    """
+    if first is None or churn is None:
+        first, churn = contract_months(timeline)
+
+    lo = int(first.min())
+    cohort = first - lo
+    cohorts = now - lo + 1
+    ages = cohorts
+
+    size = np.bincount(cohort, minlength=cohorts)
+
+    # Уходы по (когорта, возраст) одним bincount по плоскому индексу
+    gone = churn != NEVER
+    age = np.minimum(churn[gone] - first[gone], ages - 1)
+    churned = np.bincount(cohort[gone] * ages + age, minlength=cohorts * ages).reshape(cohorts, ages)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retention = 1 - np.cumsum(churned, axis=1) / size[:, None]
+
+    # Правое цензурирование: когорта месяца c видна только до возраста now - c
+    observed = np.arange(ages)[None, :] <= (now - lo - np.arange(cohorts))[:, None]
+    retention = np.where(observed & (size[:, None] > 0), retention, np.nan)
+
+    frame = pd.DataFrame(retention, index=pd.Index(np.arange(lo, now + 1), name='cohort'))
+    frame['size'] = size
+    return frame[frame['size'] > 0]
+
+
+def churn_by_offer(timeline: CaseTimeline) -> pd.DataFrame:
+    """Кейсы, уходы и доля оттока по типам предложений."""
+    types = len(timeline.offer_types)
+    cases = np.bincount(timeline.offer, minlength=types)
+    churned = np.bincount(timeline.offer, weights=timeline.churned, minlength=types)
+
+    frame = pd.DataFrame({
+        'offer_type': timeline.offer_types,
+        'cases': cases,
+        'churned': churned.astype(np.int64),
+        'retained': cases - churned.astype(np.int64),
+    })
+    frame['churn_rate'] = frame['churned'] / frame['cases'].where(frame['cases'] > 0)
+    return frame
+
+
+def lifetime(events, exposure) -> np.ndarray:
+    """Ожидаемая жизнь в месяцах при постоянном месячном риске ухода: exposure / events (оценка МП)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        months = np.asarray(exposure, dtype=np.float64) / np.asarray(events, dtype=np.float64)
+
+    return np.minimum(np.nan_to_num(months, nan=MAX_LIFETIME, posinf=MAX_LIFETIME), MAX_LIFETIME)
+
+
+def estimate_ltv(timeline: CaseTimeline, now: int, first=None, churn=None):
+    """
+    LTV удержанного клиента по типам предложений и общий LTV контракта.
+
+    По типу предложения: для каждого удержания считается время до последующего ухода контракта
+    (или до текущего месяца, если он не ушёл). Месячный риск ухода — уходы / месяцы наблюдения,
+    LTV = средняя месячная прибыль удержанных * ожидаемая жизнь - средняя стоимость предложения.
+    """
+    if first is None or churn is None:
+        first, churn = contract_months(timeline)
+
+    types = len(timeline.offer_types)
+    retained = ~timeline.churned
+
+    offer = timeline.offer[retained]
+    month = timeline.month[retained]
+    until = churn[timeline.contract[retained]]
+
+    # Уход раньше удержания означает возврат ушедшего клиента — такие удержания не учитываются
+    valid = until >= month
+    offer, month, until = offer[valid], month[valid], until[valid]
+
+    event = until != NEVER
+    exposure = np.maximum(np.where(event, until, now) - month, 1)
+
+    counts = np.bincount(offer, minlength=types)
+    months = lifetime(np.bincount(offer, weights=event, minlength=types),
+                      np.bincount(offer, weights=exposure, minlength=types))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profit = np.bincount(offer, weights=timeline.profit[retained][valid], minlength=types) / counts
+        cost = np.bincount(offer, weights=timeline.cost[retained][valid], minlength=types) / counts
+
+    frame = pd.DataFrame({
+        'offer_type': timeline.offer_types,
+        'retained': counts,
+        'monthly_profit': profit,
+        'offer_cost': cost,
+        'lifetime': months,
+        'ltv': profit * months - cost,
+    })
+
+    # Общий LTV: жизнь контракта от первого кейса до ухода или текущего месяца
+    seen = first != NEVER
+    gone = churn[seen] != NEVER
+    contract_exposure = np.maximum(np.where(gone, churn[seen], now) - first[seen], 1)
+
+    contract_profit = np.zeros(timeline.contracts)
+    contract_profit[timeline.contract] = timeline.profit
+    overall_lifetime = float(lifetime(gone.sum(), contract_exposure.sum()))
+
+    overall = {
+        'contracts': int(seen.sum()),
+        'churned': int(gone.sum()),
+        'monthly_churn': float(gone.sum() / contract_exposure.sum()),
+        'lifetime': overall_lifetime,
+        'ltv': float(contract_profit[seen].mean() * overall_lifetime),
+    }
+
+    return frame[frame['retained'] > 0].reset_index(drop=True), overall
+
+
+class AnalyticsReport:
+    """Предрасчитанные когорты, отток и LTV на месяц now по данным с водяным знаком watermark."""
+
+    __slots__ = ("now", "watermark", "cohorts", "churn", "ltv", "overall")
+
+    def __init__(self, now: int, watermark, cohorts: pd.DataFrame, churn: pd.DataFrame, ltv: pd.DataFrame,
+                 overall: dict):
+        self.now = now
+        self.watermark = watermark
+        self.cohorts = cohorts
+        self.churn = churn
+        self.ltv = ltv
+        self.overall = overall
+
+
+def build_report(timeline: Optional[CaseTimeline], now: int, watermark=None) -> Optional[AnalyticsReport]:
+    if timeline is None or not len(timeline):
+        return None
+
+    # Синтетические данные могут уходить в будущее — текущий месяц не раньше последнего кейса
+    now = max(now, int(timeline.month.max()))
+    first, churn = contract_months(timeline)
+    ltv, overall = estimate_ltv(timeline, now, first, churn)
+
+    return AnalyticsReport(
+        now=now,
+        watermark=watermark,
+        cohorts=cohort_retention(timeline, now, first, churn),
+        churn=churn_by_offer(timeline),
+        ltv=ltv,
+        overall=overall,
+    )
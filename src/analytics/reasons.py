@@ -0,0 +1,235 @@
+"""
+Инкрементальный индекс причин отказа (retention_cases.initial_reason).
+
+Причина нормализуется (регистр, ё, пунктуация) и разбивается на слова; слова хэшируются в
+пространство text.HASH_FEATURES (hashing trick — словарь не нужен заранее). Индекс хранит частоты
+слов и целых нормализованных причин по группам (месяц создания кейса, тип предложения).
+
+Причина и оффер задаются при создании кейса и больше не меняются, поэтому водяной знак —
+последний обработанный case_id каждого шарда: каждое обновление читает только новые кейсы пачками
+по первичному ключу и добавляет их счётчики к индексу. AUTO_INCREMENT выдаётся при вставке, а не при
+коммите, и чтение идёт с реплик, поэтому кейс с меньшим номером может стать видимым позже большего:
+каждое обновление перечитывает последние REREAD_CASES номеров шарда и пропускает уже учтённые.
+"""
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.text import hash_token, normalize_reason, tokenize
+from src.repositories import MAX_SHARDS, Repositories, Statement
+from src.repositories.offer_repository import NO_OFFER
+
+# Новые кейсы шарда после его водяного знака, пачками по первичному ключу; тип оффера подставляется после чтения
+NEW_REASONS_SELECT = """
+    SELECT
+        case_id,
+        YEAR(created_at) * 12 + MONTH(created_at) - 1,
+        proposed_offer_id,
+        initial_reason
+    FROM {table}
+    WHERE case_id > %s
+    ORDER BY case_id
+    LIMIT %s
+"""
+
+NEW_REASONS = Statement("analytics.new_reasons", NEW_REASONS_SELECT.format(table="retention_cases"))
+
+# Архив читается только при первой загрузке шарда: в архив попадают кейсы, уже прочитанные из горячей таблицы
+ARCHIVED_REASONS = Statement("analytics.archived_reasons", NEW_REASONS_SELECT.format(table="retention_cases_archive"))
+
+# Сколько последних кейсов шарда перечитывается на каждом обновлении
+REREAD_CASES = 1000
+
+# Ключ счётчика: (группа << FEATURE_BITS) | признак (хэш слова или код причины),
+# группа — month_key * MAX_OFFER_TYPES + код типа предложения
+MAX_OFFER_TYPES = 1 << 10
+FEATURE_BITS = 32
+FEATURE_MASK = (1 << FEATURE_BITS) - 1
+
+
+async def load_new_reasons(repositories: Repositories, after: tuple, chunk_size: int = 50_000) -> Tuple[List[tuple], tuple]:
+    """
+    Новые кейсы всех шардов после водяного знака after — строки (case_id, месяц, тип предложения, причина)
+    и новый водяной знак. Элемент водяного знака — (последний case_id шарда, учтённые номера в окне перечитывания).
+    """
+    shards = repositories.shards.shards
+    # Номера кейсов шарда идут с шагом MAX_SHARDS (см. sharding)
+    window = REREAD_CASES * (MAX_SHARDS if repositories.shards.sharded else 1)
+
+    async def read(shard, query, last):
+        rows = []
+        while True:
+            chunk = await shard.select_all(query, last, chunk_size)
+            if not chunk:
+                return rows, last
+
+            rows.extend(chunk)
+            last = chunk[-1][0]
+
+    async def shard_rows(shard):
+        index = shards.index(shard)
+        if index < len(after):
+            last, seen = after[index]
+            rows, reread = await read(shard, NEW_REASONS, max(last - window, 0))
+            rows, last = [row for row in rows if row[0] not in seen], max(last, reread)
+        else:
+            archived, _ = await read(shard, ARCHIVED_REASONS, 0)
+            rows, last = await read(shard, NEW_REASONS, 0)
+            rows, seen = archived + rows, frozenset()
+
+        floor = last - window
+        seen = frozenset([case_id for case_id in seen if case_id > floor]
+                         + [row[0] for row in rows if row[0] > floor])
+        return rows, (last, seen)
+
+    async with repositories.database.replica():
+        offers = await repositories.offers.get_type_costs()
+        parts = await repositories.shards.each(shard_rows)
+
+    rows = [(case_id, month, offers.get(offer_id, NO_OFFER)[0], reason)
+            for shard_part, _ in parts for case_id, month, offer_id, reason in shard_part]
+    return rows, tuple(last for _, last in parts)
+
+
+class ReasonIndex:
+    """
+    Частоты слов и причин по (месяц, тип предложения). Обновляется только новыми кейсами
+    (update) и отвечает на запросы топа за период и по типам (top_terms / top_reasons).
+    """
+
+    def __init__(self, loader: Optional[Callable[[tuple], Tuple[List[tuple], tuple]]] = None, max_age: float = 60):
+        self._loader = loader
+        self.max_age = max_age
+        # Состояние чтения каждого шарда (см. load_new_reasons); loader(watermark) -> (строки, новый водяной знак)
+        self.watermark = ()
+        self.cases = 0
+
+        self._offer_types: dict = {}
+        self._reasons: dict = {}
+        self._phrases_list: List[str] = []
+        self._phrase_features: List[np.ndarray] = []
+        self._labels: dict = {}
+        self._terms = pd.Series(dtype=np.int64)
+        self._phrases = pd.Series(dtype=np.int64)
+
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Дочитывает новые кейсы не чаще раза в max_age секунд; одновременные вызовы ждут одно обновление."""
+        if self._loader is None or time.monotonic() - self._checked_at < self.max_age:
+            return
+
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.max_age:
+                return
+
+            try:
+                rows, watermark = self._loader(self.watermark)
+                self._update(rows)
+                self.watermark = watermark
+            except Exception as e:
+                print(f"Ошибка при обновлении индекса причин отказа: {e}")
+
+            self._checked_at = time.monotonic()
+
+    def update(self, rows: Iterable[tuple]):
+        with self._lock:
+            self._update(rows)
+
+    def _update(self, rows: Iterable[tuple]):
+        rows = list(rows)
+        if not rows:
+            return
+
+        self.cases += len(rows)
+
+        groups, phrases = [], []
+        for case_id, month, offer_type, reason in rows:
+            code = self._phrase(reason)
+            if code is not None:
+                groups.append(int(month) * MAX_OFFER_TYPES + self._code(self._offer_types, offer_type))
+                phrases.append(code)
+
+        if not phrases:
+            return
+
+        groups = np.asarray(groups, dtype=np.int64)
+        phrases = np.asarray(phrases, dtype=np.int64)
+
+        # Слова каждой причины разобраны один раз при её первом появлении — здесь только склейка массивов
+        features = [self._phrase_features[code] for code in phrases]
+        lengths = np.fromiter((len(f) for f in features), dtype=np.int64, count=len(features))
+
+        # Счётчики пачки — одним np.unique, слияние с индексом — сложением выровненных Series
+        self._phrases = self._merge(self._phrases, (groups << FEATURE_BITS) | phrases)
+        if lengths.sum():
+            keys = (np.repeat(groups, lengths) << FEATURE_BITS) | np.concatenate(features)
+            self._terms = self._merge(self._terms, keys)
+
+    def _phrase(self, reason) -> Optional[int]:
+        normalized = normalize_reason(reason)
+        if not normalized:
+            return None
+
+        code = self._reasons.get(normalized)
+        if code is None:
+            code = self._reasons[normalized] = len(self._phrases_list)
+            self._phrases_list.append(normalized)
+
+            tokens = tokenize(normalized)
+            for token in tokens:
+                self._labels.setdefault(hash_token(token), token)
+            self._phrase_features.append(np.array([hash_token(token) for token in tokens], dtype=np.int64))
+
+        return code
+
+    @staticmethod
+    def _code(codes: dict, value) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    @staticmethod
+    def _merge(counts: pd.Series, keys: np.ndarray) -> pd.Series:
+        unique, batch = np.unique(keys, return_counts=True)
+        return counts.add(pd.Series(batch, index=unique), fill_value=0).astype(np.int64)
+
+    def top_terms(self, lo: Optional[int] = None, hi: Optional[int] = None,
+                  offer_types: Optional[List[str]] = None, limit: int = 10) -> pd.Series:
+        """Самые частые слова причин за месяцы [lo, hi) по выбранным типам предложений."""
+        top = self._top(self._terms, lo, hi, offer_types, limit)
+        top.index = [self._labels.get(feature, str(feature)) for feature in top.index]
+        return top
+
+    def top_reasons(self, lo: Optional[int] = None, hi: Optional[int] = None,
+                    offer_types: Optional[List[str]] = None, limit: int = 10) -> pd.Series:
+        """Самые частые нормализованные причины за месяцы [lo, hi) по выбранным типам предложений."""
+        top = self._top(self._phrases, lo, hi, offer_types, limit)
+        top.index = [self._phrases_list[code] for code in top.index]
+        return top
+
+    def _top(self, counts: pd.Series, lo, hi, offer_types, limit) -> pd.Series:
+        if counts.empty:
+            return counts
+
+        keys = counts.index.to_numpy()
+        group = keys >> FEATURE_BITS
+        month = group // MAX_OFFER_TYPES
+
+        mask = np.ones(len(keys), dtype=bool)
+        if lo is not None:
+            mask &= month >= lo
+        if hi is not None:
+            mask &= month < hi
+        if offer_types:
+            codes = [self._offer_types[t] for t in offer_types if t in self._offer_types]
+            mask &= np.isin(group % MAX_OFFER_TYPES, codes)
+
+        selected = counts[mask]
+        totals = selected.groupby(selected.index.to_numpy() & FEATURE_MASK).sum()
+        return totals.nlargest(limit)
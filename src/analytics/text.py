@@ -0,0 +1,46 @@
+import re
+import zlib
+from typing import List
+
+NON_WORD = re.compile(r"[^\w\s]+")
+
+# Служебные слова не несут смысла причины; «не» не отбрасывается, а приклеивается к следующему слову
+STOP_WORDS = frozenset((
+    "а", "в", "во", "и", "к", "ко", "с", "со", "у", "о", "об", "от", "по", "за", "на", "из", "для", "до",
+    "что", "как", "так", "то", "это", "бы", "же", "ли", "уже", "еще", "очень", "мне", "меня", "мой", "моя",
+    "я", "вы", "вас", "вам", "ваш", "ваша", "но", "или", "при", "есть", "был", "была", "было",
+))
+
+# Размер пространства хэшей: коллизии слов при словаре причин в тысячи слов пренебрежимо редки
+HASH_FEATURES = 1 << 20
+
+
+def normalize_reason(text) -> str:
+    """Нижний регистр, ё → е, без знаков препинания и лишних пробелов: «Дорого!» и «дорого» — одна причина."""
+    if not text:
+        return ""
+
+    return " ".join(NON_WORD.sub(" ", str(text).lower().replace("ё", "е")).split())
+
+
+def tokenize(normalized: str) -> List[str]:
+    """Слова нормализованной причины без служебных; «не нравится» → «не_нравится»."""
+    tokens = []
+    negate = False
+
+    for word in normalized.split():
+        if word == "не":
+            negate = True
+            continue
+        if word in STOP_WORDS or word.isdigit():
+            continue
+
+        tokens.append(f"не_{word}" if negate else word)
+        negate = False
+
+    return tokens
+
+
+def hash_token(token: str) -> int:
+    # crc32 стабилен между процессами и запусками, в отличие от встроенного hash()
+    return zlib.crc32(token.encode()) % HASH_FEATURES
@@ -0,0 +1,107 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.repositories import Repositories, Statement
+from src.repositories.offer_repository import NO_OFFER
+
+# Завершённые кейсы в виде, удобном для векторного разбора: месяц — целочисленный ключ year*12 + (month-1),
+# суммы — DOUBLE (+ 0e0), чтобы драйвер не создавал миллионы Decimal. Тип и стоимость оффера
+# подставляются по proposed_offer_id после чтения: кейсы могут лежать на шардах без таблицы offers
+TIMELINE_SELECT = """
+    SELECT
+        rc.contract_id,
+        YEAR(rc.completed_at) * 12 + MONTH(rc.completed_at) - 1,
+        rc.status = 'churned',
+        c.monthly_profit + 0e0,
+        rc.proposed_offer_id
+    FROM {table} rc
+         JOIN contracts c ON rc.contract_id = c.contract_id
+    WHERE rc.status IN ('churned', 'retained')
+      AND rc.completed_at IS NOT NULL
+"""
+
+# Горячая таблица и архив читаются отдельными запросами: UNION материализовал бы всю историю во временную таблицу
+TIMELINE = Statement("analytics.timeline", TIMELINE_SELECT.format(table="retention_cases"))
+ARCHIVED_TIMELINE = Statement("analytics.archived_timeline", TIMELINE_SELECT.format(table="retention_cases_archive"))
+
+
+class CaseTimeline:
+    """
+    Завершённые кейсы удержания в колоночном виде. Контракты и типы офферов закодированы
+    целыми числами (индексы в contract_ids и offer_types), чтобы расчёты шли через bincount/ufunc.
+    """
+
+    __slots__ = ("contract", "month", "churned", "profit", "offer", "cost", "contract_ids", "offer_types")
+
+    def __init__(self, contract: np.ndarray, month: np.ndarray, churned: np.ndarray, profit: np.ndarray,
+                 offer: np.ndarray, cost: np.ndarray, contract_ids: np.ndarray, offer_types: List[str]):
+        self.contract = contract
+        self.month = month
+        self.churned = churned
+        self.profit = profit
+        self.offer = offer
+        self.cost = cost
+        self.contract_ids = contract_ids
+        self.offer_types = offer_types
+
+    def __len__(self):
+        return len(self.month)
+
+    @property
+    def contracts(self) -> int:
+        return len(self.contract_ids)
+
+    @classmethod
+    def from_columns(cls, contract_ids, month, churned, profit, offer_types, cost) -> "CaseTimeline":
+        contract, contract_index = _factorize(contract_ids)
+        offer, offer_index = _factorize(offer_types, sort=True)
+
+        return cls(
+            contract=contract,
+            month=np.asarray(month, dtype=np.int32),
+            churned=np.asarray(churned, dtype=bool),
+            profit=np.asarray(profit, dtype=np.float64),
+            offer=offer.astype(np.int16),
+            cost=np.asarray(cost, dtype=np.float64),
+            contract_ids=contract_index,
+            offer_types=offer_index.tolist(),
+        )
+
+
+def _factorize(values, sort: bool = False):
+    # Хэш-таблица pandas; сортировка нужна только для стабильного порядка немногих типов предложений
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), sort=sort)
+    return codes.astype(np.int32), np.asarray(uniques)
+
+
+def offer_columns(offer_ids, offers: dict):
+    """Колонки типов и стоимостей офферов по proposed_offer_id; словарь offers — OfferRepository.get_type_costs()."""
+    codes, uniques = pd.factorize(pd.Series(offer_ids, dtype=object))
+    # Код -1 (кейс без оффера) попадает на последний элемент — NO_OFFER
+    attributes = [offers.get(offer_id, NO_OFFER) for offer_id in uniques] + [NO_OFFER]
+
+    types = np.array([offer_type for offer_type, _ in attributes], dtype=object)[codes]
+    costs = np.array([float(cost) for _, cost in attributes], dtype=np.float64)[codes]
+    return types, costs
+
+
+async def load_case_timeline(repositories: Repositories, chunk_size: int = 50_000) -> Optional[CaseTimeline]:
+    """Читает завершённые кейсы (с архивом) со всех шардов потоково (серверный курсор) и собирает колонки без промежуточных моделей."""
+    columns = [[], [], [], [], []]
+
+    async with repositories.database.replica():
+        offers = await repositories.offers.get_type_costs()
+
+        for query in (ARCHIVED_TIMELINE, TIMELINE):
+            async for rows in repositories.shards.stream(query, chunk_size=chunk_size):
+                for column, values in zip(columns, zip(*rows)):
+                    column.extend(values)
+
+    if not columns[0]:
+        return None
+
+    contract_ids, month, churned, profit, offer_ids = columns
+    offer_types, cost = offer_columns(offer_ids, offers)
+    return CaseTimeline.from_columns(contract_ids, month, churned, profit, offer_types, cost)
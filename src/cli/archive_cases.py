@@ -0,0 +1,69 @@
+"""
+Архивация завершённых кейсов старше ARCHIVE_KEEP_MONTHS и подготовка партиций на следующие месяцы.
+
+Запускается по расписанию (cron/systemd timer) раз в месяц на каждом шарде:
+
+    python -m src.cli.archive_cases --dry-run
+    python -m src.cli.archive_cases --keep-months 24
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from src.config import Settings
+from src.repositories import Database, Repositories, create_shard_router, ensure_schema
+from src.models import current_month
+from src.repositories.case_archive import HISTORY_PARTITION, PARTITION_ROWS, PARTITIONS_AHEAD, add_partitions, \
+    archive_before, monthly_partitions
+
+
+async def run(keep_months: int, ahead: int, dry_run: bool):
+    settings = Settings()
+
+    database = Database(settings)
+    repositories = Repositories(database, create_shard_router(settings, database))
+
+    await ensure_schema(repositories)
+
+    started = time.perf_counter()
+    cutoff = current_month() - keep_months
+    totals = [0, 0, 0]
+
+    for shard in repositories.shards.shards:
+        async with shard:
+            if dry_run:
+                old = [name for name, month in await monthly_partitions(shard) if month < cutoff]
+                history, = await shard.select_one(PARTITION_ROWS.format(partition=HISTORY_PARTITION))
+                print(f"{'/'.join(map(str, shard.location))}: к архивации партиций {len(old)} ({', '.join(old) or '-'}), "
+                      f"кейсов в {HISTORY_PARTITION} (будут разделены по месяцам) {history}")
+                continue
+
+            added = await add_partitions(shard, ahead)
+            cases, partitions = await archive_before(shard, keep_months)
+
+        print(f"{'/'.join(map(str, shard.location))}: новых партиций {added}, "
+              f"архивировано партиций {partitions}, кейсов {cases}")
+        totals = [total + count for total, count in zip(totals, (added, partitions, cases))]
+
+    if not dry_run:
+        print(f"Архивировано кейсов: {totals[2]} из {totals[1]} партиций, новых партиций {totals[0]} "
+              f"за {time.perf_counter() - started:.1f} с")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep-months", type=int, default=None,
+                        help="месяцев завершённых кейсов в горячей таблице (по умолчанию ARCHIVE_KEEP_MONTHS)")
+    parser.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD, help="на сколько месяцев вперёд держать партиции")
+    parser.add_argument("--dry-run", action="store_true", help="только показать партиции к архивации")
+    args = parser.parse_args()
+
+    keep_months = args.keep_months if args.keep_months is not None else Settings().archive_keep_months
+    asyncio.run(run(keep_months, args.ahead, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
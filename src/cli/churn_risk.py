@@ -0,0 +1,45 @@
+"""
+Пакетная оценка риска оттока всех активных контрактов в таблицу contract_risk.
+
+Запускается по расписанию (cron/systemd timer), например раз в сутки:
+
+    python -m src.cli.churn_risk --chunk-size 50000
+"""
+import argparse
+import asyncio
+import logging
+
+from src.config import Settings
+from src.repositories import Database, Repositories, create_shard_router, ensure_schema
+from src.services import score_contracts
+from src.services.churn_risk import HORIZON_MONTHS
+
+
+async def run(chunk_size: int):
+    settings = Settings()
+
+    database = Database(settings)
+    repositories = Repositories(database, create_shard_router(settings, database))
+
+    await ensure_schema(repositories)
+
+    async with database:
+        summary = await score_contracts(repositories, chunk_size)
+
+    print(f"Оценено контрактов: {summary['contracts']}, обучение на {summary['samples']} строках срезов "
+          f"и {summary['cases']} кейсах (доля кейса или ухода за {HORIZON_MONTHS} мес. {summary['base_rate']:.1%}) "
+          f"за {summary['seconds']:.1f} с")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="контрактов в пачке чтения и записи")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
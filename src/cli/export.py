@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+from pathlib import Path
+
+from src.config import Settings
+from src.repositories import Database, Repositories, create_shard_router
+from src.services import ExportService, EXPORT_FORMATS, EXPORT_ENTITIES
+
+
+async def run_export(entity: str, fmt: str, output: Path, chunk_size: int):
+    settings = Settings()
+
+    database = Database(settings)
+    repositories = Repositories(database, create_shard_router(settings, database))
+
+    # Выгрузка только читает — идёт на реплику, если она настроена и не отстаёт
+    async with database.replica():
+        written = await ExportService(repositories, chunk_size).export(entity, fmt, output)
+
+    print(f"Выгружено строк: {written} -> {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка контрактов и кейсов удержания в файл")
+    parser.add_argument("entity", choices=list(EXPORT_ENTITIES))
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None,
+                        help="формат файла; по умолчанию определяется по расширению")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    fmt = args.format or args.output.suffix.lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        parser.error(f"Не удалось определить формат по имени файла, укажите --format ({', '.join(EXPORT_FORMATS)})")
+
+    asyncio.run(run_export(args.entity, fmt, args.output, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
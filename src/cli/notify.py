@@ -0,0 +1,26 @@
+import argparse
+
+from src.config import Settings
+from src.events import CASE_RESOLVED, post_event
+
+
+def main():
+    settings = Settings()
+
+    parser = argparse.ArgumentParser(
+        description="Публикует событие в шину дашборда вместо бота — для проверки живых обновлений"
+    )
+    parser.add_argument("--url", default=f"http://127.0.0.1:{settings.dash_port or 8050}",
+                        help="адрес дашборда (без EVENTS_TOKEN публикация принимается только с локального адреса)")
+    parser.add_argument("--topic", default=CASE_RESOLVED)
+    parser.add_argument("--case-id", type=int, default=0)
+    parser.add_argument("--status", default="retained", choices=["retained", "churned"])
+    args = parser.parse_args()
+
+    status = post_event(args.url, args.topic, {"case_id": args.case_id, "status": args.status},
+                        token=settings.events_token)
+    print(f"Событие {args.topic} отправлено, ответ: {status}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
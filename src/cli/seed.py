@@ -0,0 +1,315 @@
+"""
+Генератор синтетических данных большого объёма для бенчмарков дашборда и админских списков.
+
+Заполняет users, offers, contracts и retention_cases по схемам из create_table: распределения
+оттока/удержания настраиваются, completed_at имеет годовую сезонность. Результат детерминирован:
+каждая пачка генерируется из собственного ГПСЧ, зависящего только от --seed и номера пачки.
+
+    python -m src.cli.seed --contracts 1000000 --seed 7
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from src.config import Settings
+from src.models import Offer
+from src.repositories import Database, Repositories, create_shard_router, ensure_schema
+
+CONTRACT_PREFIX = "SYN"
+CLIENT_ID_BASE = 8_000_000_000
+ADMIN_ID_BASE = 7_000_000_000
+
+# offer_type, описание, min_profit_threshold, cost, «привлекательность» — множитель вероятности удержания
+OFFER_CATALOG = [
+    ("Бонусные баллы", "Начисление 500 бонусных баллов", 0, 80, 0.6),
+    ("Скидка 10%", "Скидка 10% на три месяца", 0, 150, 0.8),
+    ("Скидка 25%", "Скидка 25% на три месяца", 800, 450, 1.1),
+    ("Апгрейд тарифа", "Переход на старший тариф по цене текущего", 1000, 300, 1.0),
+    ("Бесплатный месяц", "Один месяц обслуживания бесплатно", 1500, 1200, 1.3),
+    ("Персональный менеджер", "Закреплённый менеджер и приоритетная поддержка", 3000, 2000, 1.2),
+]
+
+REASONS = np.array([
+    "Дорого",
+    "Слишком высокая абонентская плата",
+    "Нашёл предложение дешевле у конкурента",
+    "Переезжаю в другой город",
+    "Плохое качество связи",
+    "Долго решают проблемы в поддержке",
+    "Не пользуюсь услугой",
+    "Не указано (через бота)",
+])
+
+LAST_NAMES = np.array(["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов"])
+FIRST_NAMES = np.array(["Александр", "Дмитрий", "Максим", "Сергей", "Андрей", "Алексей", "Иван", "Михаил"])
+MIDDLE_NAMES = np.array(["Александрович", "Дмитриевич", "Сергеевич", "Андреевич", "Иванович", "Михайлович"])
+
+
+@dataclass
+class SeedConfig:
+    contracts: int = 1_000_000
+    admins: int = 20
+    cases_per_contract: float = 0.7
+    retention_rate: float = 0.55
+    escalation_rate: float = 0.2
+    can_be_retained_rate: float = 0.85
+    seasonality: float = 0.3
+    peak_month: int = 1
+    start: datetime.date = datetime.date(2023, 1, 1)
+    # Фиксированный конец периода: с датой запуска результат зависел бы от дня генерации
+    end: datetime.date = datetime.date(2025, 12, 31)
+    batch_size: int = 20_000
+    seed: int = 1
+
+
+@dataclass
+class OfferTable:
+    # Офферы, отсортированные по порогу прибыли — подходящие для клиента образуют префикс
+    ids: np.ndarray
+    thresholds: np.ndarray
+    appeal: np.ndarray
+
+
+def _month_grid(config: SeedConfig) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    months = np.arange(
+        np.datetime64(config.start, "M"), np.datetime64(config.end, "M") + 1, dtype="datetime64[M]"
+    )
+    month_numbers = months.astype(int) % 12 + 1
+    weights = 1 + config.seasonality * np.cos(2 * np.pi * (month_numbers - config.peak_month) / 12)
+
+    starts = months.astype("datetime64[s]")
+    lengths = ((months + 1).astype("datetime64[s]") - starts).astype(np.int64)
+
+    return starts, lengths, weights / weights.sum()
+
+
+def generate_batch(config: SeedConfig, offers: OfferTable, batch_index: int) -> Tuple[list, list, list]:
+    """Возвращает строки users (клиенты), contracts и retention_cases для одной пачки контрактов."""
+    rng = np.random.default_rng([config.seed, batch_index])
+
+    lo = batch_index * config.batch_size
+    hi = min(config.contracts, lo + config.batch_size)
+    n = hi - lo
+    numbers = np.arange(lo, hi)
+
+    # === Контракты ===
+    client_ids = CLIENT_ID_BASE + numbers
+    profit = np.round(rng.lognormal(mean=7.0, sigma=0.6, size=n), 2)
+    can_retain = rng.random(n) < config.can_be_retained_rate
+
+    # === Кейсы: у контракта 0..k кейсов, completed_at распределён по месяцам с сезонностью ===
+    per_contract = rng.poisson(config.cases_per_contract, n)
+    case_contract = np.repeat(np.arange(n), per_contract)
+    k = len(case_contract)
+
+    starts, lengths, weights = _month_grid(config)
+    month = rng.choice(len(starts), size=k, p=weights)
+    completed = starts[month] + (rng.random(k) * lengths[month]).astype("timedelta64[s]")
+    decision = np.maximum(rng.exponential(36 * 3600, k), 60).astype("timedelta64[s]")
+    created = completed - decision
+
+    # Кейсы одного контракта идут по времени; отток возможен только последним кейсом
+    order = np.lexsort((completed, case_contract))
+    case_contract, completed, created = case_contract[order], completed[order], created[order]
+    is_last = np.ones(k, dtype=bool)
+    is_last[:-1] = case_contract[1:] != case_contract[:-1]
+
+    # Кейсы после конца периода ещё открыты; у контракта открытым может быть только последний,
+    # более ранние такие кейсы не создаются
+    now = np.datetime64(datetime.datetime.combine(config.end, datetime.time()), "s")
+    keep = (completed <= now) | is_last
+    case_contract, completed, created, is_last = case_contract[keep], completed[keep], created[keep], is_last[keep]
+    k = len(case_contract)
+    is_open = completed > now
+    created[is_open] = np.minimum(created[is_open], now)
+
+    # Подходящие офферы — префикс таблицы, отсортированной по порогу; выбираем равновероятно
+    case_profit = profit[case_contract]
+    eligible = np.searchsorted(offers.thresholds, case_profit, side="right")
+    has_offer = (eligible > 0) & can_retain[case_contract]
+    pick = np.minimum((rng.random(k) * eligible).astype(np.int64), np.maximum(eligible - 1, 0))
+
+    p_retain = np.clip(config.retention_rate * offers.appeal[pick], 0, 0.95)
+    retained = has_offer & (rng.random(k) < p_retain)
+    retained |= ~is_last
+
+    escalated = rng.random(k) < config.escalation_rate
+
+    status = np.where(retained, "retained", "churned").astype(object)
+    status[is_open] = np.where(escalated[is_open], "escalated", "active")
+
+    manager = ADMIN_ID_BASE + rng.integers(0, max(config.admins, 1), k)
+    has_manager = escalated & (config.admins > 0)
+
+    reason_weights = np.array([4, 2, 3, 1, 2, 1, 1, 3], dtype=float)
+    reasons = REASONS[rng.choice(len(REASONS), size=k, p=reason_weights / reason_weights.sum())]
+
+    churned_contract = np.zeros(n, dtype=bool)
+    churned_contract[case_contract[(status == "churned")]] = True
+
+    # === Сборка строк ===
+    contract_ids = np.char.add(CONTRACT_PREFIX, np.char.zfill(numbers.astype(str), 10))
+    emails = np.char.add(np.char.add("client", numbers.astype(str)), "@example.com")
+    phones = np.char.add("+79", np.char.zfill((numbers % 10 ** 9).astype(str), 9))
+
+    user_rows = list(zip(client_ids.tolist(), ["client"] * n))
+
+    contract_rows = list(zip(
+        contract_ids.tolist(),
+        client_ids.tolist(),
+        LAST_NAMES[rng.integers(0, len(LAST_NAMES), n)].tolist(),
+        FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n)].tolist(),
+        MIDDLE_NAMES[rng.integers(0, len(MIDDLE_NAMES), n)].tolist(),
+        emails.tolist(),
+        phones.tolist(),
+        can_retain.tolist(),
+        profit.tolist(),
+        (~churned_contract).tolist(),
+    ))
+
+    offer_ids = offers.ids[pick].tolist()
+    managers = manager.tolist()
+    case_rows = [
+        (contract_id, reason, offer_id if offer else None, mgr if with_manager else None,
+         created_at, None if still_open else completed_at, case_status)
+        for contract_id, reason, offer_id, offer, mgr, with_manager, created_at, completed_at, still_open, case_status
+        in zip(
+            contract_ids[case_contract].tolist(), reasons.tolist(), offer_ids, has_offer.tolist(),
+            managers, has_manager.tolist(), created.tolist(), completed.tolist(), is_open.tolist(), status.tolist()
+        )
+    ]
+
+    return user_rows, contract_rows, case_rows
+
+
+async def prepare_reference_data(repos: Repositories, config: SeedConfig) -> OfferTable:
+    existing = {offer.offer_type: offer for offer in await repos.offers.get_all()}
+    for offer_type, description, threshold, cost, _ in OFFER_CATALOG:
+        if offer_type not in existing:
+            await repos.offers.insert(Offer(0, offer_type, description, threshold, cost))
+
+    offers = {offer.offer_type: offer for offer in await repos.offers.get_all()}
+    catalog = sorted(OFFER_CATALOG, key=lambda item: item[2])
+
+    await repos.database.execute_many(
+        "INSERT IGNORE INTO users (telegram_id, role) VALUES (%s, %s)",
+        [(ADMIN_ID_BASE + i, "admin") for i in range(config.admins)]
+    )
+
+    return OfferTable(
+        ids=np.array([offers[item[0]].offer_id for item in catalog]),
+        thresholds=np.array([item[2] for item in catalog], dtype=float),
+        appeal=np.array([item[4] for item in catalog], dtype=float),
+    )
+
+
+async def truncate(repos: Repositories):
+    async def truncate_shard(shard):
+        await shard.execute("DELETE FROM retention_cases WHERE contract_id LIKE %s", f"{CONTRACT_PREFIX}%")
+        await shard.execute("DELETE FROM contracts WHERE contract_id LIKE %s", f"{CONTRACT_PREFIX}%")
+
+    database = repos.database
+    await repos.shards.each(truncate_shard)
+    await database.execute("DELETE FROM client_contracts WHERE contract_id LIKE %s", f"{CONTRACT_PREFIX}%")
+    await database.execute("DELETE FROM users WHERE telegram_id >= %s", ADMIN_ID_BASE)
+
+
+async def seed(config: SeedConfig, clean: bool = False):
+    settings = Settings()
+    database = Database(settings)
+    repos = Repositories(database, create_shard_router(settings, database))
+
+    await ensure_schema(repos)
+
+    async with database, contextlib.AsyncExitStack() as stack:
+        if clean:
+            print("Удаляю ранее сгенерированные данные...")
+            await truncate(repos)
+
+        offers = await prepare_reference_data(repos, config)
+
+        # Соединения шардов держатся всю загрузку: insert_many в этой задаче переиспользует их вместе с настройками сессии
+        loading = [database] + [shard for shard in repos.shards.shards if shard is not database]
+        for shard in loading[1:]:
+            await stack.enter_async_context(shard)
+
+        # Ключи и внешние ключи проверены генератором — на время загрузки проверки сервера не нужны
+        for target in loading:
+            await target.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+        batches = (config.contracts + config.batch_size - 1) // config.batch_size
+        started = time.perf_counter()
+        totals = [0, 0]
+
+        # Следующая пачка генерируется в потоке, пока текущая загружается в БД
+        pending = asyncio.create_task(asyncio.to_thread(generate_batch, config, offers, 0)) if batches else None
+        try:
+            for index in range(batches):
+                user_rows, contract_rows, case_rows = await pending
+                if index + 1 < batches:
+                    pending = asyncio.create_task(asyncio.to_thread(generate_batch, config, offers, index + 1))
+
+                await repos.users.insert_many(user_rows)
+                await repos.contracts.insert_many(contract_rows)
+                if case_rows:
+                    await repos.cases.insert_many(case_rows)
+
+                totals[0] += len(contract_rows)
+                totals[1] += len(case_rows)
+
+                elapsed = time.perf_counter() - started
+                print(f"[{index + 1}/{batches}] контрактов: {totals[0]}, кейсов: {totals[1]}, "
+                      f"{totals[0] / elapsed:,.0f} контрактов/с")
+        finally:
+            for target in loading:
+                await target.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+
+
+def main():
+    defaults = SeedConfig()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contracts", type=int, default=defaults.contracts)
+    parser.add_argument("--admins", type=int, default=defaults.admins)
+    parser.add_argument("--cases-per-contract", type=float, default=defaults.cases_per_contract,
+                        help="среднее число кейсов удержания на контракт (распределение Пуассона)")
+    parser.add_argument("--retention-rate", type=float, default=defaults.retention_rate,
+                        help="базовая вероятность удержания при предложенном оффере")
+    parser.add_argument("--escalation-rate", type=float, default=defaults.escalation_rate)
+    parser.add_argument("--seasonality", type=float, default=defaults.seasonality,
+                        help="амплитуда годовой сезонности completed_at (0 — равномерно)")
+    parser.add_argument("--peak-month", type=int, default=defaults.peak_month)
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=defaults.start)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=defaults.end)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--clean", action="store_true", help="удалить ранее сгенерированные данные перед загрузкой")
+    args = parser.parse_args()
+
+    config = SeedConfig(
+        contracts=args.contracts,
+        admins=args.admins,
+        cases_per_contract=args.cases_per_contract,
+        retention_rate=args.retention_rate,
+        escalation_rate=args.escalation_rate,
+        seasonality=args.seasonality,
+        peak_month=args.peak_month,
+        start=args.start,
+        end=args.end,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
+
+    asyncio.run(seed(config, args.clean))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+HTTP API агрегата дашборда на сервере Flask, который поднимает Dash.
+
+GET /api/aggregate — помесячный агрегат по типам предложений и KPI с учётом фильтров:
+    ?level=year|quarter|month&period=2024Q2&types=Скидка 10%,Скидка 25%&format=json|arrow
+
+Ответ содержит ETag, зависящий от версии данных и фильтров; на запрос с совпадающим
+If-None-Match сервер отвечает 304 без построения тела.
+
+GET /api/events — поток Server-Sent Events из шины событий процесса (src.events): дашборды
+в браузере узнают о завершённых кейсах без опроса по таймеру.
+POST /api/events — публикация события в шину: заглушка бота для проверки живых обновлений
+(python -m src.cli.notify) и мост событий бота из другого процесса. С EVENTS_TOKEN запрос должен нести
+его в заголовке X-Events-Token; без него принимаются только запросы с локального адреса, и эндпоинт
+нельзя публиковать через обратный прокси (для приложения все запросы придут с loopback).
+
+GET /healthz — проверка живости процесса дашборда для супервизора (src.supervisor).
+"""
+import hashlib
+import hmac
+import io
+import json
+
+from flask import Flask, Response, current_app, request, stream_with_context
+
+from src.dashboard.dataset import DatasetCache, compute_kpis, filter_by_types, filter_data_by_period, period_bounds
+from src.events import EventBus
+
+# Имена колонок в API — латиницей, чтобы с ответом было удобно работать внешним инструментам
+API_COLUMNS = {
+    'Дата': 'month',
+    'Тип предложения удержания': 'offer_type',
+    'Доход': 'income',
+    'Расходы': 'expenses',
+    'Ушло клиентов': 'churned',
+    'Клиентов удержано': 'retained',
+    'Прибыль': 'profit',
+}
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+# Пустой комментарий раз в KEEPALIVE секунд не даёт прокси закрыть простаивающее SSE-соединение
+KEEPALIVE = 15
+LOOPBACK = ('127.0.0.1', '::1')
+TOKEN_HEADER = 'X-Events-Token'
+
+
+def _error(status: int, message: str) -> Response:
+    return Response(json.dumps({'error': message}, ensure_ascii=False), status=status,
+                    mimetype="application/json")
+
+
+def _columnar_frame(df):
+    frame = df[list(API_COLUMNS)].rename(columns=API_COLUMNS)
+    frame['month'] = df['Дата'].dt.strftime('%Y-%m')
+
+    # Суммы из MySQL приходят Decimal — в ответе обычные числа
+    for column in ('income', 'expenses', 'profit'):
+        frame[column] = frame[column].astype(float)
+    for column in ('churned', 'retained'):
+        frame[column] = frame[column].astype('int64')
+
+    return frame
+
+
+def _arrow_body(frame, meta: dict) -> bytes:
+    import pyarrow as pa  # необязательная зависимость, нужна только для format=arrow
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.replace_schema_metadata({b'meta': json.dumps(meta, ensure_ascii=False).encode()})
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return sink.getvalue()
+
+
+def register_api(server: Flask, datasets: DatasetCache):
+    @server.get('/api/aggregate')
+    def aggregate():
+        level = request.args.get('level') or None
+        period = request.args.get('period') or None
+        types = sorted(t for value in request.args.getlist('types') for t in value.split(',') if t)
+
+        fmt = request.args.get('format')
+        if fmt is None:
+            fmt = 'arrow' if request.accept_mimetypes.best == ARROW_MIME else 'json'
+        if fmt not in ('json', 'arrow'):
+            return _error(400, "format: ожидается json или arrow")
+
+        if level is not None and level not in ('year', 'quarter', 'month'):
+            return _error(400, "level: ожидается year, quarter или month")
+        if level and period:
+            try:
+                period_bounds(level, period)
+            except ValueError:
+                return _error(400, f"period: неверное значение для уровня {level}")
+
+        dataset = datasets.get()
+        if dataset.empty:
+            return _error(503, "Не удалось загрузить данные из базы данных или данных нет.")
+
+        # ETag считается до фильтрации: повторный запрос с тем же состоянием стоит одно сравнение строк
+        etag = hashlib.sha1(json.dumps([dataset.version, fmt, level, period, types]).encode()).hexdigest()[:24]
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        df = filter_by_types(filter_data_by_period(dataset.frame, level, period), types)
+        frame = _columnar_frame(df)
+
+        meta = {
+            'version': dataset.version,
+            'filters': {'level': level, 'period': period, 'types': types},
+            'kpis': compute_kpis(df) if not df.empty else None,
+            'rows': len(frame),
+        }
+
+        if fmt == 'arrow':
+            try:
+                response = Response(_arrow_body(frame, meta), mimetype=ARROW_MIME)
+            except ImportError:
+                return _error(406, "Для format=arrow на сервере требуется пакет pyarrow")
+        else:
+            body = dict(meta, columns=list(frame.columns), data={c: frame[c].tolist() for c in frame.columns})
+            response = Response(json.dumps(body, ensure_ascii=False, separators=(',', ':')),
+                                mimetype="application/json")
+
+        response.set_etag(etag)
+        # Клиент может хранить ответ, но обязан перепроверять его через If-None-Match
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+def register_event_stream(server: Flask, bus: EventBus):
+    @server.get('/api/events')
+    def events():
+        def stream():
+            with bus.subscribe() as subscription:
+                # Браузер переподключается через 5 с после обрыва
+                yield "retry: 5000\n\n"
+
+                while True:
+                    event = subscription.get(timeout=KEEPALIVE)
+                    if event is None:
+                        yield ": keep-alive\n\n"
+                        continue
+
+                    yield f"event: {event.topic}\ndata: {json.dumps(event.payload, ensure_ascii=False)}\n\n"
+
+        return Response(stream_with_context(stream()), mimetype="text/event-stream", headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+
+    @server.post('/api/events')
+    def publish_event():
+        token = current_app.config.get('EVENTS_TOKEN')
+        if token:
+            if not hmac.compare_digest(request.headers.get(TOKEN_HEADER, ''), token):
+                return _error(403, f"Неверный {TOKEN_HEADER}")
+        elif request.remote_addr not in LOOPBACK:
+            return _error(403, "Без EVENTS_TOKEN публикация событий доступна только с локального адреса")
+
+        body = request.get_json(silent=True) or {}
+        topic = body.get('topic')
+        if not isinstance(topic, str) or not topic:
+            return _error(400, "topic: ожидается непустая строка")
+
+        payload = body.get('payload') or {}
+        if not isinstance(payload, dict):
+            return _error(400, "payload: ожидается объект")
+
+        bus.publish(topic, payload)
+        return Response(status=202)
+
+
+def register_health(server: Flask):
+    @server.get('/healthz')
+    def health():
+        # Без обращения к БД: недоступная база — не повод перезапускать дашборд
+        return Response(json.dumps({'status': 'ok'}), mimetype="application/json")
@@ -0,0 +1,33 @@
+// Клиентские колбэки дашборда: опции фильтров строятся в браузере без запроса к серверу.
+// Ключ месяца — year*12 + (month-1), как в make_store_payload (dash_app.py).
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    filters: {
+        options: function (store, level) {
+            if (!store || store.error) {
+                return [[], [], [], "Нет данных"];
+            }
+
+            const typeOptions = store.types.map(t => ({label: t, value: t}));
+            const typeValue = store.types.slice();  // По умолчанию выбираем все
+
+            if (!level) {
+                return [typeOptions, typeValue, [], "Выберите уровень периода"];
+            }
+
+            let periods = [];
+            if (level === 'year') {
+                periods = [...new Set(store.months.map(k => Math.floor(k / 12)))]
+                    .map(y => String(y));
+            } else if (level === 'quarter') {
+                periods = [...new Set(store.months.map(k => Math.floor(k / 3)))]
+                    .map(q => `${Math.floor(q / 4)}Q${q % 4 + 1}`);
+            } else if (level === 'month') {
+                periods = store.months
+                    .map(k => `${Math.floor(k / 12)}-${String(k % 12 + 1).padStart(2, '0')}`);
+            }
+
+            const periodOptions = periods.map(p => ({label: p, value: p}));
+            return [typeOptions, typeValue, periodOptions, periodOptions.length ? "Выберите период" : "Нет данных"];
+        }
+    }
+});
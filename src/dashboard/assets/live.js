@@ -0,0 +1,22 @@
+// Живые обновления дашборда: сервер присылает событие через SSE (/api/events),
+// браузер перезапрашивает данные колбэком load_data_and_store через Store push-trigger.
+(function () {
+    if (!window.EventSource) {
+        return;  // Остаётся обновление по таймеру
+    }
+
+    // Пачка событий (например, массовое закрытие кейсов) приводит к одному обновлению
+    const DEBOUNCE_MS = 1000;
+    let timer = null;
+
+    const source = new EventSource('/api/events');  // Переподключается сам после обрыва
+
+    source.addEventListener('case_resolved', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            if (window.dash_clientside && window.dash_clientside.set_props) {
+                window.dash_clientside.set_props('push-trigger', {data: Date.now()});
+            }
+        }, DEBOUNCE_MS);
+    });
+})();
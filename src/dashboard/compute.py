@@ -0,0 +1,247 @@
+"""
+Пул процессов для тяжёлых расчётов дашборда: фильтрация, KPI и графики представлений, аналитика удержания.
+
+Dash работает в одном процессе с ботом, и pandas/plotly в потоке запроса отнимают GIL у event loop
+Telegram. Здесь расчёты уходят в воркеры ProcessPoolExecutor, а колонки данных передаются через общую
+память (multiprocessing.shared_memory): агрегат публикуется один раз на версию данных, задача несёт
+только имена блоков и фильтры. Воркер собирает DataFrame из общей памяти и держит его до смены версии.
+"""
+import atexit
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+from src.analytics import AnalyticsReport, CaseTimeline, build_report
+from src.dashboard.figures import build_frame_view
+
+# Колонки CaseTimeline, которые нужны build_report; contract_ids в воркер не передаются — только их число
+TIMELINE_COLUMNS = ("contract", "month", "churned", "profit", "offer", "cost")
+
+
+class SharedArrays:
+    """Numpy-массивы в блоках общей памяти; descriptor — то, что передаётся воркеру вместо самих данных."""
+
+    def __init__(self, arrays: dict):
+        self._blocks = []
+        self.descriptor = {}
+
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self.descriptor[name] = (block.name, array.dtype.str, array.shape)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+        self._blocks = []
+
+
+def attach_arrays(descriptor: dict) -> dict:
+    """Копирует массивы из общей памяти в память воркера и сразу отсоединяется от блоков."""
+    arrays = {}
+    for name, (block_name, dtype, shape) in descriptor.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        try:
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf).copy()
+        finally:
+            block.close()
+
+    return arrays
+
+
+def plain_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Decimal из SUM агрегата — в float64, как их видят воркеры (и как они приходят из JSON в dcc.Store)."""
+    decimals = {column: frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                for column in frame.columns if _is_decimal(frame[column])}
+    return frame.assign(**decimals) if decimals else frame
+
+
+def _is_decimal(values: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(values) and pd.api.types.infer_dtype(values, skipna=True) == 'decimal'
+
+
+def share_frame(frame: pd.DataFrame):
+    """
+    Раскладывает DataFrame по блокам общей памяти. Числа и даты передаются как есть, Decimal из SUM —
+    как float64, строки — кодами с небольшим списком значений. Возвращает (SharedArrays, layout).
+    """
+    arrays, layout = {}, []
+    for column in frame.columns:
+        values = frame[column]
+        uniques = None
+
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_dtype(values):
+            arrays[column] = values.to_numpy()
+        elif _is_decimal(values):
+            arrays[column] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            codes, uniques = pd.factorize(values)
+            arrays[column] = codes.astype(np.int32)
+            uniques = list(uniques)
+
+        layout.append((column, uniques))
+
+    return SharedArrays(arrays), layout
+
+
+def attach_frame(descriptor: dict, layout: list) -> pd.DataFrame:
+    arrays = attach_arrays(descriptor)
+
+    columns = {}
+    for column, uniques in layout:
+        values = arrays[column]
+        if uniques is not None:
+            # Код -1 (пропуск) попадает на последний элемент — None
+            values = np.array(uniques + [None], dtype=object)[values]
+        columns[column] = values
+
+    return pd.DataFrame(columns)
+
+
+# Кэш воркера: DataFrame последней версии агрегата, чтобы общая память читалась один раз на версию
+_frame_version = None
+_frame = None
+
+
+def _worker_frame(frame_ref) -> pd.DataFrame:
+    global _frame_version, _frame
+
+    version, descriptor, layout = frame_ref
+    if version != _frame_version:
+        _frame = attach_frame(descriptor, layout)
+        _frame_version = version
+
+    return _frame
+
+
+def view_task(frame_ref, period_level, period_value, selected_types) -> str:
+    """Задача воркера: представление для фильтров, сразу сериализованное в JSON (как его хранит кэш графиков)."""
+    view = build_frame_view(_worker_frame(frame_ref), period_level, period_value, selected_types)
+    return json.dumps(view, cls=PlotlyJSONEncoder)
+
+
+def report_task(timeline_ref, now: int, watermark) -> Optional[AnalyticsReport]:
+    """Задача воркера: когорты, отток и LTV по колонкам CaseTimeline из общей памяти."""
+    descriptor, contracts, offer_types = timeline_ref
+    timeline = CaseTimeline(contract_ids=np.arange(contracts), offer_types=offer_types,
+                            **attach_arrays(descriptor))
+    return build_report(timeline, now, watermark)
+
+
+class ComputePool:
+    """
+    Расчёты дашборда в пуле процессов. Воркеры запускаются методом spawn (процесс бота многопоточный,
+    fork небезопасен) при первой задаче. workers=0, пустые данные или сбой пула — расчёт в текущем процессе.
+
+    Общая память держится для последних keep версий агрегата: задачи, начатые на предыдущей версии,
+    успевают дочитать свои данные.
+    """
+
+    def __init__(self, workers: int = 2, keep: int = 4):
+        self.workers = workers
+        self.keep = keep
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def view(self, dataset, period_level, period_value, selected_types) -> str:
+        """Представление для фильтров по Dataset из DatasetCache в виде JSON-строки."""
+        executor = self._pool()
+        if executor is not None and not dataset.empty:
+            try:
+                frame_ref = self._share_frame(dataset)
+                return executor.submit(view_task, frame_ref, period_level, period_value, selected_types).result()
+            except Exception as e:
+                print(f"Ошибка при расчёте представления в пуле процессов: {e}")
+                self._reset()
+
+        view = build_frame_view(plain_frame(dataset.frame), period_level, period_value, selected_types)
+        return json.dumps(view, cls=PlotlyJSONEncoder)
+
+    def report(self, timeline: Optional[CaseTimeline], now: int, watermark=None) -> Optional[AnalyticsReport]:
+        """build_report в воркере; колонки кейсов передаются через общую память только на время задачи."""
+        executor = self._pool()
+        if executor is not None and timeline is not None and len(timeline):
+            shared = None
+            try:
+                shared = SharedArrays({name: getattr(timeline, name) for name in TIMELINE_COLUMNS})
+                timeline_ref = (shared.descriptor, timeline.contracts, timeline.offer_types)
+                return executor.submit(report_task, timeline_ref, now, watermark).result()
+            except Exception as e:
+                print(f"Ошибка при расчёте аналитики в пуле процессов: {e}")
+                self._reset()
+            finally:
+                if shared is not None:
+                    shared.close()
+
+        return build_report(timeline, now, watermark)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            frames, self._frames = self._frames, OrderedDict()
+
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        for shared, _ in frames.values():
+            shared.close()
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=get_context('spawn'))
+
+            return self._executor
+
+    def _share_frame(self, dataset):
+        with self._lock:
+            entry = self._frames.get(dataset.version)
+            if entry is None:
+                shared, layout = share_frame(dataset.frame)
+                entry = self._frames[dataset.version] = (shared, (dataset.version, shared.descriptor, layout))
+
+                while len(self._frames) > self.keep:
+                    old, _ = self._frames.popitem(last=False)[1]
+                    old.close()
+            else:
+                self._frames.move_to_end(dataset.version)
+
+            return entry[1]
+
+    def _reset(self):
+        # Упавший воркер ломает весь ProcessPoolExecutor: следующая задача запустит новый пул
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_compute_pool(workers: int) -> ComputePool:
+    pool = ComputePool(workers)
+    atexit.register(pool.close)
+    return pool
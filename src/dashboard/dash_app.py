@@ -1,113 +1,165 @@
 import asyncio
+import datetime
+import json
+import threading
+from decimal import Decimal
 
 import dash
 import pandas as pd
 import plotly.express as px
-from dash import html, dcc, Input, Output, callback
+from plotly.utils import PlotlyJSONEncoder
+from dash import html, dcc, Input, Output, State, callback, clientside_callback, ClientsideFunction, no_update
 
+from src.analytics import ReasonIndex, ReportCache, load_case_timeline, load_new_reasons, month_label
 from src.config import Settings
-from src.repositories import Repositories
+from src.dashboard.api import register_api, register_event_stream, register_health
+from src.dashboard.compute import ComputePool, create_compute_pool
+from src.dashboard.dataset import AGGREGATE_COLUMNS, RELOAD, DatasetCache, frame_from_store, period_bounds
+from src.dashboard.figure_cache import FigureCache, cache_key
+from src.dashboard.figures import build_frame_view
+from src.events import EVENTS, CASE_RESOLVED, Event
+from src.repositories import Repositories, Statement
+from src.repositories.offer_repository import NO_OFFER
 
 REPOSITORIES: Repositories | None = None
 
-# === ИНИЦИАЛИЗАЦИЯ ПРИЛОЖЕНИЯ ===
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+# Общий для всех сессий кэш построенных представлений; размер и каталог задаются в init_dashboard
+FIGURE_CACHE = FigureCache()
 
-# === LAYOUT ===
-app.layout = html.Div([
-    # Хранилища: оригинальные загруженные данные (JSON) и текущая страница таблицы
-    dcc.Store(id='uploaded-data-store', data=None),
-
-    # Заголовок
-    html.Div([
-        html.H1("📊 Финансовый дашборд удержания клиентов",
-                style={'textAlign': 'center', 'color': '#1a365d', 'marginBottom': '10px', 'fontWeight': '700'}),
-        html.P(
-            "Анализ эффективности предложений по удержанию: доходы, расходы, прибыль и удержание клиентов.",
-            style={'textAlign': 'center', 'color': '#4a5568', 'fontSize': '16px',
-                   'maxWidth': '800px', 'margin': '0 auto 20px'}
-        ),
-    ], style={'padding': '20px', 'backgroundColor': '#f0f4f8', 'marginBottom': '20px'}),
+# Пул процессов для графиков и аналитики; до init_dashboard (бенчмарки, тесты колбэков) — расчёт в текущем процессе
+COMPUTE = ComputePool(workers=0)
+
+# Колбэки блоков срабатывают параллельно на одни и те же входы: представление строит только первый,
+# остальные ждут на том же локе и берут результат из кэша
+_VIEW_LOCKS = [threading.Lock() for _ in range(32)]
 
-    dcc.Interval(
-        id='interval-component',
-        interval=180*1000,
-        n_intervals=0
-    ),
+# Круговые диаграммы: подпись и id графика
+PIE_CHARTS = [
+    ("Доход", 'pie-income'),
+    ("Расходы", 'pie-expenses'),
+    ("Удержано клиентов", 'pie-retained'),
+    ("Ушло клиентов", 'pie-churned'),
+]
 
-    # Блок: Фильтры
-    html.Div([
-        html.H3("⚙️ Фильтры", style={'marginBottom': '15px', 'color': '#2d3748'}),
+# Сколько последних когорт и месяцев жизни показывать на тепловой карте
+COHORT_MONTHS = 24
 
-        # Тип предложения
+# === ИНИЦИАЛИЗАЦИЯ ПРИЛОЖЕНИЯ ===
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
+
+# === LAYOUT ===
+# Функция, а не готовое дерево: блоки собираются хелперами, объявленными ниже
+def serve_layout():
+    return html.Div([
+        # Хранилища: оригинальные загруженные данные (JSON) и текущая страница таблицы
+        dcc.Store(id='uploaded-data-store', data=None),
+        # Версия данных в Store: если она не изменилась, таймер не пересылает записи заново
+        dcc.Store(id='uploaded-data-version', data=None),
+        # Срабатывает из assets/live.js, когда сервер присылает событие о завершённом кейсе
+        dcc.Store(id='push-trigger', data=None),
+
+        # Заголовок
         html.Div([
-            html.Label("Тип предложения удержания:",
-                       style={'fontWeight': '600', 'display': 'block', 'marginBottom': '12px'}),
-            dcc.Checklist(
-                id='type-filters', options=[], value=[], inline=True,
-                labelStyle={
-                    'display': 'inline-block', 'marginRight': '20px', 'marginBottom': '8px',
-                    'padding': '6px 12px', 'backgroundColor': '#edf2f7',
-                    'borderRadius': '20px', 'cursor': 'pointer'
-                },
-                inputStyle={'marginRight': '8px'}
+            html.H1("📊 Финансовый дашборд удержания клиентов",
+                    style={'textAlign': 'center', 'color': '#1a365d', 'marginBottom': '10px', 'fontWeight': '700'}),
+            html.P(
+                "Анализ эффективности предложений по удержанию: доходы, расходы, прибыль и удержание клиентов.",
+                style={'textAlign': 'center', 'color': '#4a5568', 'fontSize': '16px',
+                       'maxWidth': '800px', 'margin': '0 auto 20px'}
             ),
-        ], style={'marginBottom': '25px'}),
+        ], style={'padding': '20px', 'backgroundColor': '#f0f4f8', 'marginBottom': '20px'}),
+
+        # Обновления приходят через SSE (/api/events); таймер — редкая страховка, если поток недоступен
+        dcc.Interval(
+            id='interval-component',
+            interval=600*1000,
+            n_intervals=0
+        ),
 
-        # Период анализа
+        # Блок: Фильтры
         html.Div([
-            html.Label("Период анализа:", style={'fontWeight': '600', 'display': 'block', 'marginBottom': '12px'}),
+            html.H3("⚙️ Фильтры", style={'marginBottom': '15px', 'color': '#2d3748'}),
+
+            # Тип предложения
             html.Div([
-                dcc.Dropdown(
-                    id='period-level',
-                    options=[{'label': 'Год', 'value': 'year'},
-                             {'label': 'Квартал', 'value': 'quarter'},
-                             {'label': 'Месяц', 'value': 'month'}],
-                    placeholder="Уровень", style={'flex': '1'}
+                html.Label("Тип предложения удержания:",
+                           style={'fontWeight': '600', 'display': 'block', 'marginBottom': '12px'}),
+                dcc.Checklist(
+                    id='type-filters', options=[], value=[], inline=True,
+                    labelStyle={
+                        'display': 'inline-block', 'marginRight': '20px', 'marginBottom': '8px',
+                        'padding': '6px 12px', 'backgroundColor': '#edf2f7',
+                        'borderRadius': '20px', 'cursor': 'pointer'
+                    },
+                    inputStyle={'marginRight': '8px'}
                 ),
-                dcc.Dropdown(id='period-selector', placeholder="Конкретный период", style={'flex': '1'})
-            ], style={'display': 'flex', 'gap': '10px'})
-        ])
-    ], style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
-              'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'}),
+            ], style={'marginBottom': '25px'}),
+
+            # Период анализа
+            html.Div([
+                html.Label("Период анализа:", style={'fontWeight': '600', 'display': 'block', 'marginBottom': '12px'}),
+                html.Div([
+                    dcc.Dropdown(
+                        id='period-level',
+                        options=[{'label': 'Год', 'value': 'year'},
+                                 {'label': 'Квартал', 'value': 'quarter'},
+                                 {'label': 'Месяц', 'value': 'month'}],
+                        placeholder="Уровень", style={'flex': '1'}
+                    ),
+                    dcc.Dropdown(id='period-selector', placeholder="Конкретный период", style={'flex': '1'})
+                ], style={'display': 'flex', 'gap': '10px'})
+            ])
+        ], style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
+                  'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'}),
+
+        html.Div(id='dashboard-message'),
+
+        # Блоки статичны, колбэки обновляют только значения KPI и свойства figure графиков.
+        # Класс блока (по нему ищет элемент сервис скриншотов) появляется, когда в блоке есть данные.
+        html.Div(make_kpi_block(), id='kpi-indicators', style={'marginBottom': '30px'}),
+        html.Div(make_graphs_section(), id='graphs-container'),
+        html.Div(make_analytics_section(), id='analytics-container'),
+
+        html.Div([
+            html.Hr(),
+            html.P("© 2025 MMOF", style={'textAlign': 'center', 'color': '#a0aec0', 'fontSize': '12px'})
+        ], style={'marginTop': '40px'})
+    ], style={
+        'padding': '10px 30px',
+        'fontFamily': '"Segoe UI", Tahoma, Geneva, Verdana, sans-serif',
+        'backgroundColor': '#f8fafc', 'minHeight': '100vh'
+    })
 
-    html.Div(id='kpi-indicators', style={'marginBottom': '30px'}),
-    html.Div(id='graphs-container'),
 
-    html.Div([
-        html.Hr(),
-        html.P("© 2025 MMOF", style={'textAlign': 'center', 'color': '#a0aec0', 'fontSize': '12px'})
-    ], style={'marginTop': '40px'})
-], style={
-    'padding': '10px 30px',
-    'fontFamily': '"Segoe UI", Tahoma, Geneva, Verdana, sans-serif',
-    'backgroundColor': '#f8fafc', 'minHeight': '100vh'
-})
+app.layout = serve_layout
+
 
 @callback(
     Output('uploaded-data-store', 'data'),
-    Input('interval-component', 'n_intervals') # Триггер: таймер
+    Output('uploaded-data-version', 'data'),
+    Input('interval-component', 'n_intervals'), # Триггер: таймер
+    Input('push-trigger', 'data'),  # Триггер: событие от бота
+    State('uploaded-data-version', 'data')
 )
-def load_data_and_store(n_intervals):
-    df = load_data_sync()
+def load_data_and_store(n_intervals, pushed_at, current_version):
+    # Агрегат загружается один раз на все сессии (DatasetCache), payload Store строится один раз на версию
+    dataset = DATASET.get()
 
-    if df.empty:
+    if dataset.empty:
         # Если данные пусты, возвращаем ошибку
-        return {'error': "Не удалось загрузить данные из базы данных или данных нет."}
-
-    # Преобразуем DataFrame в JSON-сериализуемый словарь (records)
-    df2 = df.copy()
-    df2['Дата'] = df2['Дата'].astype(str)
+        return {'error': "Не удалось загрузить данные из базы данных или данных нет."}, None
 
-    records = df2.to_dict(orient='records')
-    columns = list(df2.columns)
+    if dataset.version == current_version:
+        # Данные в браузере актуальны: ни пересылки Store, ни перерисовки блоков
+        return no_update, no_update
 
-    # Сохраняем только записи и колонки (без ненужного сброса страницы)
-    return {'records': records, 'columns': columns}
+    return dataset.store_payload(), dataset.version
 
 
 # === CALLBACK: Обновление фильтров на основе загруженных данных ===
-@callback(
+# Опции строятся в браузере (assets/filters.js) по спискам месяцев и типов, сохранённым вместе с данными
+clientside_callback(
+    ClientsideFunction(namespace='filters', function_name='options'),
     Output('type-filters', 'options'),
     Output('type-filters', 'value'),
     Output('period-selector', 'options'),
@@ -115,206 +167,345 @@ def load_data_and_store(n_intervals):
     Input('uploaded-data-store', 'data'),  # Триггер: обновленные данные из БД
     Input('period-level', 'value'),
 )
-def update_filters_from_store(store_data, period_level):
-    if not store_data or store_data.get('error'):
-        return [], [], [], "Нет данных"
 
-    # Преобразуем записи обратно в DataFrame для работы с Pandas/временными рядами
-    df = pd.DataFrame.from_records(store_data['records'])
-    df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
+# === CALLBACK'И БЛОКОВ: каждый блок обновляется своим колбэком (на основе Store) ===
+VIEW_INPUTS = [
+    Input('uploaded-data-store', 'data'),
+    Input('period-level', 'value'),
+    Input('period-selector', 'value'),
+    Input('type-filters', 'value')
+]
+
 
-    type_options = [{'label': t, 'value': t} for t in sorted(df['Тип предложения удержания'].unique())]
-    type_value = [opt['value'] for opt in type_options]  # По умолчанию выбираем все
+@callback(
+    Output('dashboard-message', 'children'),
+    Output('kpi-indicators', 'style'),
+    Output('graphs-container', 'style'),
+    Output('kpi-card', 'className'),
+    Output('kpi-profit', 'children'),
+    Output('kpi-retention-rate', 'children'),
+    Output('kpi-cost-per-retained', 'children'),
+    Output('kpi-profit-per-retained', 'children'),
+    *VIEW_INPUTS
+)
+def update_kpis(store_data, period_level, period_value, selected_types):
+    view = get_view(store_data, period_level, period_value, selected_types)
+
+    if 'message' in view:
+        # Блоки скрываются целиком, их содержимое не пересылается
+        message = html.Div(view['message'], style={'color': view['color'], 'textAlign': 'center'})
+        return message, {'display': 'none'}, {'display': 'none'}, '', no_update, no_update, no_update, no_update
 
-    period_options, placeholder = [], "Выберите уровень периода"
+    kpis = view['kpis']
+    return (
+        None, {'marginBottom': '30px'}, {}, 'kpi-indicators',
+        f"{kpis['profit']:,.0f} ₽",
+        f"{kpis['retention_rate']:.1f}%",
+        f"{kpis['cost_per_retained']:,.0f} ₽",
+        f"{kpis['profit_per_retained']:,.0f} ₽",
+    )
 
-    # Мы используем вашу старую функцию get_periods, но она теперь принимает DataFrame из Store.
-    if period_level:
-        # ВАЖНО: Ваша старая get_periods работает с datetime-объектами.
-        # Поскольку мы группируем по 'YYYY-MM', нам нужно адаптировать логику.
-        if period_level == 'year':
-            periods = sorted(df['Дата'].dt.year.unique())
-        elif period_level == 'quarter':
-            periods = sorted(df['Дата'].dt.to_period('Q').astype(str).unique())
-        elif period_level == 'month':
-            periods = sorted(df['Дата'].dt.strftime('%Y-%m').unique())  # используем YYYY-MM
 
-        period_options = [{'label': str(p), 'value': str(p)} for p in periods]
-        placeholder = "Выберите период" if period_options else "Нет данных"
+@callback(
+    Output('revenue-expense-figure', 'figure'),
+    Output('revenue-expense-block', 'className'),
+    *VIEW_INPUTS
+)
+def update_revenue_graph(store_data, period_level, period_value, selected_types):
+    view = get_view(store_data, period_level, period_value, selected_types)
+    if 'message' in view:
+        return no_update, ''
 
-    return type_options, type_value, period_options, placeholder
+    return view['figures']['revenue'], 'revenue-expense-graph'
 
 
-# === CALLBACK: Основное обновление KPI и графиков (на основе Store) ===
 @callback(
-    Output('kpi-indicators', 'children'),
-    Output('graphs-container', 'children'),
-    Input('uploaded-data-store', 'data'),
+    *[Output(graph_id, 'figure') for _, graph_id in PIE_CHARTS],
+    Output('pie-charts-wrapper', 'className'),
+    *VIEW_INPUTS
+)
+def update_pie_charts(store_data, period_level, period_value, selected_types):
+    view = get_view(store_data, period_level, period_value, selected_types)
+    if 'message' in view:
+        return *[no_update for _ in PIE_CHARTS], ''
+
+    return *[view['figures']['pies'][name] for name, _ in PIE_CHARTS], 'pie-charts-block'
+
+
+@callback(
+    Output('profit-histogram-figure', 'figure'),
+    Output('profit-histogram-block', 'className'),
+    *VIEW_INPUTS
+)
+def update_profit_histogram(store_data, period_level, period_value, selected_types):
+    view = get_view(store_data, period_level, period_value, selected_types)
+    if 'message' in view:
+        return no_update, ''
+
+    return view['figures']['histogram'], 'profit-histogram'
+
+
+@callback(
+    Output('profit-retention-figure', 'figure'),
+    Output('profit-retention-block', 'className'),
+    *VIEW_INPUTS
+)
+def update_profit_scatter(store_data, period_level, period_value, selected_types):
+    view = get_view(store_data, period_level, period_value, selected_types)
+    if 'message' in view:
+        return no_update, ''
+
+    return view['figures']['scatter'], 'profit-retention-scatter'
+
+
+# === CALLBACK'И АНАЛИТИКИ: когорты, отток и LTV из предрасчитанного отчёта (src.analytics) ===
+# Отчёт строится по всем кейсам и не зависит от периода; Store с версией данных служит сигналом проверить его свежесть
+
+@callback(
+    Output('cohort-retention-figure', 'figure'),
+    Output('cohort-retention-block', 'className'),
+    Input('uploaded-data-version', 'data')
+)
+def update_cohort_retention(version):
+    report = ANALYTICS.get()
+    if report is None or report.cohorts.empty:
+        return no_update, ''
+
+    return build_cohort_figure(report.cohorts), 'cohort-retention'
+
+
+@callback(
+    Output('churn-by-offer-figure', 'figure'),
+    Output('churn-by-offer-block', 'className'),
+    Input('uploaded-data-version', 'data'),
+    Input('type-filters', 'value')
+)
+def update_churn_by_offer(version, selected_types):
+    report = ANALYTICS.get()
+    if report is None:
+        return no_update, ''
+
+    churn = report.churn[report.churn['cases'] > 0]
+    if selected_types:
+        churn = churn[churn['offer_type'].isin(selected_types)]
+
+    fig = px.bar(churn.sort_values('churn_rate'), x='offer_type', y='churn_rate',
+                 labels={'offer_type': 'Тип предложения', 'churn_rate': 'Доля ушедших'},
+                 hover_data={'cases': True, 'churned': True})
+    fig.update_layout(title=None, showlegend=False, margin=dict(t=20), yaxis_tickformat='.0%')
+
+    return fig, 'churn-by-offer'
+
+
+@callback(
+    Output('ltv-figure', 'figure'),
+    Output('ltv-overall', 'children'),
+    Output('ltv-block', 'className'),
+    Input('uploaded-data-version', 'data'),
+    Input('type-filters', 'value')
+)
+def update_ltv(version, selected_types):
+    report = ANALYTICS.get()
+    if report is None:
+        return no_update, no_update, ''
+
+    ltv = report.ltv
+    if selected_types:
+        ltv = ltv[ltv['offer_type'].isin(selected_types)]
+
+    fig = px.bar(ltv.sort_values('ltv'), x='offer_type', y='ltv',
+                 labels={'offer_type': 'Тип предложения', 'ltv': 'LTV удержанного (₽)'},
+                 hover_data={'monthly_profit': ':,.0f', 'offer_cost': ':,.0f', 'lifetime': ':.1f'})
+    fig.update_layout(title=None, showlegend=False, margin=dict(t=20))
+
+    overall = report.overall
+    summary = (f"LTV контракта: {overall['ltv']:,.0f} ₽ · месячный отток {overall['monthly_churn']:.1%} · "
+               f"ожидаемая жизнь {overall['lifetime']:.1f} мес. · контрактов {overall['contracts']:,}")
+
+    return fig, summary, 'ltv-estimate'
+
+
+@callback(
+    Output('top-reasons-figure', 'figure'),
+    Output('top-terms-figure', 'figure'),
+    Output('reasons-block', 'className'),
+    Input('uploaded-data-version', 'data'),
     Input('period-level', 'value'),
     Input('period-selector', 'value'),
     Input('type-filters', 'value')
 )
-def update_visuals_from_store(store_data, period_level, period_value, selected_types):
+def update_reasons(version, period_level, period_value, selected_types):
+    # Индекс дочитывает только кейсы, созданные после его водяного знака
+    REASONS.refresh()
+
+    lo, hi = (period_bounds(period_level, period_value) if period_level and period_value else None) or (None, None)
+    reasons = REASONS.top_reasons(lo, hi, selected_types, limit=10)
+    terms = REASONS.top_terms(lo, hi, selected_types, limit=15)
+
+    # Пустой период показывает пустые графики, а не причины из прошлого выбора
+    return (build_top_figure(reasons, 'Причина'), build_top_figure(terms, 'Слово'),
+            'reasons-top' if not reasons.empty else '')
+
+
+def get_view(store_data, period_level, period_value, selected_types) -> dict:
+    """
+    Представление для текущих фильтров: {'kpis', 'figures'} в виде JSON-совместимых словарей
+    либо {'message', 'color'}, если показывать нечего. Берётся из кэша графиков или строится один раз.
+    """
     if not store_data or store_data.get('error'):
-        msg = store_data.get('error', "Нет данных для отображения. Проверьте подключение к БД.")
-        return html.Div(msg, style={'color': 'red', 'textAlign': 'center'}), html.Div()
-
-    df = pd.DataFrame.from_records(store_data['records'])
-    df['Дата'] = pd.to_datetime(df['Дата'], errors='coerce')
-
-    # ... (логика фильтрации и визуализации из вашего старого update_visuals) ...
-
-    # ... (продолжение логики)
-    if not selected_types:
-        selected_types = df['Тип предложения удержания'].unique().tolist()
-
-    df_filtered = df[df['Тип предложения удержания'].isin(selected_types)].copy()
-    if df_filtered.empty:
-        return html.Div("Нет данных после фильтрации.", style={'color': 'orange', 'textAlign': 'center'}), html.Div()
-
-    # Фильтрация по периоду (адаптируем вашу старую функцию)
-    if period_level and period_value:
-
-        # Переводим 'Дата' в нужный формат для фильтрации
-        if period_level == 'year':
-            df_final = df_filtered[df_filtered['Дата'].dt.year == int(period_value)]
-        elif period_level == 'quarter':
-            # period_value - это строка типа '2024Q4'
-            df_final = df_filtered[df_filtered['Дата'].dt.to_period('Q').astype(str) == period_value]
-        elif period_level == 'month':
-            # period_value - это строка типа '2024-11'
-            df_final = df_filtered[df_filtered['Дата'].dt.strftime('%Y-%m') == period_value]
-        else:
-            df_final = df_filtered
-
-    else:
-        df_final = df_filtered
-
-    if df_final.empty:
-        return html.Div("Нет данных для выбранного периода.",
-                        style={'color': 'orange', 'textAlign': 'center'}), html.Div()
-
-    # === KPI ===
-    total_retained = df_final['Клиентов удержано'].sum()
-    total_churned = df_final['Ушло клиентов'].sum()
-    total_income = df_final['Доход'].sum()
-    total_expenses = df_final['Расходы'].sum()
-    total_profit = total_income - total_expenses
-
-    retention_rate = (total_retained / (total_retained + total_churned) * 100) if (
-                total_retained + total_churned) else 0
-    cost_per_retained = total_expenses / total_retained if total_retained else 0
-    profit_per_retained = total_profit / total_retained if total_retained else 0
-
-    # Группировка по Дате (месяцу) для графика линии
-    df_monthly = df_final.groupby('Дата')[['Доход', 'Расходы']].sum().reset_index()
-
-    kpi_card = html.Div([
-        html.H3("📈 Ключевые показатели", style={'marginBottom': '20px', 'color': '#2d3748'}),
-        html.Div([
-            make_kpi("Прибыль", f"{total_profit:,.0f} ₽", "#27ae60", "#f0fff4"),
-            make_kpi("Эффективность удержания", f"{retention_rate:.1f}%", "#38a169", "#f0fff4"),
-            make_kpi("Расходы на удержание", f"{cost_per_retained:,.0f} ₽", "#d97706", "#fffbeb"),
-            make_kpi("Прибыль на клиента", f"{profit_per_retained:,.0f} ₽", "#2b6cb0", "#ebf8ff"),
-        ], style={'display': 'flex', 'justifyContent': 'space-between', 'flexWrap': 'wrap'})
-    ], className="kpi-indicators", style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
-              'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'})
+        msg = (store_data or {}).get('error', "Нет данных для отображения. Проверьте подключение к БД.")
+        return {'message': msg, 'color': 'red'}
+
+    if not store_data.get('version'):
+        return json.loads(json.dumps(build_view(store_data, period_level, period_value, selected_types),
+                                     cls=PlotlyJSONEncoder))
+
+    key = cache_key(store_data['version'], selected_types or [], period_level, period_value)
 
-    # === ВИЗУАЛИЗАЦИИ ===
-    fig1 = px.line(df_monthly, x='Дата', y=['Доход', 'Расходы'],
-                   labels={'value': 'Сумма (₽)', 'variable': 'Показатель'})
-    fig1.update_layout(title=None, showlegend=False, margin=dict(t=20))
-    # ... (Остальные графики: pies, fig_hist, fig_scatter) ...
+    with _VIEW_LOCKS[int(key[:8], 16) % len(_VIEW_LOCKS)]:
+        cached = FIGURE_CACHE.get(key)
+        if cached is None:
+            # Без БД (бенчмарки, отладка) сверять с агрегатом не с чем — строим из данных браузера
+            dataset = DATASET.get() if REPOSITORIES is not None else None
+            if dataset is not None and dataset.version == store_data['version']:
+                # Данные браузера совпадают с кэшем агрегата: считаем в пуле процессов по общей памяти
+                cached = COMPUTE.view(dataset, period_level, period_value, selected_types)
+            else:
+                cached = json.dumps(build_view(store_data, period_level, period_value, selected_types),
+                                    cls=PlotlyJSONEncoder)
+            FIGURE_CACHE.put(key, cached)
 
-    pies = {
-        "Доход": px.pie(df_final, names='Тип предложения удержания', values='Доход'),
-        "Расходы": px.pie(df_final, names='Тип предложения удержания', values='Расходы'),
-        "Удержано клиентов": px.pie(df_final, names='Тип предложения удержания', values='Клиентов удержано'),
-        "Ушло клиентов": px.pie(df_final, names='Тип предложения удержания', values='Ушло клиентов')
-    }
+    return json.loads(cached)
 
-    for fig in pies.values():
-        fig.update_layout(title=None, showlegend=False, margin=dict(t=20, b=20))
 
-    fig_hist = px.histogram(df_final, x='Прибыль', nbins=6)
-    fig_hist.update_layout(title=None, showlegend=False, margin=dict(t=20))
+def build_view(store_data, period_level, period_value, selected_types) -> dict:
+    return build_frame_view(frame_from_store(store_data), period_level, period_value, selected_types)
 
-    fig_scatter = px.scatter(df_final, x='Клиентов удержано', y='Прибыль',
-                             color='Тип предложения удержания', size='Доход')
-    fig_scatter.update_layout(title=None, showlegend=False, margin=dict(t=20))
+# === ПОСТРОЕНИЕ ГРАФИКОВ И БЛОКОВ ===
 
-    graphs_section = html.Div([
+def make_kpi_block():
+    """Создаёт блок ключевых показателей; значения заполняет колбэк update_kpis."""
+    return html.Div([
+        html.H3("📈 Ключевые показатели", style={'marginBottom': '20px', 'color': '#2d3748'}),
+        html.Div([
+            make_kpi("Прибыль", 'kpi-profit', "#27ae60", "#f0fff4"),
+            make_kpi("Эффективность удержания", 'kpi-retention-rate', "#38a169", "#f0fff4"),
+            make_kpi("Расходы на удержание", 'kpi-cost-per-retained', "#d97706", "#fffbeb"),
+            make_kpi("Прибыль на клиента", 'kpi-profit-per-retained', "#2b6cb0", "#ebf8ff"),
+        ], style={'display': 'flex', 'justifyContent': 'space-between', 'flexWrap': 'wrap'})
+    ], id='kpi-card', style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
+              'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'})
+
+
+def make_graphs_section():
+    """Собирает блоки графиков; имена классов (их выставляют колбэки) используются сервисом скриншотов."""
+    return html.Div([
         html.Div([
             make_graph_block("📈 Суммарные доходы и расходы по датам",
-                             "Динамика финансовых потоков с учётом выбранных типов предложений и периода.", fig1)
-        ], className='revenue-expense-graph'),
+                             "Динамика финансовых потоков с учётом выбранных типов предложений и периода.",
+                             'revenue-expense-figure')
+        ], id='revenue-expense-block'),
 
         html.Div([
-            make_pie_block(pies),
-        ], className='pie-charts-block'),
+            make_pie_block(),
+        ], id='pie-charts-wrapper'),
 
         html.Div([
             make_graph_block("📊 Распределение прибыли",
-                             "Частота различных уровней прибыли по операциям удержания.", fig_hist),
-        ], className='profit-histogram'),
+                             "Частота различных уровней прибыли по операциям удержания.", 'profit-histogram-figure'),
+        ], id='profit-histogram-block'),
 
         html.Div([
             make_graph_block("🔍 Корреляция: Прибыль и удержанные клиенты",
                              "Зависимость финансового результата от количества удержанных клиентов по типам предложений.",
-                             fig_scatter)
-        ], className='profit-retention-scatter')
+                             'profit-retention-figure')
+        ], id='profit-retention-block')
     ])
 
-    return kpi_card, graphs_section
-
 #
 
-def get_periods(df, level):
-    """Возвращает список значений для выпадающего списка выбора периода."""
-    if level == 'year':
-        return [{'label': str(y), 'value': str(y)} for y in sorted(df['Дата'].dt.year.unique())]
-    elif level == 'quarter':
-        df['Quarter'] = df['Дата'].dt.to_period('Q').astype(str)
-        return [{'label': q, 'value': q} for q in sorted(df['Quarter'].unique())]
-    elif level == 'month':
-        df['Month'] = df['Дата'].dt.to_period('M').astype(str)
-        return [{'label': m, 'value': m} for m in sorted(df['Month'].unique())]
-    return []
-
-
-def filter_data_by_period(df, level, period_value):
-    """Фильтрует данные по выбранному периоду (год, квартал, месяц)."""
-    if level == 'year':
-        return df[df['Дата'].dt.year == int(period_value)]
-    elif level == 'quarter':
-        year, q = period_value.split('Q')
-        return df[(df['Дата'].dt.year == int(year)) & (df['Дата'].dt.quarter == int(q))]
-    elif level == 'month':
-        return df[df['Дата'].dt.to_period('M').astype(str) == period_value]
-    return df
+def make_analytics_section():
+    """Блоки когорт, оттока по типам предложений и LTV; классы выставляют колбэки аналитики."""
+    return html.Div([
+        html.Div([
+            make_graph_block("🧭 Когортное удержание",
+                             "Доля контрактов, оставшихся через N месяцев после первого кейса удержания, по месяцам первого кейса.",
+                             'cohort-retention-figure')
+        ], id='cohort-retention-block'),
 
-#
+        html.Div([
+            make_graph_block("📉 Отток по типам предложений",
+                             "Доля завершённых кейсов, закончившихся уходом клиента.", 'churn-by-offer-figure')
+        ], id='churn-by-offer-block'),
+
+        html.Div([
+            make_graph_block("💎 Оценка LTV удержанного клиента",
+                             "Месячная прибыль удержанных клиентов, умноженная на ожидаемое время до ухода, за вычетом стоимости предложения.",
+                             'ltv-figure'),
+            html.P(id='ltv-overall', style={'textAlign': 'center', 'color': '#4a5568', 'marginTop': '-10px'})
+        ], id='ltv-block'),
+
+        html.Div([
+            html.Div([
+                html.H4("🗣 Причины отказа",
+                        style={'marginBottom': '10px', 'color': '#2d3748', 'fontWeight': '600'}),
+                html.P("Самые частые причины (после нормализации текста) и слова в них за выбранный период "
+                       "и по выбранным типам предложений; месяц — по дате создания кейса.",
+                       style={'fontSize': '13px', 'color': '#718096', 'marginBottom': '15px'}),
+                html.Div([
+                    dcc.Graph(id='top-reasons-figure', style={'flex': '1'}),
+                    dcc.Graph(id='top-terms-figure', style={'flex': '1'}),
+                ], style={'display': 'flex', 'gap': '20px'})
+            ], style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
+                      'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'})
+        ], id='reasons-block')
+    ])
+
+
+def build_cohort_figure(cohorts: pd.DataFrame):
+    # Последние COHORT_MONTHS когорт на первых COHORT_MONTHS месяцах жизни — дальше тепловая карта нечитаема
+    recent = cohorts.tail(COHORT_MONTHS)
+    ages = [age for age in recent.columns if age != 'size'][:COHORT_MONTHS]
+
+    fig = px.imshow(recent[ages].to_numpy() * 100, x=[str(age) for age in ages],
+                    y=[f"{month_label(key)} ({size:,})" for key, size in zip(recent.index, recent['size'])],
+                    labels={'x': 'Месяцев с первого кейса', 'y': 'Когорта (контрактов)', 'color': 'Удержано, %'},
+                    color_continuous_scale='Blues', zmin=0, zmax=100, aspect='auto')
+    fig.update_layout(title=None, margin=dict(t=20))
+
+    return fig
+
+
+def build_top_figure(counts: pd.Series, label: str):
+    # Горизонтальные столбцы: самый частый элемент сверху
+    frame = counts.rename_axis(label).reset_index(name='Кейсов').iloc[::-1]
+
+    fig = px.bar(frame, x='Кейсов', y=label, orientation='h')
+    fig.update_layout(title=None, showlegend=False, margin=dict(t=20), yaxis_title=None)
 
-def make_kpi(title, value, color, bg):
+    return fig
+
+
+def make_kpi(title, value_id, color, bg):
     """Создаёт карточку KPI."""
     return html.Div([
         html.H4(title, style={'margin': 0, 'color': '#4a5568', 'fontSize': '14px'}),
-        html.P(value, style={'fontSize': '26px', 'fontWeight': 'bold', 'color': color})
+        html.P(id=value_id, style={'fontSize': '26px', 'fontWeight': 'bold', 'color': color})
     ], style={'width': '23%', 'textAlign': 'center', 'padding': '15px',
               'backgroundColor': bg, 'borderRadius': '10px'})
 
 
-def make_graph_block(title, desc, fig):
+def make_graph_block(title, desc, graph_id):
     """Создаёт стандартный блок графика с заголовком и описанием."""
     return html.Div([
         html.H4(title, style={'marginBottom': '10px', 'color': '#2d3748', 'fontWeight': '600'}),
         html.P(desc, style={'fontSize': '13px', 'color': '#718096', 'marginBottom': '15px'}),
-        dcc.Graph(figure=fig)
+        dcc.Graph(id=graph_id)
     ], style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
               'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'})
 
 
-def make_pie_block(pies):
+def make_pie_block():
     """Создаёт блок из четырёх круговых диаграмм."""
     return html.Div([
         html.H4("🍩 Распределение по типам удержания",
@@ -323,36 +514,138 @@ def make_pie_block(pies):
                style={'fontSize': '13px', 'color': '#718096', 'marginBottom': '20px'}),
         html.Div([html.Div([
             html.P(name, style={'textAlign': 'center', 'fontWeight': '600', 'marginBottom': '8px'}),
-            dcc.Graph(figure=fig, style={'height': '300px'})
-        ], style={'width': 'calc(25% - 20px)', 'margin': '10px'}) for name, fig in pies.items()
+            dcc.Graph(id=graph_id, style={'height': '300px'})
+        ], style={'width': 'calc(25% - 20px)', 'margin': '10px'}) for name, graph_id in PIE_CHARTS
         ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'flex-start'})
     ], style={'padding': '20px', 'backgroundColor': '#ffffff', 'borderRadius': '12px',
               'boxShadow': '0 4px 6px rgba(0,0,0,0.05)', 'marginBottom': '25px'})
 
 #
 
+# Агрегат считается на каждом шарде по офферам (таблица offers есть только на primary), затем
+# офферы заменяются типами и стоимостью и строки шардов складываются в merge_aggregate.
+# Архивированные месяцы берутся из свода retention_rollup; p_open (незавершённые кейсы) не читается
+AGGREGATE_SELECT = """
+    SELECT 
+        DATE_FORMAT(rc.completed_at, '%%Y-%%m') AS month,
+        rc.proposed_offer_id,
+        SUM(c.monthly_profit),
+        COUNT(*),
+        SUM(IF(rc.status = 'churned', 1, 0)),
+        SUM(IF(rc.status = 'retained', 1, 0))
+    FROM retention_cases rc
+         JOIN contracts c ON rc.contract_id = c.contract_id
+    WHERE rc.status IN ('churned', 'retained')
+      AND rc.completed_month > 0
+      {range}
+    GROUP BY month, rc.proposed_offer_id
+    UNION ALL
+    SELECT
+        CONCAT(completed_month DIV 12, '-', LPAD(completed_month %% 12 + 1, 2, '0')),
+        NULLIF(proposed_offer_id, 0),
+        income,
+        cases,
+        churned,
+        retained
+    FROM retention_rollup
+    WHERE TRUE {rollup_range};
+"""
+
+AGGREGATE = Statement("dashboard.aggregate", AGGREGATE_SELECT.format(range="", rollup_range=""))
+
+# Пересчёт только затронутых месяцев [lo, hi) — по ключу партиций, читаются только их партиции
+AGGREGATE_RANGE = Statement("dashboard.aggregate_range", AGGREGATE_SELECT.format(
+    range="AND rc.completed_month >= %s AND rc.completed_month < %s",
+    rollup_range="AND completed_month >= %s AND completed_month < %s"
+))
+
+# Водяной знак шарда: максимумы берутся из индексов (PRIMARY и idx_retention_cases_completed_at), число
+# открытых кейсов — из маленькой партиции p_open. Новый кейс увеличивает case_id, завершение кейса уменьшает
+# число открытых (completed_at в пределах секунды может не измениться), удаления и правки дохода
+# контрактов увеличивают счётчик retention_changes
+WATERMARK = Statement("dashboard.watermark", """
+    SELECT
+        (SELECT MAX(case_id) FROM retention_cases),
+        (SELECT MAX(completed_at) FROM retention_cases),
+        (SELECT COUNT(*) FROM retention_cases WHERE completed_month = 0),
+        (SELECT COALESCE(MAX(version), 0) FROM retention_changes)
+""")
+
+# completed_at хранится с точностью до секунды: секунда водяного знака перечитывается
+CHANGED_MONTHS = Statement("dashboard.changed_months", """
+    SELECT DISTINCT YEAR(completed_at) * 12 + MONTH(completed_at) - 1
+    FROM retention_cases
+    WHERE completed_at >= %s
+    UNION
+    SELECT DISTINCT YEAR(completed_at) * 12 + MONTH(completed_at) - 1
+    FROM retention_cases
+    WHERE case_id > %s AND completed_at IS NOT NULL
+""")
+
+
+def merge_aggregate(parts, offers: dict) -> list:
+    """Строки шардов (месяц, оффер, доход, кейсов, ушло, удержано) -> строки AGGREGATE_COLUMNS по типам предложений."""
+    totals = {}
+    for month, offer_id, income, cases, churned, retained in (row for rows in parts for row in rows):
+        offer_type, cost = offers.get(offer_id, NO_OFFER)
+        # Суммы остаются Decimal, как у SUM в MySQL: колонки агрегата однородны для пула расчётов
+        total = totals.setdefault((month, offer_type), [Decimal(0)] * 4)
+        total[0] += income
+        total[1] += cost * cases
+        total[2] += churned
+        total[3] += retained
+
+    return [(month, offer_type, *total) for (month, offer_type), total in totals.items()]
+
+
+def aggregate_frame(data) -> pd.DataFrame:
+    df = pd.DataFrame(data, columns=AGGREGATE_COLUMNS)
+    df['Прибыль'] = df['Доход'] - df['Расходы']
+    return df
+
+
 async def load_data_from_db_async():
-    async with REPOSITORIES.database as conn:
-        query = """
-                SELECT 
-                    DATE_FORMAT(rc.completed_at, '%%Y-%%m') AS "Дата",
-                    COALESCE(o.offer_type, 'Не указано')  AS "Тип предложения удержания",
-                    SUM(c.monthly_profit)                 AS "Доход", 
-                    SUM(COALESCE(o.cost, 0))              AS "Расходы", 
-                    SUM(IF(rc.status = 'churned', 1, 0))  AS "Ушло клиентов",
-                    SUM(IF(rc.status = 'retained', 1, 0)) AS "Клиентов удержано"
-                FROM retention_cases rc
-                     JOIN contracts c ON rc.contract_id = c.contract_id
-                     LEFT JOIN offers o ON rc.proposed_offer_id = o.offer_id
-                WHERE rc.status IN ('churned', 'retained')
-                  AND rc.completed_at IS NOT NULL
-                GROUP BY 
-                    DATE_FORMAT(rc.completed_at, '%%Y-%%m'),
-                    COALESCE(o.offer_type, 'Не указано');
-                """
-
-        data = await conn.select_all(query)
-        return data
+    async with REPOSITORIES.database.replica():
+        offers = await REPOSITORIES.offers.get_type_costs()
+        parts = await REPOSITORIES.shards.each(lambda shard: shard.select_all(AGGREGATE))
+
+    return merge_aggregate(parts, offers)
+
+
+async def load_changes_from_db_async(watermark, current):
+    """
+    Месяцы, затронутые кейсами после водяного знака своего шарда, и их свежий агрегат со всех шардов.
+    RELOAD — если на каком-то шарде изменился счётчик retention_changes: удалённые строки месяцев не выдают.
+    """
+    shards = REPOSITORIES.shards.shards
+    if any(old[3] != new[3] for old, new in zip(watermark, current)):
+        return RELOAD
+
+    async def changed_months(shard):
+        # Шард, добавленный после чтения знака, просматривается целиком
+        index = shards.index(shard)
+        max_case_id, max_completed_at, _, _ = watermark[index] if index < len(watermark) else (None, None, 0, 0)
+
+        return await shard.select_all(CHANGED_MONTHS, max_completed_at or datetime.datetime.min, max_case_id or 0)
+
+    async with REPOSITORIES.database.replica():
+        months = [row[0] for rows in await REPOSITORIES.shards.each(changed_months) for row in rows]
+        if not months:
+            return None
+
+        lo, hi = min(months), max(months) + 1
+        offers = await REPOSITORIES.offers.get_type_costs()
+        parts = await REPOSITORIES.shards.each(
+            lambda shard: shard.select_all(AGGREGATE_RANGE, lo, hi, lo, hi)
+        )
+
+    return lo, hi, merge_aggregate(parts, offers)
+
+
+async def load_watermark_async():
+    # Знак — максимумы каждого шарда: номера кейсов разных шардов не растут согласованно
+    async with REPOSITORIES.database.replica():
+        return tuple(tuple(row) for row in await REPOSITORIES.shards.each(lambda shard: shard.select_one(WATERMARK)))
 
 
 def load_data_sync() -> pd.DataFrame:
@@ -362,20 +655,71 @@ def load_data_sync() -> pd.DataFrame:
         if not data:
             return pd.DataFrame()
 
-        df = pd.DataFrame(data)
-        df['Прибыль'] = df['Доход'] - df['Расходы']
-
-        return df
+        return aggregate_frame(data)
 
     except Exception as e:
         print(f"Ошибка при загрузке данных из БД: {e}")
         return pd.DataFrame()
 
+
+def load_watermark_sync():
+    return asyncio.run(load_watermark_async())
+
+
+def load_changes_sync(watermark, current):
+    changes = asyncio.run(load_changes_from_db_async(watermark, current))
+    if changes is None or changes is RELOAD:
+        return changes
+
+    lo, hi, data = changes
+    return lo, hi, aggregate_frame(data)
+
+
+# Последний агрегат из БД, общий для колбэков и /api/aggregate. Раз в max_age секунд проверяется
+# водяной знак; при изменениях пересчитываются только затронутые месяцы
+DATASET = DatasetCache(load_data_sync, max_age=10, watermark=load_watermark_sync, changes=load_changes_sync)
+register_api(app.server, DATASET)
+
+
+def load_timeline_sync():
+    return asyncio.run(load_case_timeline(REPOSITORIES))
+
+
+def load_new_reasons_sync(after: tuple):
+    return asyncio.run(load_new_reasons(REPOSITORIES, after))
+
+
+# Частоты причин отказа по месяцам и типам предложений; обновляется только новыми кейсами, не чаще раза в минуту
+REASONS = ReasonIndex(load_new_reasons_sync, max_age=60)
+
+def build_report_in_pool(timeline, now, watermark):
+    return COMPUTE.report(timeline, now, watermark)
+
+
+# Когорты, отток и LTV по всем кейсам: пересчитываются при смене месяца или водяного знака, не чаще раза в 10 минут
+ANALYTICS = ReportCache(load_timeline_sync, max_age=600, watermark=load_watermark_sync,
+                        builder=build_report_in_pool)
+
+
+def on_case_resolved(event: Event):
+    # Вызывается в потоке бота до рассылки события браузерам: их запрос уже увидит новый водяной знак
+    if event.topic == CASE_RESOLVED:
+        DATASET.expire()
+
+
+EVENTS.add_handler(on_case_resolved)
+register_event_stream(app.server, EVENTS)
+register_health(app.server)
+
 #
 
-def init_dashboard(repositories: Repositories, settings: Settings):
-    global REPOSITORIES
+def init_dashboard(repositories: Repositories, settings: Settings, port=None):
+    """Запускает сервер Dash (блокирующий вызов); port — для реплик дашборда под супервизором."""
+    global REPOSITORIES, FIGURE_CACHE, COMPUTE
 
     REPOSITORIES = repositories
+    app.server.config['EVENTS_TOKEN'] = settings.events_token
+    FIGURE_CACHE = FigureCache(settings.dash_figure_cache_size, settings.dash_figure_cache_dir)
+    COMPUTE = create_compute_pool(settings.dash_workers)
 
-    app.run(debug=True, use_reloader=False, host=settings.dash_host, port=settings.dash_port)
+    app.run(debug=True, use_reloader=False, host=settings.dash_host, port=port or settings.dash_port)
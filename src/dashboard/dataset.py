@@ -0,0 +1,244 @@
+import hashlib
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models import month_key
+
+# Порядок колонок совпадает со строками merge_aggregate в dash_app
+AGGREGATE_COLUMNS = ['Дата', 'Тип предложения удержания', 'Доход', 'Расходы', 'Ушло клиентов', 'Клиентов удержано']
+
+# Ответ changes(): изменения не сводятся к диапазону месяцев, агрегат перезагружается целиком
+RELOAD = object()
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Приводит помесячный агрегат к рабочему виду: 'Дата' — datetime, month_key, сортировка по month_key."""
+    dates = pd.to_datetime(df['Дата'], format='%Y-%m', errors='coerce')
+    keys = month_key(dates.dt.year, dates.dt.month).astype('Int64')
+
+    frame = df.assign(**{'Дата': dates, 'month_key': keys})
+    frame = frame[keys.notna()].sort_values('month_key', kind='stable').reset_index(drop=True)
+    frame['month_key'] = frame['month_key'].astype('int64')
+
+    return frame
+
+
+def frame_version(frame: pd.DataFrame) -> str:
+    """Версия данных — хэш содержимого; меняется только при изменении агрегата."""
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def make_store_payload(frame: pd.DataFrame, version: Optional[str] = None) -> dict:
+    """
+    Готовит данные для dcc.Store из подготовленного frame: записи отсортированы по ключу месяца,
+    рядом — отсортированные списки различных месяцев и типов предложений для построения опций
+    фильтров и версия (хэш содержимого) для кэша графиков.
+    """
+    records = frame.assign(**{'Дата': frame['Дата'].dt.strftime('%Y-%m')})
+
+    return {
+        'version': version or frame_version(frame),
+        'records': records.to_dict(orient='records'),
+        'columns': list(records.columns),
+        'months': np.unique(frame['month_key'].to_numpy()).tolist(),
+        'types': sorted(frame['Тип предложения удержания'].unique().tolist()),
+    }
+
+
+def frame_from_store(store_data) -> pd.DataFrame:
+    """Восстанавливает DataFrame из записей dcc.Store (уже отсортированных по month_key)."""
+    df = pd.DataFrame.from_records(store_data['records'], columns=store_data['columns'])
+
+    keys = df['month_key'].to_numpy()
+    df['Дата'] = pd.to_datetime({'year': keys // 12, 'month': keys % 12 + 1, 'day': 1})
+    return df
+
+
+def period_bounds(level, period_value):
+    """Полуинтервал ключей месяцев [lo, hi) для выбранного периода."""
+    if level == 'year':
+        lo = month_key(int(period_value), 1)
+        return lo, lo + 12
+    elif level == 'quarter':
+        # period_value - это строка типа '2024Q4'
+        year, q = period_value.split('Q')
+        lo = month_key(int(year), 3 * (int(q) - 1) + 1)
+        return lo, lo + 3
+    elif level == 'month':
+        # period_value - это строка типа '2024-11'
+        year, month = period_value.split('-')
+        lo = month_key(int(year), int(month))
+        return lo, lo + 1
+    return None
+
+
+def filter_by_types(df, selected_types):
+    """Оставляет строки выбранных типов предложений; пустой выбор — все типы."""
+    if not selected_types:
+        return df
+
+    return df[df['Тип предложения удержания'].isin(selected_types)]
+
+
+def filter_data_by_period(df, level, period_value):
+    """Фильтрует данные по выбранному периоду (год, квартал, месяц) срезом отсортированного month_key."""
+    if not level or not period_value:
+        return df
+
+    bounds = period_bounds(level, period_value)
+    if bounds is None:
+        return df
+
+    start, stop = np.searchsorted(df['month_key'].to_numpy(), bounds)
+    return df.iloc[start:stop]
+
+
+def compute_kpis(df_final):
+    """Сводные показатели для карточек KPI."""
+    total_retained = df_final['Клиентов удержано'].sum()
+    total_churned = df_final['Ушло клиентов'].sum()
+    total_income = df_final['Доход'].sum()
+    total_expenses = df_final['Расходы'].sum()
+    total_profit = total_income - total_expenses
+
+    kpis = {
+        'profit': total_profit,
+        'retention_rate': (total_retained / (total_retained + total_churned) * 100) if (
+                total_retained + total_churned) else 0,
+        'cost_per_retained': total_expenses / total_retained if total_retained else 0,
+        'profit_per_retained': total_profit / total_retained if total_retained else 0,
+    }
+
+    # Обычные float (а не numpy/Decimal): KPI сериализуются в кэш графиков и ответы API
+    return {name: float(value) for name, value in kpis.items()}
+
+#
+
+def merge_months(frame: pd.DataFrame, part: pd.DataFrame, lo: int, hi: int) -> pd.DataFrame:
+    """Заменяет в отсортированном frame месяцы [lo, hi) свежим агрегатом part; порядок по month_key сохраняется."""
+    start, stop = np.searchsorted(frame['month_key'].to_numpy(), (lo, hi))
+    pieces = [frame.iloc[:start], prepare_frame(part) if not part.empty else None, frame.iloc[stop:]]
+    pieces = [p for p in pieces if p is not None and not p.empty]
+
+    return pd.concat(pieces, ignore_index=True) if pieces else frame.iloc[0:0]
+
+#
+
+class Dataset:
+    """Загруженный агрегат: подготовленный frame, его версия, водяной знак БД и время последней проверки."""
+
+    __slots__ = ("frame", "version", "watermark", "loaded_at", "checked_at", "_payload")
+
+    def __init__(self, frame: pd.DataFrame, watermark=None, loaded_at: Optional[float] = None):
+        self.frame = frame
+        self.version = frame_version(frame) if not frame.empty else ""
+        self.watermark = watermark
+        self.loaded_at = loaded_at if loaded_at is not None else time.monotonic()
+        self.checked_at = time.monotonic()
+        self._payload = None
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def store_payload(self) -> dict:
+        # Строится один раз на версию данных, сколько бы сессий ни запрашивали Store
+        if self._payload is None:
+            self._payload = make_store_payload(self.frame, self.version)
+
+        return self._payload
+
+
+class DatasetCache:
+    """
+    Последний загруженный из БД агрегат, общий для колбэков всех сессий и HTTP API.
+
+    Не чаще раза в max_age секунд кэш проверяет водяной знак (watermark() — дешёвый запрос).
+    Если он не изменился, данные остаются прежними. Иначе changes(старый знак, новый знак) возвращает
+    (lo, hi, агрегат месяцев [lo, hi)) и эти месяцы заменяются в кэше, либо RELOAD, если изменения
+    не сводятся к месяцам (удаления). Полная перезагрузка — ещё при первом обращении, без
+    watermark/changes и раз в full_refresh секунд: она подбирает правки, которых водяной знак не видит.
+    Одновременные запросы ждут одно обновление.
+    """
+
+    def __init__(self, loader: Callable[[], pd.DataFrame], max_age: float = 30,
+                 watermark: Optional[Callable[[], tuple]] = None,
+                 changes: Optional[Callable[[tuple, tuple], object]] = None,
+                 full_refresh: float = 1800):
+        self._loader = loader
+        self._watermark = watermark
+        self._changes = changes
+        self.max_age = max_age
+        self.full_refresh = full_refresh
+
+        self._dataset: Optional[Dataset] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Dataset:
+        dataset = self._dataset
+        if dataset is not None and time.monotonic() - dataset.checked_at < self.max_age:
+            return dataset
+
+        with self._lock:
+            dataset = self._dataset
+            if dataset is None or time.monotonic() - dataset.checked_at >= self.max_age:
+                dataset = self._dataset = self._refresh(dataset)
+
+        return dataset
+
+    def invalidate(self):
+        self._dataset = None
+
+    def expire(self):
+        """Следующий get() проверит водяной знак, не дожидаясь max_age."""
+        dataset = self._dataset
+        if dataset is not None:
+            dataset.checked_at = float('-inf')
+
+    def _refresh(self, dataset: Optional[Dataset]) -> Dataset:
+        incremental = self._watermark is not None and self._changes is not None
+        if (not incremental or dataset is None or dataset.empty or dataset.watermark is None
+                or time.monotonic() - dataset.loaded_at >= self.full_refresh):
+            return self._load()
+
+        try:
+            # Знак читается до изменений: правки между двумя запросами попадут и в этот, и в следующий пересчёт
+            watermark = self._watermark()
+            if watermark == dataset.watermark:
+                dataset.checked_at = time.monotonic()
+                return dataset
+
+            changes = self._changes(dataset.watermark, watermark)
+        except Exception as e:
+            print(f"Ошибка при инкрементальном обновлении данных дашборда: {e}")
+            dataset.checked_at = time.monotonic()
+            return dataset
+
+        if changes is RELOAD:
+            return self._load()
+
+        if changes is None:
+            frame = dataset.frame
+        else:
+            lo, hi, part = changes
+            frame = merge_months(dataset.frame, part, lo, hi)
+
+        return Dataset(frame, watermark, dataset.loaded_at)
+
+    def _load(self) -> Dataset:
+        watermark = None
+        if self._watermark is not None:
+            try:
+                watermark = self._watermark()
+            except Exception as e:
+                print(f"Ошибка при чтении водяного знака данных дашборда: {e}")
+
+        df = self._loader()
+        if df.empty:
+            return Dataset(pd.DataFrame(columns=AGGREGATE_COLUMNS + ['Прибыль', 'month_key']))
+
+        return Dataset(prepare_frame(df), watermark)
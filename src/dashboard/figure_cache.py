@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from src.metrics import REGISTRY
+
+CACHE_HITS = REGISTRY.counter("dashboard_figure_cache_hits_total", "Представлений дашборда, найденных в кэше", ["tier"])
+CACHE_MISSES = REGISTRY.counter("dashboard_figure_cache_misses_total", "Представлений дашборда, построенных заново")
+
+
+def cache_key(*parts) -> str:
+    """Ключ представления: хэш от версии данных и состояния фильтров (порядок типов не важен)."""
+    normalized = [sorted(part) if isinstance(part, (list, tuple, set)) else part for part in parts]
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+class FigureCache:
+    """
+    Ограниченный LRU сериализованных (JSON) графиков дашборда.
+
+    Первый уровень — память процесса (общая для всех сессий браузера), второй — необязательный
+    каталог на диске, через который результат видят другие воркеры. Запись на диск атомарна
+    (временный файл + os.replace), размер каталога ограничивается удалением самых старых файлов.
+    """
+
+    def __init__(self, max_entries: int = 128, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc(tier="memory")
+                return value
+
+        value = self._read_disk(key)
+        if value is not None:
+            self._remember(key, value)
+            CACHE_HITS.inc(tier="disk")
+            return value
+
+        CACHE_MISSES.inc()
+        return None
+
+    def put(self, key: str, value: str):
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, value: str):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if self.directory is None:
+            return None
+
+        path = self.directory / f"{key}.json"
+        try:
+            value = path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+        # Отметка использования для вытеснения по давности
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return value
+
+    def _write_disk(self, key: str, value: str):
+        if self.directory is None:
+            return
+
+        path = self.directory / f"{key}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_text(value, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+
+        self._prune_disk()
+
+    def _prune_disk(self):
+        try:
+            files = list(self.directory.glob("*.json"))
+            if len(files) <= self.max_entries:
+                return
+
+            files.sort(key=lambda f: f.stat().st_mtime)
+            for stale in files[:len(files) - self.max_entries]:
+                stale.unlink(missing_ok=True)
+        except OSError:
+            # Файл мог удалить соседний воркер — не критично
+            pass
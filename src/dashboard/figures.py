@@ -0,0 +1,47 @@
+"""Построение KPI и графиков дашборда по DataFrame — без Dash, чтобы модуль можно было импортировать в воркерах."""
+import plotly.express as px
+
+from src.dashboard.dataset import compute_kpis, filter_by_types, filter_data_by_period
+
+
+def build_frame_view(df, period_level, period_value, selected_types) -> dict:
+    """Представление для фильтров по подготовленному frame: {'kpis', 'figures'} или {'message', 'color'}."""
+    # Сначала срез по периоду (бинарный поиск по отсортированному ключу месяца), затем фильтр по типам
+    df_period = filter_data_by_period(df, period_level, period_value)
+    if df_period.empty:
+        return {'message': "Нет данных для выбранного периода.", 'color': 'orange'}
+
+    df_final = filter_by_types(df_period, selected_types)
+    if df_final.empty:
+        return {'message': "Нет данных после фильтрации.", 'color': 'orange'}
+
+    return {'kpis': compute_kpis(df_final), 'figures': build_figures(df_final)}
+
+
+def build_figures(df_final):
+    """Строит все графики дашборда: линию доходов/расходов, четыре круговые, гистограмму и scatter."""
+    # Группировка по Дате (месяцу) для графика линии
+    df_monthly = df_final.groupby('Дата')[['Доход', 'Расходы']].sum().reset_index()
+
+    fig1 = px.line(df_monthly, x='Дата', y=['Доход', 'Расходы'],
+                   labels={'value': 'Сумма (₽)', 'variable': 'Показатель'})
+    fig1.update_layout(title=None, showlegend=False, margin=dict(t=20))
+
+    pies = {
+        "Доход": px.pie(df_final, names='Тип предложения удержания', values='Доход'),
+        "Расходы": px.pie(df_final, names='Тип предложения удержания', values='Расходы'),
+        "Удержано клиентов": px.pie(df_final, names='Тип предложения удержания', values='Клиентов удержано'),
+        "Ушло клиентов": px.pie(df_final, names='Тип предложения удержания', values='Ушло клиентов')
+    }
+
+    for fig in pies.values():
+        fig.update_layout(title=None, showlegend=False, margin=dict(t=20, b=20))
+
+    fig_hist = px.histogram(df_final, x='Прибыль', nbins=6)
+    fig_hist.update_layout(title=None, showlegend=False, margin=dict(t=20))
+
+    fig_scatter = px.scatter(df_final, x='Клиентов удержано', y='Прибыль',
+                             color='Тип предложения удержания', size='Доход')
+    fig_scatter.update_layout(title=None, showlegend=False, margin=dict(t=20))
+
+    return {'revenue': fig1, 'pies': pies, 'histogram': fig_hist, 'scatter': fig_scatter}
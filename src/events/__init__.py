@@ -0,0 +1,2 @@
+from src.events.bus import Event, EventBus, Subscription, EVENTS, CASE_RESOLVED, OFFERS_CHANGED
+from src.events.bridge import EventForwarder, post_event
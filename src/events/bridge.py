@@ -0,0 +1,81 @@
+"""
+Мост шины событий между процессами. Когда бот и дашборд запущены раздельно (src.supervisor), события
+бота пересылаются в шины процессов дашборда через POST /api/events — тот же эндпоинт, что у
+python -m src.cli.notify. Обработчик шины только кладёт событие в очередь, HTTP-запросы идут в
+отдельном потоке, чтобы недоступная реплика не тормозила event loop бота.
+"""
+import json
+import logging
+import queue
+import threading
+import urllib.request
+from typing import Iterable, List, Optional
+
+from src.events.bus import Event
+
+logger = logging.getLogger(__name__)
+
+
+def post_event(dashboard_url: str, topic: str, payload: dict, timeout: float = 5, token: Optional[str] = None) -> int:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["X-Events-Token"] = token
+
+    request = urllib.request.Request(
+        dashboard_url.rstrip("/") + "/api/events",
+        data=json.dumps({"topic": topic, "payload": payload}).encode(),
+        headers=headers,
+        method="POST"
+    )
+
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
+
+
+class EventForwarder:
+    """Обработчик шины (EVENTS.add_handler), пересылающий события выбранных тем на адреса дашбордов."""
+
+    def __init__(self, dashboard_urls: List[str], topics: Iterable[str], maxsize: int = 1000,
+                 token: Optional[str] = None):
+        self.dashboard_urls = dashboard_urls
+        self.topics = frozenset(topics)
+        self.token = token
+
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, event: Event):
+        if event.topic not in self.topics:
+            return
+
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Дашборды всё равно сверят водяной знак по таймеру — событие можно потерять
+            logger.warning("Очередь пересылки событий переполнена, событие %s отброшено", event.topic)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-forwarder", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 5):
+        """Досылает уже поставленные в очередь события и останавливает поток."""
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+
+            for url in self.dashboard_urls:
+                try:
+                    post_event(url, event.topic, event.payload, timeout=2, token=self.token)
+                except Exception as e:
+                    logger.warning("Не удалось переслать событие %s на %s: %s", event.topic, url, e)
@@ -0,0 +1,115 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Кейс удержания завершён (retained/churned) — меняются данные дашборда
+CASE_RESOLVED = "case_resolved"
+# Администратор создал, изменил или удалил оффер — таблица выбора офферов устарела
+OFFERS_CHANGED = "offers_changed"
+
+
+class Event:
+    __slots__ = ("topic", "payload", "timestamp")
+
+    def __init__(self, topic: str, payload: dict):
+        self.topic = topic
+        self.payload = payload
+        self.timestamp = time.time()
+
+    def __repr__(self):
+        return f"Event({self.topic!r}, {self.payload!r})"
+
+
+class Subscription:
+    """Очередь событий одного подписчика (например, SSE-соединения браузера)."""
+
+    def __init__(self, bus: "EventBus", maxsize: int):
+        self._bus = bus
+        self._queue: queue.Queue = queue.Queue(maxsize)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, event: Event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Медленный подписчик теряет старые события, а не тормозит публикацию
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._queue.put_nowait(event)
+
+    def close(self):
+        self._bus._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class EventBus:
+    """
+    Внутрипроцессная шина событий. Бот публикует из своего event loop, дашборд работает в другом
+    потоке, поэтому публикация не блокирует: обработчики вызываются синхронно и должны быть
+    быстрыми, подписчикам событие кладётся в их собственную очередь.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers: List[Callable[[Event], None]] = []
+        self._subscriptions: List[Subscription] = []
+
+    def publish(self, topic: str, payload: Optional[dict] = None) -> Event:
+        event = Event(topic, payload or {})
+
+        with self._lock:
+            handlers = list(self._handlers)
+            subscriptions = list(self._subscriptions)
+
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error("Ошибка обработчика события %s: %s", topic, e)
+
+        for subscription in subscriptions:
+            subscription._offer(event)
+
+        return event
+
+    def add_handler(self, handler: Callable[[Event], None]):
+        with self._lock:
+            self._handlers.append(handler)
+
+    def subscribe(self, maxsize: int = 100) -> Subscription:
+        subscription = Subscription(self, maxsize)
+        with self._lock:
+            self._subscriptions.append(subscription)
+
+        return subscription
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+
+# Общая шина процесса. В src/main.py бот и дашборд живут в одном процессе; при запуске через
+# src.supervisor события бота пересылает в процессы дашборда EventForwarder (src/events/bridge.py)
+EVENTS = EventBus()
\ No newline at end of file
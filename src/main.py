@@ -1,35 +1,62 @@
 import asyncio
+import logging
 import threading
 
 from src.config import Settings
-from src.dashboard.dash_app import init_dashboard
-from src.repositories import Database, Repositories
-from src.services import DashboardScreenshotService
+from src.repositories import Database, Repositories, create_shard_router, ensure_schema
+from src.services import DashboardScreenshotService, MetricsServer
 from src.telegram.tg_app import TelegramApp
 
 
+def run_dashboard(repositories: Repositories, settings: Settings):
+    # Dash, pandas и plotly импортируются уже в потоке дашборда и не задерживают запуск бота
+    from src.dashboard.dash_app import init_dashboard
+
+    init_dashboard(repositories, settings)
+
+
 async def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     settings = Settings()
 
     database = Database(settings)
-    repositories = Repositories(database)
+    repositories = Repositories(database, create_shard_router(settings, database))
 
+    # Chrome запускается при первом скриншоте или заранее в фоне, не задерживая пуллинг
     screenshot_service = DashboardScreenshotService(settings.dashboard_url)
+    if settings.screenshot_warmup:
+        screenshot_service.warm_up()
+
+    # Пул соединений живёт в event loop бота; дашборд в своём потоке подключается без пула
+    await database.open_pool()
+    await repositories.shards.open_pool()
 
-    async with database:
-        await repositories.users.create_table()
-        await repositories.contracts.create_table()
-        await repositories.offers.create_table()
-        await repositories.cases.create_table()
+    # Обычно один запрос к schema_version; DDL — только если схема отстала от кода
+    await ensure_schema(repositories)
 
     dash_thread = threading.Thread(
-        target=init_dashboard,
+        target=run_dashboard,
         args=(repositories, settings),
         daemon=True
     )
     dash_thread.start()
 
-    await TelegramApp(repositories, screenshot_service, settings).start()
+    # Агрегаты по запросам к БД (и прочие метрики процесса) для Prometheus
+    metrics_server = None
+    if settings.metrics_port:
+        metrics_server = MetricsServer(settings.metrics_host, int(settings.metrics_port))
+        await metrics_server.start()
+
+    try:
+        await TelegramApp(repositories, screenshot_service, settings).start()
+    finally:
+        if metrics_server is not None:
+            await metrics_server.stop()
+
+        screenshot_service.close()
+        await repositories.shards.close()
+        await database.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,2 @@
+from src.metrics.registry import Counter, Histogram, Summary, MetricsRegistry, REGISTRY, DEFAULT_BUCKETS
+from src.metrics.tracing import HandlerTrace, current_trace, record_phase
@@ -0,0 +1,197 @@
+import abc
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    """Базовая метрика с метками. Запись идёт из потока бота и потока дашборда, поэтому под локом."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterable[str]:
+        ...
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+        # Для каждой серии: счётчики по корзинам (последняя — +Inf), сумма и количество наблюдений
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def _samples(self):
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {count}"
+
+
+class Summary(Metric):
+    """Квантили по скользящему окну последних наблюдений каждой серии (плюс сумма и количество за всё время)."""
+
+    kind = "summary"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 quantiles: Sequence[float] = DEFAULT_QUANTILES, window: int = 1024):
+        super().__init__(name, documentation, labels)
+        self.quantiles = tuple(quantiles)
+        self.window = window
+
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [deque(maxlen=self.window), 0.0, 0]
+
+            series[0].append(value)
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[Dict[float, float], float, int]]:
+        with self._lock:
+            series = {key: (sorted(recent), total, count) for key, (recent, total, count) in self._series.items()}
+
+        return {
+            key: ({q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in self.quantiles}, total, count)
+            for key, (recent, total, count) in series.items()
+        }
+
+    def _samples(self):
+        for key, (quantiles, total, count) in sorted(self.snapshot().items()):
+            for q, value in quantiles.items():
+                quantile = f'quantile="{q}"'
+                yield f"{self.name}{_format_labels(self.label_names, key, quantile)} {_format_value(value)}"
+
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def summary(self, name: str, documentation: str, labels: Sequence[str] = (),
+                quantiles: Sequence[float] = DEFAULT_QUANTILES, window: int = 1024) -> Summary:
+        return self._register(Summary(name, documentation, labels, quantiles, window))
+
+    def render(self) -> str:
+        """Текстовый формат экспозиции Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+# Общий реестр процесса: в него пишут Database, бот и дашборд
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,28 @@
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Фазы, на которые раскладывается время обработки апдейта
+PHASES = ("db", "telegram", "render")
+
+
+class HandlerTrace:
+    """Время, накопленное по фазам за обработку одного апдейта бота."""
+
+    __slots__ = ("handler", "phases")
+
+    def __init__(self):
+        self.handler: Optional[str] = None
+        self.phases: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+# Трасса текущего апдейта; Database, сессия бота и рендерер добавляют в неё своё время
+current_trace: ContextVar[Optional[HandlerTrace]] = ContextVar("current_trace", default=None)
+
+
+def record_phase(phase: str, seconds: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(phase, seconds)
@@ -1,4 +1,5 @@
 from src.models.contract import Contract
+from src.models.month import current_month, month_key
 from src.models.offer import Offer
 from src.models.retention_case import RetentionCase
 from src.models.user import User
\ No newline at end of file
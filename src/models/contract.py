@@ -1,31 +1,22 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
 class Contract:
-    def __init__(
-            self,
-            contract_id: str,
-            client_telegram_id: int,
-            last_name: str,
-            first_name: str,
-            middle_name: str,
-            email: str,
-            phone: str,
-            can_be_retained: bool,
-            monthly_profit: float,
-            active: bool,
-    ):
-        self.contract_id = contract_id
-        self.client_telegram_id = client_telegram_id
+    contract_id: str
+    client_telegram_id: int
 
-        self.last_name = last_name
-        self.first_name = first_name
-        self.middle_name = middle_name
+    last_name: str
+    first_name: str
+    middle_name: str
 
-        self.email = email
-        self.phone = phone
+    email: str
+    phone: str
 
-        self.can_be_retained = can_be_retained
+    can_be_retained: bool
 
-        self.monthly_profit = monthly_profit
-        self.active = active
+    monthly_profit: float
+    active: bool
 
     def tuple(self):
         return (
@@ -39,4 +30,4 @@ class Contract:
             self.can_be_retained,
             self.monthly_profit,
             self.active
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,14 @@
+import datetime
+
+
+def month_key(year, month):
+    """
+    Целочисленный ключ месяца: year*12 + (month-1). Квартал — month_key // 3, год — month_key // 12.
+    Работает и со скалярами, и с колонками pandas/numpy.
+    """
+    return year * 12 + month - 1
+
+
+def current_month() -> int:
+    today = datetime.date.today()
+    return month_key(today.year, today.month)
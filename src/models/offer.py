@@ -1,20 +1,16 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
 class Offer:
-    def __init__(
-            self,
-            offer_id: int,
-            offer_type: str,
-            description: str,
-            min_profit_threshold: float,
-            cost: float
-    ):
-        self.offer_id = offer_id
-        self.offer_type = offer_type
+    offer_id: int
+    offer_type: str
 
-        self.description = description
+    description: str
 
-        self.min_profit_threshold = min_profit_threshold
+    min_profit_threshold: float
 
-        self.cost = cost
+    cost: float
 
     def tuple(self):
         return (
@@ -23,4 +19,4 @@ class Offer:
             self.description,
             self.min_profit_threshold,
             self.cost
-        )
\ No newline at end of file
+        )
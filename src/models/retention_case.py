@@ -1,30 +1,22 @@
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+
+@dataclass(slots=True)
 class RetentionCase:
-    def __init__(
-            self,
-            case_id: int,
-            contract_id: str,
-            initial_reason: str,
-            proposed_offer_id: Optional[int],
-            assigned_manager_id: Optional[int],
-            created_at: datetime,
-            completed_at: Optional[datetime],
-            status: str
-    ):
-        self.case_id = case_id
-        self.contract_id = contract_id
+    case_id: int
+    contract_id: str
 
-        self.initial_reason = initial_reason
-        self.proposed_offer_id = proposed_offer_id
+    initial_reason: str
+    proposed_offer_id: Optional[int]
 
-        self.assigned_manager_id = assigned_manager_id
+    assigned_manager_id: Optional[int]
 
-        self.created_at = created_at
-        self.completed_at = completed_at
+    created_at: datetime
+    completed_at: Optional[datetime]
 
-        self.status = status
+    status: str
 
     def tuple(self):
         return (
@@ -36,4 +28,4 @@ class RetentionCase:
             self.created_at,
             self.completed_at,
             self.status
-        )
\ No newline at end of file
+        )
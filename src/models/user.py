@@ -1,14 +1,13 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
 class User:
-    def __init__(
-            self,
-            telegram_id: int,
-            role: str,
-    ):
-        self.telegram_id = telegram_id
-        self.role = role
+    telegram_id: int
+    role: str
 
     def tuple(self):
         return (
             self.telegram_id,
             self.role
-        )
\ No newline at end of file
+        )
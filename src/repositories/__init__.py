@@ -1,2 +1,5 @@
+from src.repositories.statement import Statement
 from src.repositories.database import Database
-from src.repositories.repositories import Repositories
\ No newline at end of file
+from src.repositories.sharding import MAX_SHARDS, ShardRouter, create_shard_router, shard_index
+from src.repositories.repositories import Repositories
+from src.repositories.schema import SCHEMA_VERSION, ensure_schema
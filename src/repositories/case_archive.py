@@ -0,0 +1,281 @@
+"""
+Партиционирование retention_cases по месяцу завершения и архив старых кейсов.
+
+Ключ партиций — completed_month (сохраняемая вычисляемая колонка year*12 + month-1 от completed_at,
+0 — кейс не завершён). Открытые кейсы лежат в p_open, поэтому поиск активного кейса контракта и список
+эскалаций читают только её; завершённые — в помесячных партициях, будущие месяцы заранее выделяются
+из p_future. Кейсы месяцев раньше первой помесячной партиции (история, загруженная в новую таблицу сидом
+или решардингом) попадают в p_history; перед архивацией она делится на месяцы (split_history).
+
+Архивация месяца одной транзакцией копирует его завершённые кейсы в сжатую retention_cases_archive,
+добавляет их суммы в помесячный свод retention_rollup (по нему дашборд показывает историю) и удаляет
+кейсы из горячей таблицы; опустевшая партиция удаляется. Внешних ключей у партиционированной таблицы
+быть не может — они снимаются при переводе существующей таблицы.
+"""
+from typing import List, Tuple
+
+from src.models import current_month
+from src.repositories.database import Database
+from src.repositories.statement import Statement
+
+OPEN_PARTITION = "p_open"
+HISTORY_PARTITION = "p_history"
+FUTURE_PARTITION = "p_future"
+
+# На сколько месяцев вперёд держать готовые партиции
+PARTITIONS_AHEAD = 3
+
+COMPLETED_MONTH = "COALESCE(YEAR(completed_at) * 12 + MONTH(completed_at) - 1, 0)"
+
+PARTITIONS = Statement("case_archive.partitions", """
+    SELECT partition_name, partition_description FROM information_schema.partitions
+    WHERE table_schema = DATABASE()
+      AND table_name = 'retention_cases'
+      AND partition_name IS NOT NULL
+    ORDER BY partition_ordinal_position
+""")
+
+FOREIGN_KEYS = Statement("case_archive.foreign_keys", """
+    SELECT constraint_name FROM information_schema.referential_constraints
+    WHERE constraint_schema = DATABASE()
+      AND table_name = 'retention_cases'
+""")
+
+HAS_CONTRACT_INDEX = Statement("case_archive.has_contract_index", """
+    SELECT 1 FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'retention_cases'
+      AND column_name = 'contract_id'
+      AND seq_in_index = 1
+    LIMIT 1
+""")
+
+HAS_TABLE = Statement("case_archive.has_table", """
+    SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s
+""")
+
+# По индексу idx_retention_cases_completed_at
+FIRST_COMPLETED_MONTH = Statement("case_archive.first_completed_month", """
+    SELECT YEAR(MIN(completed_at)) * 12 + MONTH(MIN(completed_at)) - 1 FROM retention_cases
+""")
+
+PARTITION_ROWS = "SELECT COUNT(*) FROM retention_cases PARTITION ({partition})"
+
+FIRST_HISTORY_MONTH = f"SELECT MIN(completed_month) FROM retention_cases PARTITION ({HISTORY_PARTITION})"
+
+ARCHIVE_CASES = """
+    INSERT INTO retention_cases_archive (
+        case_id, contract_id, initial_reason, proposed_offer_id, assigned_manager_id, created_at, completed_at, status
+    )
+    SELECT case_id, contract_id, initial_reason, proposed_offer_id, assigned_manager_id, created_at, completed_at, status
+    FROM retention_cases PARTITION ({partition})
+    WHERE status IN ('retained', 'churned')
+"""
+
+# Суммы с доходом контракта на момент архивации; 0 вместо NULL — кейс без оффера
+ROLLUP_CASES = """
+    INSERT INTO retention_rollup (completed_month, proposed_offer_id, income, cases, churned, retained)
+    SELECT
+        rc.completed_month,
+        COALESCE(rc.proposed_offer_id, 0),
+        SUM(c.monthly_profit),
+        COUNT(*),
+        SUM(rc.status = 'churned'),
+        SUM(rc.status = 'retained')
+    FROM retention_cases PARTITION ({partition}) rc
+         JOIN contracts c ON rc.contract_id = c.contract_id
+    WHERE rc.status IN ('retained', 'churned')
+    GROUP BY rc.completed_month, COALESCE(rc.proposed_offer_id, 0)
+    ON DUPLICATE KEY UPDATE
+        income = income + VALUES(income),
+        cases = cases + VALUES(cases),
+        churned = churned + VALUES(churned),
+        retained = retained + VALUES(retained)
+"""
+
+DELETE_ARCHIVED = """
+    DELETE FROM retention_cases PARTITION ({partition}) WHERE status IN ('retained', 'churned')
+"""
+
+
+def partition_name(month: int) -> str:
+    return f"p{month // 12}{month % 12 + 1:02d}"
+
+
+def month_partitions(first: int, last: int) -> List[str]:
+    return [f"PARTITION {partition_name(month)} VALUES LESS THAN ({month + 1})" for month in range(first, last + 1)]
+
+
+def partitioning(first: int, last: int) -> str:
+    """Партиции таблицы: открытые кейсы, всё до first, месяцы [first, last] и всё, что позже."""
+    partitions = ([f"PARTITION {OPEN_PARTITION} VALUES LESS THAN (1)",
+                   f"PARTITION {HISTORY_PARTITION} VALUES LESS THAN ({first})"]
+                  + month_partitions(first, last)
+                  + [f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE"])
+
+    return f"PARTITION BY RANGE (completed_month) ({', '.join(partitions)})"
+
+
+async def monthly_partitions(shard: Database) -> List[Tuple[str, int]]:
+    """Помесячные партиции (имя, месяц) по возрастанию."""
+    return [(name, int(bound) - 1) for name, bound in await shard.select_all(PARTITIONS)
+            if name not in (OPEN_PARTITION, HISTORY_PARTITION, FUTURE_PARTITION)]
+
+
+async def create_history_tables(shard: Database):
+    if not await shard.select_one(HAS_TABLE, "retention_cases_archive"):
+        await shard.execute("""
+            CREATE TABLE retention_cases_archive (
+                case_id BIGINT PRIMARY KEY,
+                contract_id VARCHAR(32) NOT NULL,
+                initial_reason TEXT,
+                proposed_offer_id INT,
+                assigned_manager_id BIGINT,
+                created_at DATETIME NOT NULL,
+                completed_at DATETIME,
+                status ENUM('active', 'escalated', 'retained', 'churned'),
+
+                INDEX idx_retention_cases_archive_contract (contract_id)
+            ) ROW_FORMAT=COMPRESSED
+        """)
+
+    if not await shard.select_one(HAS_TABLE, "retention_rollup"):
+        await shard.execute("""
+            CREATE TABLE retention_rollup (
+                completed_month INT NOT NULL,
+                proposed_offer_id INT NOT NULL,
+                income DECIMAL(16, 2) NOT NULL,
+                cases INT NOT NULL,
+                churned INT NOT NULL,
+                retained INT NOT NULL,
+
+                PRIMARY KEY (completed_month, proposed_offer_id)
+            )
+        """)
+
+
+async def partition_table(shard: Database):
+    """Переводит существующую retention_cases на партиции по completed_month (однократно, под блокировкой схемы)."""
+    bounds = dict(await shard.select_all(PARTITIONS))
+    if bounds:
+        await _add_history_partition(shard, bounds)
+        return
+
+    for name, in await shard.select_all(FOREIGN_KEYS):
+        await shard.execute(f"ALTER TABLE retention_cases DROP FOREIGN KEY `{name}`")
+
+    # Индекс внешнего ключа на contract_id остаётся после его удаления; у старых таблиц без ключа — создаётся
+    if not await shard.select_one(HAS_CONTRACT_INDEX):
+        await shard.execute("CREATE INDEX idx_retention_cases_contract ON retention_cases (contract_id)")
+
+    await shard.execute(f"""
+        ALTER TABLE retention_cases
+            ADD COLUMN completed_month INT AS ({COMPLETED_MONTH}) STORED NOT NULL,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (case_id, completed_month)
+    """)
+
+    now = current_month()
+    first, = await shard.select_one(FIRST_COMPLETED_MONTH)
+    await shard.execute(f"ALTER TABLE retention_cases {partitioning(min(first or now, now), now + PARTITIONS_AHEAD)}")
+
+
+async def _add_history_partition(shard: Database, bounds: dict):
+    # Таблицы без p_history (схема 2) хранят всю историю, загруженную в новую таблицу, в первом месяце:
+    # p_history выделяется из него, и split_history затем делит её по месяцам
+    if HISTORY_PARTITION in bounds:
+        return
+
+    partitions = await monthly_partitions(shard)
+    if not partitions:
+        return
+
+    name, month = partitions[0]
+    await shard.execute(f"""
+        ALTER TABLE retention_cases REORGANIZE PARTITION {name} INTO (
+            PARTITION {HISTORY_PARTITION} VALUES LESS THAN ({month}),
+            PARTITION {name} VALUES LESS THAN ({month + 1})
+        )
+    """)
+
+
+async def add_partitions(shard: Database, ahead: int = PARTITIONS_AHEAD) -> int:
+    """Выделяет из p_future партиции до текущего месяца + ahead; возвращает число новых партиций."""
+    partitions = await monthly_partitions(shard)
+    first = partitions[-1][1] + 1 if partitions else current_month()
+    last = current_month() + ahead
+    if first > last:
+        return 0
+
+    # Кейсы, уже попавшие в p_future, переезжают в свои месяцы
+    await shard.execute(f"""
+        ALTER TABLE retention_cases REORGANIZE PARTITION {FUTURE_PARTITION} INTO (
+            {', '.join(month_partitions(first, last))},
+            PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE
+        )
+    """)
+    return last - first + 1
+
+
+async def split_history(shard: Database) -> int:
+    """Делит кейсы p_history на помесячные партиции; возвращает число новых партиций."""
+    bounds = dict(await shard.select_all(PARTITIONS))
+    if HISTORY_PARTITION not in bounds:
+        return 0
+
+    first, = await shard.select_one(FIRST_HISTORY_MONTH)
+    if first is None:
+        return 0
+
+    # p_history остаётся пустой границей перед первым месяцем с кейсами; диапазон партиции не меняется
+    last = int(bounds[HISTORY_PARTITION]) - 1
+    await shard.execute(f"""
+        ALTER TABLE retention_cases REORGANIZE PARTITION {HISTORY_PARTITION} INTO (
+            PARTITION {HISTORY_PARTITION} VALUES LESS THAN ({first}),
+            {', '.join(month_partitions(first, last))}
+        )
+    """)
+    return last - first + 1
+
+
+async def archive_partition(shard: Database, partition: str) -> int:
+    """Переносит завершённые кейсы партиции в архив и свод; возвращает число перенесённых кейсов."""
+    # Одна транзакция: читатели видят кейсы месяца либо в горячей таблице, либо уже в своде — не дважды
+    await shard.execute("START TRANSACTION")
+    try:
+        await shard.execute(ROLLUP_CASES.format(partition=partition))
+        archived = await _affected(shard, ARCHIVE_CASES.format(partition=partition))
+        await shard.execute(DELETE_ARCHIVED.format(partition=partition))
+        await shard.execute("COMMIT")
+    except Exception:
+        await shard.execute("ROLLBACK")
+        raise
+
+    remaining, = await shard.select_one(PARTITION_ROWS.format(partition=partition))
+    if not remaining:
+        await shard.execute(f"ALTER TABLE retention_cases DROP PARTITION {partition}")
+
+    return archived
+
+
+async def archive_before(shard: Database, keep_months: int) -> Tuple[int, int]:
+    """Архивирует месяцы старше keep_months; возвращает (кейсов, партиций)."""
+    cutoff = current_month() - keep_months
+    cases = partitions = 0
+
+    await split_history(shard)
+
+    for name, month in await monthly_partitions(shard):
+        if month >= cutoff:
+            break
+
+        cases += await archive_partition(shard, name)
+        partitions += 1
+
+    return cases, partitions
+
+
+async def _affected(shard: Database, query: str) -> int:
+    await shard.execute(query)
+    rows, = await shard.select_one("SELECT ROW_COUNT()")
+    return rows
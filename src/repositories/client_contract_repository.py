@@ -0,0 +1,65 @@
+from src.repositories import Database, ShardRouter, Statement
+
+# Индекс client_telegram_id -> contract_id на primary: по contract_id определяется шард, поэтому контракт
+# клиента читается с одного шарда, а не со всех сразу. Поддерживается записями ContractRepository
+SET = Statement("client_contracts.set", """
+    INSERT INTO client_contracts (contract_id, client_telegram_id) VALUE (%s, %s)
+    ON DUPLICATE KEY UPDATE client_telegram_id = VALUES(client_telegram_id)
+""")
+
+REMOVE = Statement("client_contracts.remove", """
+    DELETE FROM client_contracts WHERE contract_id = %s
+""")
+
+# Горячий запрос клиентского сценария
+GET_CONTRACT_ID = Statement("client_contracts.get_contract_id", """
+    SELECT contract_id FROM client_contracts WHERE client_telegram_id = %s LIMIT 1
+""", prepare=True)
+
+CONTRACT_CLIENTS = Statement("client_contracts.contract_clients", """
+    SELECT contract_id, client_telegram_id FROM contracts
+""")
+
+
+class ClientContractRepository:
+    def __init__(self, database: Database, shards: ShardRouter):
+        self._database = database
+        self._shards = shards
+
+    async def create_table(self):
+        await self._database.execute("""
+            CREATE TABLE IF NOT EXISTS client_contracts (
+                contract_id VARCHAR(32) PRIMARY KEY,
+                client_telegram_id BIGINT NOT NULL,
+
+                INDEX idx_client_contracts_client (client_telegram_id)
+            )
+        """)
+
+        # Индекс появляется позже контрактов: заполняем по уже существующим
+        if not self._shards.sharded:
+            await self._database.execute(f"INSERT IGNORE INTO client_contracts (contract_id, client_telegram_id) "
+                                         f"{CONTRACT_CLIENTS.query}")
+            return
+
+        async for rows in self._shards.stream(CONTRACT_CLIENTS, chunk_size=10_000):
+            await self._database.execute_many(SET, rows)
+
+    async def set(self, contract_id, client_telegram_id):
+        async with self._database:
+            await self._database.execute(SET, contract_id, client_telegram_id)
+
+    async def set_many(self, rows):
+        # rows — пары (contract_id, client_telegram_id)
+        async with self._database:
+            return await self._database.execute_many(SET, list(rows))
+
+    async def remove(self, contract_id):
+        async with self._database:
+            await self._database.execute(REMOVE, contract_id)
+
+    async def get_contract_id(self, client_telegram_id):
+        async with self._database:
+            row = await self._database.select_one(GET_CONTRACT_ID, client_telegram_id)
+
+        return None if row is None else row[0]
@@ -1,13 +1,67 @@
 from src.models import Contract
-from src.repositories import Database
+from src.repositories import Database, ShardRouter, Statement
+from src.repositories.client_contract_repository import ClientContractRepository
+from src.repositories.retention_case_repository import MARK_CHANGED
+
+# Явный порядок колонок: строки отображаются в модель позиционно
+CONTRACT_COLUMNS = "contract_id, client_telegram_id, last_name, first_name, middle_name, email, phone, can_be_retained, monthly_profit, active"
+
+REMOVE = Statement("contracts.remove", """
+    DELETE FROM contracts WHERE contract_id=%s
+""")
+
+INSERT = Statement("contracts.insert", """
+    INSERT INTO contracts (
+        contract_id,
+        client_telegram_id,
+        last_name, first_name, middle_name,
+        email, phone,
+        can_be_retained,
+        monthly_profit,
+        active
+    ) VALUE (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+""")
+
+UPDATE = Statement("contracts.update", """
+    UPDATE contracts SET
+            client_telegram_id = %s,
+            last_name = %s,
+            first_name = %s,
+            middle_name = %s,
+            email = %s,
+            phone = %s,
+            can_be_retained = %s,
+            monthly_profit = %s,
+            active = %s
+        WHERE contract_id = %s
+""")
+
+GET_ONE = Statement("contracts.get_one", f"""
+    SELECT {CONTRACT_COLUMNS} FROM contracts WHERE contract_id = %s
+""")
+
+# Горячие запросы клиентского сценария готовятся на сервере один раз на соединение пула
+GET_BY_CLIENT_TELEGRAM_ID = Statement("contracts.get_by_client_telegram_id", f"""
+    SELECT {CONTRACT_COLUMNS} FROM contracts WHERE client_telegram_id = %s
+""", prepare=True)
+
+GET_ALL = Statement("contracts.get_all", f"""
+    SELECT {CONTRACT_COLUMNS} FROM contracts
+""")
 
 
 class ContractRepository:
-    def __init__(self, database: Database):
-        self._database = database
+    """
+    Контракты на шардах: запросы по contract_id идут на его шард, остальные — на все шарды.
+    Контракт клиента ищется через индекс client_contracts на primary, который обновляют записи этого репозитория.
+    """
 
-    async def create_table(self):
-        await self._database.execute("""
+    def __init__(self, shards: ShardRouter, clients: ClientContractRepository):
+        self._shards = shards
+        self._clients = clients
+
+    async def create_table(self, shard: Database):
+        await shard.execute("""
             CREATE TABLE IF NOT EXISTS contracts (
                 contract_id VARCHAR(32) PRIMARY KEY,
                 client_telegram_id BIGINT NOT NULL,
@@ -24,55 +78,59 @@ class ContractRepository:
 
 
     async def remove(self, contract_id):
-        await self._database.execute("""
-            DELETE FROM contracts WHERE contract_id=%s
-        """, contract_id)
+        async with self._shards.shard(contract_id) as shard:
+            await shard.execute(REMOVE, contract_id)
+            # Кейсы удалённого контракта выпадают из агрегата дашборда
+            await shard.execute(MARK_CHANGED)
+
+        await self._clients.remove(contract_id)
 
     async def insert(self, contract: Contract):
-        await self._database.execute("""
-            INSERT INTO contracts (
-                contract_id,
-                client_telegram_id,
-                last_name, first_name, middle_name,
-                email, phone,
-                can_be_retained,
-                monthly_profit,
-                active
-            ) VALUE (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)  
-        """, *contract.tuple())
+        async with self._shards.shard(contract.contract_id) as shard:
+            await shard.execute(INSERT, *contract.tuple())
+
+        await self._clients.set(contract.contract_id, contract.client_telegram_id)
+
+    async def insert_many(self, rows):
+        # rows — кортежи в порядке колонок INSERT (как Contract.tuple())
+        inserted = 0
+        for shard, part in self._shards.group(rows).items():
+            async with shard:
+                inserted += await shard.execute_many(INSERT, part)
+
+            await self._clients.set_many((row[0], row[1]) for row in part)
+
+        return inserted
 
     async def update(self, c: Contract):
-        await self._database.execute("""
-            UPDATE contracts SET
-                    client_telegram_id = %s,
-                    last_name = %s,
-                    first_name = %s,
-                    middle_name = %s,
-                    email = %s,
-                    phone = %s,
-                    can_be_retained = %s,
-                    monthly_profit = %s,
-                    active = %s
-                WHERE contract_id = %s
-        """, c.client_telegram_id, c.last_name, c.first_name, c.middle_name, c.email, c.phone, c.can_be_retained, c.monthly_profit, c.active, c.contract_id)
+        async with self._shards.shard(c.contract_id) as shard:
+            await shard.execute(UPDATE, c.client_telegram_id, c.last_name, c.first_name, c.middle_name, c.email, c.phone, c.can_be_retained, c.monthly_profit, c.active, c.contract_id)
+
+        await self._clients.set(c.contract_id, c.client_telegram_id)
 
     async def get_one(self, contract_id: str):
-        contract_tuple = await self._database.select_one("""
-            SELECT * FROM contracts WHERE contract_id = %s
-        """, contract_id)
+        async with self._shards.connect(self._shards.shard(contract_id)) as shard:
+            contract_tuple = await shard.select_one(GET_ONE, contract_id)
 
-        return None if contract_tuple is None else Contract(*contract_tuple.values())
+        return None if contract_tuple is None else Contract(*contract_tuple)
 
     async def get_by_client_telegram_id(self, client_telegram_id):
-        contract_tuple = await self._database.select_one("""
-            SELECT * FROM contracts WHERE client_telegram_id = %s
-        """, client_telegram_id)
+        if not self._shards.sharded:
+            async with self._shards.shards[0] as shard:
+                contract_tuple = await shard.select_one(GET_BY_CLIENT_TELEGRAM_ID, client_telegram_id)
 
-        return None if contract_tuple is None else Contract(*contract_tuple.values())
+            return None if contract_tuple is None else Contract(*contract_tuple)
+
+        # Шард определяется по contract_id: сначала индекс на primary, затем один запрос к шарду контракта
+        contract_id = await self._clients.get_contract_id(client_telegram_id)
+
+        return None if contract_id is None else await self.get_one(contract_id)
 
     async def get_all(self):
-        contract_tuples = await self._database.select_all("""
-            SELECT * FROM contracts              
-        """)
+        parts = await self._shards.each(lambda shard: shard.select_all(GET_ALL))
+
+        return [Contract(*contract_tuple) for contract_tuples in parts for contract_tuple in contract_tuples]
 
-        return [Contract(*contract_tuple.values()) for contract_tuple in contract_tuples]
\ No newline at end of file
+    async def stream_all(self, chunk_size: int = 1000):
+        async for contract_tuples in self._shards.stream(GET_ALL, chunk_size=chunk_size):
+            yield [Contract(*contract_tuple) for contract_tuple in contract_tuples]
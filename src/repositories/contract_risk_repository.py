@@ -0,0 +1,83 @@
+from src.repositories import Database, ShardRouter, Statement
+
+# risk_score — вероятность того, что контракт за столько месяцев обратится (откроется кейс) или уйдёт
+HORIZON_MONTHS = 3
+
+# Явный порядок колонок: строки отображаются позиционно
+RISK_COLUMNS = "contract_id, risk_score, previous_cases, months_since_case, scored_at"
+
+UPSERT = Statement("contract_risk.upsert", """
+    INSERT INTO contract_risk (contract_id, risk_score, previous_cases, months_since_case, scored_at)
+        VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        risk_score = VALUES(risk_score),
+        previous_cases = VALUES(previous_cases),
+        months_since_case = VALUES(months_since_case),
+        scored_at = VALUES(scored_at)
+""")
+
+# Контракты, не попавшие в последний прогон (закрыты), удаляются после записи новых оценок
+REMOVE_STALE = Statement("contract_risk.remove_stale", """
+    DELETE FROM contract_risk WHERE scored_at < %s
+""")
+
+# Keyset-пагинация по индексу (risk_score DESC, contract_id): страница начинается строго после курсора,
+# поэтому стоимость не зависит от номера страницы
+TOP_FIRST = Statement("contract_risk.top_first", f"""
+    SELECT {RISK_COLUMNS} FROM contract_risk
+    ORDER BY risk_score DESC, contract_id
+    LIMIT %s
+""")
+
+TOP_AFTER = Statement("contract_risk.top_after", f"""
+    SELECT {RISK_COLUMNS} FROM contract_risk
+    WHERE risk_score < %s OR (risk_score = %s AND contract_id > %s)
+    ORDER BY risk_score DESC, contract_id
+    LIMIT %s
+""")
+
+COUNT = Statement("contract_risk.count", """
+    SELECT COUNT(*), MAX(scored_at) FROM contract_risk
+""")
+
+
+class ContractRiskRepository:
+    def __init__(self, database: Database, shards: ShardRouter):
+        self._database = database
+        self._shards = shards
+
+    async def create_table(self):
+        # Контракты на шардах: внешний ключ возможен, только пока они на primary
+        foreign_key = "" if self._shards.sharded else """,
+            
+                FOREIGN KEY (contract_id) REFERENCES Contracts(contract_id) ON DELETE CASCADE"""
+
+        await self._database.execute(f"""
+            CREATE TABLE IF NOT EXISTS contract_risk (
+                contract_id VARCHAR(32) PRIMARY KEY,
+                risk_score DOUBLE NOT NULL,
+                previous_cases INT NOT NULL,
+                months_since_case INT,
+                scored_at DATETIME NOT NULL,
+            
+                INDEX idx_contract_risk_score (risk_score DESC, contract_id){foreign_key}
+            )
+        """)
+
+    async def upsert_many(self, rows):
+        # rows — кортежи (contract_id, risk_score, previous_cases, months_since_case, scored_at)
+        return await self._database.execute_many(UPSERT, list(rows))
+
+    async def remove_stale(self, scored_before):
+        await self._database.execute(REMOVE_STALE, scored_before)
+
+    async def get_top(self, limit: int, after=None):
+        """Страница самых рискованных контрактов; after — (risk_score, contract_id) последней строки прошлой страницы."""
+        if after is None:
+            return await self._database.select_all(TOP_FIRST, limit)
+
+        score, contract_id = after
+        return await self._database.select_all(TOP_AFTER, score, score, contract_id, limit)
+
+    async def count(self):
+        return await self._database.select_one(COUNT)
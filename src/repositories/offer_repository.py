@@ -1,9 +1,72 @@
 from src.models import Offer
-from src.repositories import Database
+from src.repositories import Database, ShardRouter, Statement
+
+# Явный порядок колонок: строки отображаются в модель позиционно
+OFFER_COLUMNS = "offer_id, offer_type, description, min_profit_threshold, cost"
+
+INSERT = Statement("offers.insert", """
+    INSERT INTO offers (offer_type, description, min_profit_threshold, cost)
+        VALUE (%s, %s, %s, %s)
+""")
+
+UPDATE = Statement("offers.update", """
+    UPDATE offers SET
+            offer_type = %s,
+            description = %s,
+            min_profit_threshold = %s,
+            cost = %s
+        WHERE offer_id = %s
+""")
+
+REMOVE = Statement("offers.remove", """
+    DELETE FROM offers WHERE offer_id = %s
+""")
+
+GET_ALL = Statement("offers.get_all", f"""
+    SELECT {OFFER_COLUMNS} FROM offers
+""")
+
+GET_ONE = Statement("offers.get_one", f"""
+    SELECT {OFFER_COLUMNS} FROM offers WHERE offer_id = %s
+""")
+
+# Тип и стоимость оффера для агрегатов по кейсам: кейсы могут лежать на шардах, где таблицы offers нет
+TYPE_COSTS = Statement("offers.type_costs", """
+    SELECT offer_id, offer_type, cost FROM offers
+""")
+
+# Кейс без оффера или с удалённым оффером
+NO_OFFER = ('Не указано', 0)
+
+GET_SUITABLE = Statement("offers.get_suitable_offers", f"""
+    SELECT {OFFER_COLUMNS} FROM offers WHERE min_profit_threshold <= %s
+""")
+
+# Исходы кейсов по офферу и полосе прибыли контракта: полоса b — monthly_profit в [2^b, 2^(b+1))
+# Горячая таблица и архив группируются по отдельности; одинаковые пары складываются в get_outcome_stats
+OUTCOME_STATS_SELECT = """
+    SELECT
+        rc.proposed_offer_id,
+        FLOOR(LOG2(GREATEST(c.monthly_profit, 1))) AS bucket,
+        COUNT(*),
+        SUM(rc.status = 'retained')
+    FROM {table} rc
+         JOIN contracts c ON rc.contract_id = c.contract_id
+    WHERE rc.status IN ('retained', 'churned')
+      AND rc.proposed_offer_id IS NOT NULL
+    GROUP BY rc.proposed_offer_id, bucket
+"""
+
+OUTCOME_STATS = Statement("offers.outcome_stats", f"""
+    {OUTCOME_STATS_SELECT.format(table="retention_cases")}
+    UNION ALL
+    {OUTCOME_STATS_SELECT.format(table="retention_cases_archive")}
+""")
 
 class OfferRepository:
-    def __init__(self, database: Database):
+    def __init__(self, database: Database, shards: ShardRouter):
         self._database = database
+        self._shards = shards
 
     async def create_table(self):
         await self._database.execute("""
@@ -17,43 +80,42 @@ class OfferRepository:
         """)
 
     async def insert(self, offer: Offer):
-        await self._database.execute("""
-            INSERT INTO offers (offer_type, description, min_profit_threshold, cost)
-                VALUE (%s, %s, %s, %s)
-        """, offer.offer_type, offer.description, offer.min_profit_threshold, offer.cost)
+        await self._database.execute(INSERT, offer.offer_type, offer.description, offer.min_profit_threshold, offer.cost)
 
     async def update(self, offer: Offer):
-        await self._database.execute("""
-            UPDATE offers SET 
-                    offer_type = %s, 
-                    description = %s, 
-                    min_profit_threshold = %s, 
-                    cost = %s
-                WHERE offer_id = %s
-        """, offer.offer_type, offer.description, offer.min_profit_threshold, offer.cost, offer.offer_id)
+        await self._database.execute(UPDATE, offer.offer_type, offer.description, offer.min_profit_threshold, offer.cost, offer.offer_id)
 
     async def remove(self, offer_id: int):
-        await self._database.execute("""
-            DELETE FROM offers WHERE offer_id = %s
-        """, offer_id)
+        await self._database.execute(REMOVE, offer_id)
 
     async def get_all(self):
-        offer_tuples = await self._database.select_all("""
-            SELECT * FROM offers
-        """)
+        offer_tuples = await self._database.select_all(GET_ALL)
 
-        return [Offer(*offer_tuple.values()) for offer_tuple in offer_tuples]
+        return [Offer(*offer_tuple) for offer_tuple in offer_tuples]
 
     async def get_one(self, offer_id: int):
-        offer_tuple = await self._database.select_one("""
-            SELECT * FROM offers WHERE offer_id = %s
-        """, offer_id)
+        offer_tuple = await self._database.select_one(GET_ONE, offer_id)
 
-        return None if offer_tuple is None else Offer(*offer_tuple.values())
+        return None if offer_tuple is None else Offer(*offer_tuple)
 
     async def get_suitable_offers(self, client_monthly_profit: float):
-        offer_tuples = await self._database.select_all("""
-            SELECT * FROM offers WHERE min_profit_threshold <= %s
-        """, client_monthly_profit)
+        offer_tuples = await self._database.select_all(GET_SUITABLE, client_monthly_profit)
+
+        return [Offer(*offer_tuple) for offer_tuple in offer_tuples]
+
+    async def get_outcome_stats(self):
+        """Строки (offer_id, полоса прибыли, завершённых кейсов, из них удержано)."""
+        parts = await self._shards.each(lambda shard: shard.select_all(OUTCOME_STATS))
+
+        # Одна и та же пара (оффер, полоса) встречается в архиве и на нескольких шардах — счётчики складываются
+        totals = {}
+        for offer_id, bucket, cases, retained in (row for rows in parts for row in rows):
+            total = totals.setdefault((offer_id, bucket), [0, 0])
+            total[0] += cases
+            total[1] += retained
+
+        return [(offer_id, bucket, cases, retained) for (offer_id, bucket), (cases, retained) in totals.items()]
 
-        return [Offer(*offer_tuple.values()) for offer_tuple in offer_tuples]
\ No newline at end of file
+    async def get_type_costs(self) -> dict:
+        """offer_id -> (тип, стоимость); для кейсов с офферами не из словаря — NO_OFFER."""
+        return {offer_id: (offer_type, cost) for offer_id, offer_type, cost in await self._database.select_all(TYPE_COSTS)}
\ No newline at end of file
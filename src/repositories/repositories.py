@@ -1,15 +1,24 @@
-from src.repositories import Database
+from typing import Optional
 
+from src.repositories import Database, ShardRouter
+
+from src.repositories.client_contract_repository import ClientContractRepository
 from src.repositories.contract_repository import ContractRepository
+from src.repositories.contract_risk_repository import ContractRiskRepository
 from src.repositories.offer_repository import OfferRepository
 from src.repositories.retention_case_repository import RetentionCaseRepository
 from src.repositories.user_repository import UserRepository
 
 
 class Repositories:
-    def __init__(self, database: Database):
+    def __init__(self, database: Database, shards: Optional[ShardRouter] = None):
         self.database = database
+        # contracts и retention_cases — на шардах (без шардирования единственный шард — database)
+        self.shards = shards or ShardRouter(database)
+
         self.users = UserRepository(database)
-        self.offers = OfferRepository(database)
-        self.contracts = ContractRepository(database)
-        self.cases = RetentionCaseRepository(database)
\ No newline at end of file
+        self.offers = OfferRepository(database, self.shards)
+        self.client_contracts = ClientContractRepository(database, self.shards)
+        self.contracts = ContractRepository(self.shards, self.client_contracts)
+        self.cases = RetentionCaseRepository(self.shards)
+        self.risks = ContractRiskRepository(database, self.shards)
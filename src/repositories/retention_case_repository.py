@@ -1,15 +1,104 @@
-from src.models import RetentionCase
-from src.repositories import Database
+from typing import Optional
+
+from src.models import RetentionCase, current_month
+from src.repositories import Database, ShardRouter, Statement
+from src.repositories.case_archive import COMPLETED_MONTH, PARTITIONS_AHEAD, create_history_tables, partition_table, \
+    partitioning
+
+# Явный порядок колонок: строки отображаются в модель позиционно
+CASE_COLUMNS = "case_id, contract_id, initial_reason, proposed_offer_id, assigned_manager_id, created_at, completed_at, status"
+
+INSERT = Statement("cases.insert", """
+    INSERT INTO retention_cases (
+        contract_id,
+        initial_reason,
+        proposed_offer_id,
+        assigned_manager_id,
+        created_at,
+        completed_at,
+        status
+    ) VALUE (%s, %s, %s, %s, %s, %s, %s)
+""")
+
+REMOVE = Statement("cases.remove", """
+    DELETE FROM retention_cases WHERE case_id = %s
+""")
+
+# Счётчик правок шарда, которых не видят максимумы водяного знака дашборда (удаления кейсов и контрактов,
+# правки дохода контракта): при его изменении агрегат перезагружается целиком
+MARK_CHANGED = Statement("cases.mark_changed", """
+    INSERT INTO retention_changes (id, version) VALUE (1, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+""")
+
+# Горячие запросы клиентского сценария готовятся на сервере один раз на соединение пула
+GET_ONE = Statement("cases.get_one", f"""
+    SELECT {CASE_COLUMNS} FROM retention_cases WHERE case_id = %s
+""", prepare=True)
+
+UPDATE = Statement("cases.update", """
+    UPDATE retention_cases SET
+            contract_id = %s,
+            initial_reason = %s,
+            proposed_offer_id = %s,
+            assigned_manager_id = %s,
+            created_at = %s,
+            completed_at = %s,
+            status = %s
+        WHERE case_id = %s
+""", prepare=True)
+
+# Открытые кейсы (completed_month = 0) лежат в партиции p_open — остальные партиции не читаются
+GET_ACTIVE_FOR_CONTRACT = Statement("cases.get_active_case_for_contract", f"""
+    SELECT {CASE_COLUMNS} FROM retention_cases
+    WHERE contract_id = %s AND completed_month = 0 AND status IN ('active', 'escalated')
+""")
+
+GET_ALL = Statement("cases.get_all", f"""
+    SELECT {CASE_COLUMNS} FROM retention_cases
+""")
+
+GET_ALL_ARCHIVED = Statement("cases.get_all_archived", f"""
+    SELECT {CASE_COLUMNS} FROM retention_cases_archive
+""")
+
+GET_ALL_ESCALATED = Statement("cases.get_all_escalated", f"""
+    SELECT {CASE_COLUMNS} FROM retention_cases WHERE completed_month = 0 AND status = 'escalated'
+""")
+
+HAS_COMPLETED_AT_INDEX = Statement("cases.has_completed_at_index", """
+    SELECT 1 FROM information_schema.statistics
+    WHERE table_schema = DATABASE()
+      AND table_name = 'retention_cases'
+      AND index_name = 'idx_retention_cases_completed_at'
+    LIMIT 1
+""")
+
+CASE_ID_TYPE = Statement("cases.case_id_type", """
+    SELECT data_type FROM information_schema.columns
+    WHERE table_schema = DATABASE()
+      AND table_name = %s
+      AND column_name = 'case_id'
+""")
 
 
 class RetentionCaseRepository:
-    def __init__(self, database: Database):
-        self._database = database
+    """
+    Кейсы на шарде своего контракта. Запросы с известным contract_id идут на один шард,
+    по одному case_id без контракта и списки — на все шарды (case_id уникален между шардами). Завершённые кейсы старше
+    срока хранения переносятся в retention_cases_archive (см. case_archive) и доступны только выгрузке и аналитике.
+    """
+
+    def __init__(self, shards: ShardRouter):
+        self._shards = shards
 
-    async def create_table(self):
-        await self._database.execute("""
+    async def create_table(self, shard: Database):
+        # Партиционированная таблица не может иметь внешних ключей. История, загружаемая в новую таблицу
+        # (сид, решардинг), ложится в p_history и делится по месяцам при архивации
+        now = current_month()
+        await shard.execute(f"""
             CREATE TABLE IF NOT EXISTS retention_cases (
-                case_id INT PRIMARY KEY AUTO_INCREMENT,
+                case_id BIGINT AUTO_INCREMENT,
                 contract_id VARCHAR(32) NOT NULL,
             
                 initial_reason TEXT,
@@ -21,13 +110,35 @@ class RetentionCaseRepository:
                 completed_at DATETIME,
             
                 status ENUM('active', 'escalated', 'retained', 'churned'),
+
+                completed_month INT AS ({COMPLETED_MONTH}) STORED NOT NULL,
             
-                FOREIGN KEY (contract_id) REFERENCES Contracts(contract_id),
-                FOREIGN KEY (assigned_manager_id) REFERENCES Users(telegram_id),
-                FOREIGN KEY (proposed_offer_id) REFERENCES Offers(offer_id)
-            )
+                PRIMARY KEY (case_id, completed_month),
+                INDEX idx_retention_cases_completed_at (completed_at),
+                INDEX idx_retention_cases_contract (contract_id)
+            ) {partitioning(now, now + PARTITIONS_AHEAD)}
         """)
 
+        await create_history_tables(shard)
+        await create_changes_table(shard)
+
+    async def upgrade_table(self, shard: Database):
+        # Таблицы, созданные до появления индекса: водяной знак дашборда читает MAX(completed_at) по нему
+        if not await shard.select_one(HAS_COMPLETED_AT_INDEX):
+            await shard.execute(
+                "CREATE INDEX idx_retention_cases_completed_at ON retention_cases (completed_at)"
+            )
+
+        await partition_table(shard)
+        await create_history_tables(shard)
+        await create_changes_table(shard)
+
+        # Шаг AUTO_INCREMENT между шардами — MAX_SHARDS: в INT каждому шарду хватило бы ~33 млн номеров
+        for table, definition in (("retention_cases", "BIGINT AUTO_INCREMENT"), ("retention_cases_archive", "BIGINT")):
+            data_type, = await shard.select_one(CASE_ID_TYPE, table)
+            if data_type.lower() != "bigint":
+                await shard.execute(f"ALTER TABLE {table} MODIFY case_id {definition}")
+
     async def insert(self, retention_case: RetentionCase):
         params = (
             retention_case.contract_id,
@@ -39,63 +150,83 @@ class RetentionCaseRepository:
             retention_case.status
         )
 
-        return await self._database.execute("""
-            INSERT INTO retention_cases (
-                contract_id,
-                initial_reason,
-                proposed_offer_id,
-                assigned_manager_id,
-                created_at,
-                completed_at,
-                status
-            ) VALUE (%s, %s, %s, %s, %s, %s, %s)
-        """, *params)
+        async with self._shards.shard(retention_case.contract_id) as shard:
+            return await shard.execute(INSERT, *params)
+
+    async def insert_many(self, rows):
+        # rows — кортежи в порядке колонок INSERT, без case_id
+        inserted = 0
+        for shard, part in self._shards.group(rows).items():
+            async with shard:
+                inserted += await shard.execute_many(INSERT, part)
+
+        return inserted
 
     async def update(self, c: RetentionCase):
-        await self._database.execute("""
-            UPDATE retention_cases SET 
-                    contract_id = %s,
-                    initial_reason = %s, 
-                    proposed_offer_id = %s, 
-                    assigned_manager_id = %s, 
-                    created_at = %s, 
-                    completed_at = %s, 
-                    status = %s
-                WHERE case_id = %s
-        """,
-            c.contract_id, c.initial_reason, c.proposed_offer_id,
-            c.assigned_manager_id, c.created_at, c.completed_at, c.status, c.case_id
-        )
+        async with self._shards.shard(c.contract_id) as shard:
+            await shard.execute(UPDATE,
+                c.contract_id, c.initial_reason, c.proposed_offer_id,
+                c.assigned_manager_id, c.created_at, c.completed_at, c.status, c.case_id
+            )
+
+    async def remove(self, retention_case_id: int, contract_id: Optional[str] = None):
+        if contract_id is not None:
+            async with self._shards.shard(contract_id) as shard:
+                await _remove(shard, retention_case_id)
+            return
+
+        await self._shards.each(lambda shard: _remove(shard, retention_case_id))
 
-    async def remove(self, retention_case_id: int):
-        await self._database.execute("""
-            DELETE FROM retention_cases WHERE case_id = %s
-        """, retention_case_id)
+    async def mark_changed(self, contract_id: str):
+        """Отмечает правку, меняющую агрегат дашборда задним числом, на шарде контракта."""
+        async with self._shards.shard(contract_id) as shard:
+            await shard.execute(MARK_CHANGED)
 
-    async def get_one(self, retention_case_id: int):
-        case_tuple = await self._database.select_one("""
-            SELECT * FROM retention_cases WHERE case_id = %s
-        """, retention_case_id)
+    async def get_one(self, retention_case_id: int, contract_id: Optional[str] = None):
+        """С известным contract_id (сценарий клиента) — запрос к одному шарду, иначе — ко всем."""
+        if contract_id is not None:
+            async with self._shards.connect(self._shards.shard(contract_id)) as shard:
+                case_tuple = await shard.select_one(GET_ONE, retention_case_id)
+        else:
+            found = await self._shards.each(lambda shard: shard.select_one(GET_ONE, retention_case_id))
+            case_tuple = next((row for row in found if row is not None), None)
 
-        return None if case_tuple is None else RetentionCase(*case_tuple.values())
+        return None if case_tuple is None else RetentionCase(*case_tuple)
 
     async def get_active_case_for_contract(self, contract_id: int):
-        case_tuple = await self._database.select_one("""
-            SELECT * FROM retention_cases WHERE contract_id = %s AND status IN ('active', 'escalated')
-        """, contract_id)
+        async with self._shards.shard(contract_id) as shard:
+            case_tuple = await shard.select_one(GET_ACTIVE_FOR_CONTRACT, contract_id)
 
-        return None if case_tuple is None else RetentionCase(*case_tuple.values())
+        return None if case_tuple is None else RetentionCase(*case_tuple)
 
     async def get_all(self):
-        case_tuples = await self._database.select_all("""
-            SELECT * FROM retention_cases
-        """)
+        parts = await self._shards.each(lambda shard: shard.select_all(GET_ALL))
+
+        return [RetentionCase(*case_tuple) for case_tuples in parts for case_tuple in case_tuples]
 
-        return [RetentionCase(*case_tuple.values()) for case_tuple in case_tuples]
+    async def stream_all(self, chunk_size: int = 1000):
+        """Все кейсы, включая архивные."""
+        for query in (GET_ALL_ARCHIVED, GET_ALL):
+            async for case_tuples in self._shards.stream(query, chunk_size=chunk_size):
+                yield [RetentionCase(*case_tuple) for case_tuple in case_tuples]
 
     async def get_all_escalated(self):
-        case_tuples = await self._database.select_all("""
-            SELECT * FROM retention_cases WHERE status = 'escalated'
-        """)
+        parts = await self._shards.each(lambda shard: shard.select_all(GET_ALL_ESCALATED))
+
+        # Кейсы разных шардов — в порядке номеров, как в одной таблице
+        return sorted((RetentionCase(*case_tuple) for case_tuples in parts for case_tuple in case_tuples),
+                      key=lambda case: case.case_id)
+
+
+async def create_changes_table(shard: Database):
+    await shard.execute("""
+        CREATE TABLE IF NOT EXISTS retention_changes (
+            id TINYINT PRIMARY KEY,
+            version BIGINT NOT NULL
+        )
+    """)
+
 
-        return [RetentionCase(*case_tuple.values()) for case_tuple in case_tuples]
\ No newline at end of file
+async def _remove(shard: Database, retention_case_id: int):
+    await shard.execute(REMOVE, retention_case_id)
+    await shard.execute(MARK_CHANGED)
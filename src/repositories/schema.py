@@ -0,0 +1,138 @@
+"""
+Проверка схемы БД при запуске.
+
+Обычный запуск — один запрос к строке schema_version. DDL выполняется, только если версия в БД
+меньше SCHEMA_VERSION: под именованной блокировкой MySQL (GET_LOCK), чтобы реплики, стартующие
+одновременно, не ставили DDL в очередь за одними и теми же metadata lock'ами. Создаются только
+отсутствующие таблицы (без предупреждений «already exists»), независимые таблицы — параллельно
+на разных соединениях; у существующих выполняются шаги обновления (upgrade_table).
+contracts и retention_cases проверяются на каждом шарде, версия и блокировка — только на primary.
+"""
+import asyncio
+import logging
+
+import aiomysql
+
+from src.repositories.repositories import Repositories
+from src.repositories.statement import Statement
+
+logger = logging.getLogger(__name__)
+
+# Увеличивается при каждом изменении DDL в create_table/upgrade_table репозиториев
+SCHEMA_VERSION = 6
+
+# Сколько секунд реплика ждёт, пока схему обновляет другая
+LOCK_TIMEOUT = 60
+
+ER_NO_SUCH_TABLE = 1146
+
+GET_VERSION = Statement("schema.version", """
+    SELECT version FROM schema_version WHERE id = 1
+""")
+
+SET_VERSION = Statement("schema.set_version", """
+    INSERT INTO schema_version (id, version, applied_at)
+    VALUE (1, %s, NOW())
+    ON DUPLICATE KEY UPDATE version = VALUES(version), applied_at = VALUES(applied_at)
+""")
+
+TABLES = Statement("schema.tables", """
+    SELECT LOWER(table_name) FROM information_schema.tables WHERE table_schema = DATABASE()
+""")
+
+GET_LOCK = Statement("schema.get_lock", """
+    SELECT GET_LOCK(CONCAT(DATABASE(), '.schema'), %s)
+""")
+
+RELEASE_LOCK = Statement("schema.release_lock", """
+    SELECT RELEASE_LOCK(CONCAT(DATABASE(), '.schema'))
+""")
+
+
+def schema_levels(repositories: Repositories) -> list:
+    """
+    Таблицы по уровням внешних ключей: таблицы одного уровня друг от друга не зависят.
+    Элемент — (таблица, база, репозиторий, аргументы create_table/upgrade_table); contracts и
+    retention_cases создаются на каждом шарде.
+    """
+    database, shards = repositories.database, repositories.shards.shards
+    return [
+        [("users", database, repositories.users, ()), ("offers", database, repositories.offers, ())]
+        + [("contracts", shard, repositories.contracts, (shard,)) for shard in shards],
+        [("contract_risk", database, repositories.risks, ()),
+         ("client_contracts", database, repositories.client_contracts, ())]
+        + [("retention_cases", shard, repositories.cases, (shard,)) for shard in shards],
+    ]
+
+
+async def schema_version(repositories: Repositories) -> int:
+    """Версия схемы в БД; 0 — база ещё не знает о версиях (пустая или созданная до schema_version)."""
+    try:
+        row = await repositories.database.select_one(GET_VERSION)
+    except aiomysql.ProgrammingError as e:
+        if e.args[0] != ER_NO_SUCH_TABLE:
+            raise
+        return 0
+
+    return row[0] if row else 0
+
+
+async def ensure_schema(repositories: Repositories) -> bool:
+    """Приводит схему к SCHEMA_VERSION; возвращает True, если этим вызовом выполнялся DDL."""
+    database = repositories.database
+
+    async with database:
+        if await schema_version(repositories) >= SCHEMA_VERSION:
+            return False
+
+        # Блокировка принадлежит соединению: держим его до записи новой версии
+        locked, = await database.select_one(GET_LOCK, LOCK_TIMEOUT)
+        if locked != 1:
+            raise TimeoutError(f"Не удалось за {LOCK_TIMEOUT} с получить блокировку обновления схемы")
+
+        try:
+            # Пока ждали блокировку, схему могла обновить другая реплика
+            if await schema_version(repositories) >= SCHEMA_VERSION:
+                return False
+
+            levels = schema_levels(repositories)
+            existing = await _existing_tables([entry[1] for level in levels for entry in level])
+            logger.info("Обновление схемы БД до версии %d", SCHEMA_VERSION)
+
+            for level in levels:
+                await asyncio.gather(*(_apply(target, repository, table in existing[target], args)
+                                       for table, target, repository, args in level))
+
+            if "schema_version" not in existing[database]:
+                await database.execute("""
+                    CREATE TABLE schema_version (
+                        id TINYINT PRIMARY KEY,
+                        version INT NOT NULL,
+                        applied_at DATETIME NOT NULL
+                    )
+                """)
+
+            await database.execute(SET_VERSION, SCHEMA_VERSION)
+            return True
+        finally:
+            await database.select_one(RELEASE_LOCK)
+
+
+async def _existing_tables(databases) -> dict:
+    """Таблицы каждой базы (primary и шарды)."""
+    existing = {}
+    for database in databases:
+        if database not in existing:
+            async with database:
+                existing[database] = {row[0] for row in await database.select_all(TABLES)}
+
+    return existing
+
+
+async def _apply(database, repository, exists: bool, args: tuple):
+    # Отдельная задача gather — отдельное соединение из пула
+    async with database:
+        if not exists:
+            await repository.create_table(*args)
+        elif hasattr(repository, "upgrade_table"):
+            await repository.upgrade_table(*args)
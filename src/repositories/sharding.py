@@ -0,0 +1,109 @@
+"""
+Шардирование contracts и retention_cases.
+
+Контракт живёт на шарде crc32(contract_id) % число шардов, его кейсы — на том же шарде, поэтому
+JOIN кейсов с контрактом остаётся локальным. users, offers, contract_risk и индекс клиентов
+client_contracts (Telegram ID -> contract_id) остаются на primary.
+Без DB_SHARDS единственный шард — сам primary, и запросы идут туда же, что и раньше.
+
+Внутри блока database.replica() запросы к шардам идут на реплики шардов (DB_SHARD_REPLICAS): connect(шард)
+выбирает реплику или сам шард, each и stream используют его же.
+
+case_id уникален между шардами: у шарда i соединения открываются с auto_increment_offset = i + 1
+и общим шагом MAX_SHARDS, поэтому кейс можно перенести на другой шард, не меняя его номер.
+"""
+import asyncio
+import zlib
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from src.config import Settings
+from src.repositories.database import Database, in_replica_block
+from src.repositories.statement import Statement
+
+# Шаг AUTO_INCREMENT кейсов; шардов может быть не больше
+MAX_SHARDS = 64
+
+
+def shard_index(contract_id, shards: int) -> int:
+    # crc32 не зависит от PYTHONHASHSEED: все процессы и инструмент решардинга считают одинаково
+    return zlib.crc32(str(contract_id).encode()) % shards
+
+
+class ShardRouter:
+    """Шарды contracts/retention_cases и маршрутизация по contract_id; fan-out для запросов по всем шардам."""
+
+    def __init__(self, primary: Database, shards: Optional[List[Database]] = None):
+        self.primary = primary
+        self.shards = shards or [primary]
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.shards) > 1 or self.shards[0] is not self.primary
+
+    def shard(self, contract_id) -> Database:
+        return self.shards[shard_index(contract_id, len(self.shards))]
+
+    @staticmethod
+    def connect(shard: Database) -> AsyncContextManager[Database]:
+        """Соединение с шардом: в блоке database.replica() — с его репликой, иначе — с самим шардом."""
+        return shard.replica() if in_replica_block() else shard
+
+    def group(self, rows: Iterable[tuple], key: Callable[[tuple], object] = lambda row: row[0]) -> Dict[Database, list]:
+        """Раскладывает строки по шардам; по умолчанию contract_id — первая колонка."""
+        groups: Dict[Database, list] = {}
+        for row in rows:
+            groups.setdefault(self.shard(key(row)), []).append(row)
+
+        return groups
+
+    async def each(self, call: Callable[[Database], Awaitable]) -> list:
+        """
+        Выполняет call(шард) на всех шардах параллельно, результаты — в порядке шардов.
+        Единственный шард вызывается в текущей задаче: уже открытое соединение (например, реплики) переиспользуется.
+        """
+        if len(self.shards) == 1:
+            async with self.connect(self.shards[0]) as shard:
+                return [await call(shard)]
+
+        return list(await asyncio.gather(*(self._call(shard, call) for shard in self.shards)))
+
+    async def stream(self, query: Union[str, Statement], *params, chunk_size: int = 1000) -> AsyncIterator[List[tuple]]:
+        """Потоковое чтение запроса со всех шардов по очереди (порядок строк — внутри шарда)."""
+        for shard in self.shards:
+            async with self.connect(shard):
+                async for rows in shard.select_stream(query, *params, chunk_size=chunk_size):
+                    yield rows
+
+    async def open_pool(self):
+        for shard in self.shards:
+            await shard.open_pool()
+
+    async def close(self):
+        for shard in self.shards:
+            await shard.close()
+
+    @classmethod
+    async def _call(cls, shard: Database, call: Callable[[Database], Awaitable]):
+        async with cls.connect(shard):
+            return await call(shard)
+
+
+def shard_databases(settings: Settings, dsns: List[str], replicas: Optional[List[List[str]]] = None) -> List[Database]:
+    """replicas[i] — реплики шарда i (может быть короче списка шардов)."""
+    if len(dsns) > MAX_SHARDS:
+        raise ValueError(f"Шардов больше {MAX_SHARDS}: номера кейсов разных шардов начнут совпадать")
+
+    replicas = replicas or []
+    return [
+        Database(settings, dsn, session=f"SET SESSION auto_increment_increment = {MAX_SHARDS}, "
+                                        f"auto_increment_offset = {index + 1}",
+                 replicas=replicas[index] if index < len(replicas) else [])
+        for index, dsn in enumerate(dsns)
+    ]
+
+
+def create_shard_router(settings: Settings, database: Database) -> ShardRouter:
+    if not settings.db_shards:
+        return ShardRouter(database)
+
+    return ShardRouter(database, shard_databases(settings, settings.db_shards, settings.db_shard_replicas))
@@ -0,0 +1,25 @@
+class Statement:
+    """
+    Именованный SQL-запрос репозитория. Имя используется в метриках и журнале медленных запросов.
+
+    Запросы с prepare=True, пока соединение живёт в пуле, Database готовит на сервере (PREPARE)
+    один раз и дальше передаёт только параметры (EXECUTE ... USING). Плейсхолдеры — обычные %s.
+    """
+
+    __slots__ = ("name", "query", "prepare", "server_name", "prepared_query")
+
+    def __init__(self, name: str, query: str, prepare: bool = False):
+        self.name = name
+        self.query = query
+        self.prepare = prepare
+
+        # Имя серверного подготовленного запроса должно быть идентификатором
+        self.server_name = "cr_" + name.replace(".", "_")
+        # В PREPARE плейсхолдеры — "?", а "%%" после подстановки параметров превращается в "%"
+        self.prepared_query = " ".join(query.split()).replace("%s", "?").replace("%%", "%")
+
+    def __str__(self):
+        return self.query
+
+    def __repr__(self):
+        return f"Statement({self.name!r})"
@@ -1,5 +1,26 @@
 from src.models import User
 from src.repositories.database import Database
+from src.repositories.statement import Statement
+
+# Явный порядок колонок: строки отображаются в модель позиционно
+USER_COLUMNS = "telegram_id, role"
+
+INSERT = Statement("users.insert", """
+    INSERT INTO users (telegram_id, role) VALUE (%s, %s)
+""")
+
+# Горячий запрос: выполняется UserMiddleware на каждом апдейте
+GET_ONE = Statement("users.get_one", f"""
+    SELECT {USER_COLUMNS} FROM users WHERE telegram_id = %s
+""", prepare=True)
+
+GET_FREE_ADMINS = Statement("users.get_free_admins", f"""
+    SELECT {USER_COLUMNS} FROM users WHERE role = 'admin'
+""")
+
+GET_ALL = Statement("users.get_all", f"""
+    SELECT {USER_COLUMNS} FROM users
+""")
 
 class UserRepository:
     def __init__(self, database: Database):
@@ -14,27 +35,22 @@ class UserRepository:
         """)
 
     async def insert(self, user: User):
-        await self._database.execute("""
-            INSERT INTO users (telegram_id, role) VALUE (%s, %s)
-        """, *user.tuple())
+        await self._database.execute(INSERT, *user.tuple())
+
+    async def insert_many(self, rows):
+        return await self._database.execute_many(INSERT, list(rows))
 
     async def get_one(self, telegram_id: int):
-        user_tuple = await self._database.select_one("""
-            SELECT * FROM users WHERE telegram_id = %s
-        """, telegram_id)
+        user_tuple = await self._database.select_one(GET_ONE, telegram_id)
 
-        return None if user_tuple is None else User(*user_tuple.values())
+        return None if user_tuple is None else User(*user_tuple)
 
     async def get_free_admins(self):
-        user_tuples = await self._database.select_all("""
-            SELECT * FROM users WHERE role = 'admin'
-        """)
+        user_tuples = await self._database.select_all(GET_FREE_ADMINS)
 
-        return [User(*user_tuple.values()) for user_tuple in user_tuples]
+        return [User(*user_tuple) for user_tuple in user_tuples]
 
     async def get_all(self):
-        user_tuples = await self._database.select_all("""
-            SELECT * FROM users
-        """)
+        user_tuples = await self._database.select_all(GET_ALL)
 
-        return [User(*user_tuple.values()) for user_tuple in user_tuples]
\ No newline at end of file
+        return [User(*user_tuple) for user_tuple in user_tuples]
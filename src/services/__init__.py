@@ -1 +1,22 @@
-from src.services.screenshot_service import DashboardScreenshotService
\ No newline at end of file
+import importlib
+
+from src.services.export_service import ExportService, EXPORT_FORMATS, EXPORT_ENTITIES
+from src.services.metrics_server import MetricsServer
+from src.services.offer_selector import OfferSelector, OfferTable
+from src.services.render_server import RenderServer
+from src.services.screenshot_service import DashboardScreenshotService, RemoteScreenshotService
+
+# Сервисы с тяжёлыми зависимостями (pandas) загружаются при первом обращении: бот их не использует,
+# и импорт src.services не должен задерживать его запуск
+_LAZY = {
+    'ChurnRiskModel': 'src.services.churn_risk',
+    'score_contracts': 'src.services.churn_risk',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(module), name)
@@ -0,0 +1,298 @@
+"""
+Пакетная оценка риска оттока активных контрактов.
+
+Оценка — вероятность того, что контракт в ближайшие HORIZON_MONTHS месяцев обратится (откроется кейс)
+или уйдёт. Модель обучается на контрактах, а не на кейсах: для каждого из SNAPSHOTS месячных срезов
+в прошлом (окно после среза уже целиком известно) берутся все контракты, не ушедшие до среза, их признаки
+на момент среза и метка «был кейс или уход в окне». У contracts нет даты создания, поэтому в срез
+попадают и контракты, заведённые позже него.
+
+Модель — сглаженные доли положительной метки по уровням признаков (target encoding), сложенные в логитах
+как в наивном байесе: logit(p) = logit(base) + Σ (logit(rate_признака) - logit(base)). Признаки — полоса
+прибыли контракта, можно ли его удерживать, сколько кейсов было до среза, сколько месяцев прошло
+с последнего из них и его нормализованная причина.
+
+Для оценки те же признаки берутся на текущий момент. Контракты читаются пачками по первичному ключу,
+оценка пачки — несколько векторных операций, запись — многострочными INSERT ... ON DUPLICATE KEY UPDATE.
+"""
+import datetime
+import logging
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.text import normalize_reason
+from src.models import month_key
+from src.repositories import Repositories, Statement
+from src.repositories.contract_risk_repository import HORIZON_MONTHS
+
+logger = logging.getLogger(__name__)
+
+# Все кейсы в порядке создания: месяц создания, месяц ухода (только у churned) и причина
+CASE_HISTORY_SELECT = """
+    SELECT
+        contract_id,
+        YEAR(created_at) * 12 + MONTH(created_at) - 1,
+        IF(status = 'churned', YEAR(COALESCE(completed_at, created_at)) * 12
+                               + MONTH(COALESCE(completed_at, created_at)) - 1, NULL),
+        initial_reason
+    FROM {table}
+    ORDER BY case_id
+"""
+
+CASE_HISTORY = Statement("churn_risk.case_history", CASE_HISTORY_SELECT.format(table="retention_cases"))
+ARCHIVED_CASE_HISTORY = Statement("churn_risk.archived_case_history",
+                                  CASE_HISTORY_SELECT.format(table="retention_cases_archive"))
+
+# Все контракты, включая закрытые: ушедшие после среза — положительные примеры обучения
+CONTRACTS = Statement("churn_risk.contracts", """
+    SELECT contract_id, monthly_profit + 0e0, can_be_retained FROM contracts
+""")
+
+# Активные контракты пачками по первичному ключу (keyset): между пачками соединение свободно для записи
+ACTIVE_CONTRACTS = Statement("churn_risk.active_contracts", """
+    SELECT contract_id, monthly_profit + 0e0, can_be_retained
+    FROM contracts
+    WHERE active AND contract_id > %s
+    ORDER BY contract_id
+    LIMIT %s
+""")
+
+# Число обучающих срезов (соседние отстоят на месяц); окно метки — HORIZON_MONTHS
+SNAPSHOTS = 6
+
+PROFIT_TIERS = 24
+# Уровни «кейсов раньше»: 0, 1, 2, 3 и больше
+PREVIOUS_LEVELS = 4
+# Уровни давности прошлого кейса: нет кейса, <1, 1-2, 3-5, 6-11, 12+ месяцев
+RECENCY_EDGES = np.array([1, 3, 6, 12])
+# Псевдокейсы общей доли в каждом уровне и минимальная частота причины, чтобы у неё была своя доля
+PRIOR_WEIGHT = 50
+MIN_REASON_CASES = 30
+
+
+def profit_tier(profit) -> np.ndarray:
+    return np.clip(np.floor(np.log2(np.maximum(profit, 1.0))), 0, PROFIT_TIERS - 1).astype(np.int64)
+
+
+def recency_level(months) -> np.ndarray:
+    """0 — кейсов не было, дальше номер интервала давности RECENCY_EDGES."""
+    months = np.asarray(months, dtype=np.float64)
+    levels = np.digitize(np.nan_to_num(months, nan=0), RECENCY_EDGES) + 1
+    return np.where(np.isnan(months), 0, levels)
+
+
+def normalize_reasons(reasons) -> np.ndarray:
+    # Различных причин на порядки меньше, чем кейсов: нормализуется только каждое уникальное значение
+    codes, uniques = pd.factorize(pd.Series(reasons, dtype=object))
+    normalized = np.array([normalize_reason(text) for text in uniques] + [""], dtype=object)
+    return normalized[codes]
+
+
+def logit(p):
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return np.log(p / (1 - p))
+
+
+class ChurnRiskModel:
+    """Доли положительной метки по уровням признаков; score() векторно оценивает пачку контрактов."""
+
+    def __init__(self, base: float, tiers: np.ndarray, retainable: np.ndarray, previous: np.ndarray,
+                 recency: np.ndarray, reasons: pd.Index, reason_rates: np.ndarray):
+        self.base = base
+        self.tiers = tiers
+        self.retainable = retainable
+        self.previous = previous
+        self.recency = recency
+        self.reasons = reasons
+        self.reason_rates = reason_rates
+
+    @classmethod
+    def fit(cls, samples: pd.DataFrame) -> "ChurnRiskModel":
+        """samples — результат training_samples: признаки контракта на срез и метка label."""
+        label = samples['label'].to_numpy(dtype=np.float64)
+        base = (label.sum() + 1) / (len(samples) + 2)
+
+        def rates(levels, size, mask=slice(None)):
+            n = np.bincount(levels[mask], minlength=size)
+            k = np.bincount(levels[mask], weights=label[mask], minlength=size)
+            return (k + PRIOR_WEIGHT * base) / (n + PRIOR_WEIGHT)
+
+        # Причина есть только у контрактов с кейсами до среза; у остальных она не влияет на оценку
+        reason_counts = samples['reason'].value_counts()
+        reasons = pd.Index(reason_counts.index[reason_counts >= MIN_REASON_CASES], dtype=object)
+        reason_codes = reasons.get_indexer(samples['reason'])
+
+        return cls(
+            base=base,
+            tiers=rates(samples['tier'].to_numpy(), PROFIT_TIERS),
+            retainable=rates(samples['retainable'].to_numpy(dtype=np.int64), 2),
+            previous=rates(samples['previous'].to_numpy(), PREVIOUS_LEVELS),
+            recency=rates(samples['recency'].to_numpy(), len(RECENCY_EDGES) + 2),
+            reasons=reasons,
+            reason_rates=rates(np.maximum(reason_codes, 0), len(reasons), reason_codes >= 0),
+        )
+
+    def score(self, tier, retainable, previous, recency, reason_codes) -> np.ndarray:
+        base = logit(self.base)
+        # Неизвестная или редкая причина (код -1) получает общую долю — последний элемент
+        reason_rates = np.append(self.reason_rates, self.base)[np.where(reason_codes >= 0, reason_codes, -1)]
+
+        z = base + sum(logit(rates) - base for rates in (
+            self.tiers[tier],
+            self.retainable[retainable],
+            self.previous[previous],
+            self.recency[recency],
+            reason_rates,
+        ))
+        return 1 / (1 + np.exp(-z))
+
+
+def case_history(contract_ids, month, churn_month, reason) -> pd.DataFrame:
+    """Кейсы в порядке case_id: контракт, месяц создания, месяц ухода (NaN, если кейс не churned), причина."""
+    return pd.DataFrame({
+        'contract': pd.Series(contract_ids, dtype=object),
+        'month': np.asarray(month, dtype=np.int64),
+        'churn_month': np.asarray(churn_month, dtype=np.float64),
+        'reason': normalize_reasons(reason),
+    })
+
+
+def contract_frame(contract_ids, profit, can_be_retained) -> pd.DataFrame:
+    return pd.DataFrame({
+        'tier': profit_tier(np.asarray(profit, dtype=np.float64)),
+        'retainable': np.asarray(can_be_retained, dtype=bool),
+    }, index=pd.Index(contract_ids, dtype=object, name='contract'))
+
+
+def contract_history(cases: pd.DataFrame, until: Optional[int] = None) -> pd.DataFrame:
+    """Сводка по контракту на начало месяца until (по умолчанию — по всем кейсам): число кейсов, месяц и причина последнего."""
+    if until is not None:
+        cases = cases[cases['month'].to_numpy() < until]
+
+    return cases.groupby('contract', sort=False).agg(
+        cases=('month', 'size'), last_month=('month', 'last'), last_reason=('reason', 'last')
+    )
+
+
+def training_samples(cases: pd.DataFrame, contracts: pd.DataFrame, snapshots: Iterable[int]) -> pd.DataFrame:
+    """
+    Обучающие строки: контракт × срез. Признаки — на начало месяца среза, label — кейс или уход
+    в [срез, срез + HORIZON_MONTHS). Контракты, ушедшие до среза, в него не входят.
+    """
+    month = cases['month'].to_numpy()
+    churn_month = cases['churn_month'].to_numpy()
+    contract = cases['contract'].to_numpy()
+
+    parts = []
+    for snapshot in snapshots:
+        end = snapshot + HORIZON_MONTHS
+        gone = pd.unique(contract[churn_month < snapshot])
+        positive = pd.unique(contract[((month >= snapshot) & (month < end))
+                                      | ((churn_month >= snapshot) & (churn_month < end))])
+
+        population = contracts[~contracts.index.isin(gone)]
+        history = contract_history(cases, snapshot).reindex(population.index)
+        previous = history['cases'].fillna(0).to_numpy(dtype=np.int64)
+
+        parts.append(pd.DataFrame({
+            'tier': population['tier'].to_numpy(),
+            'retainable': population['retainable'].to_numpy(),
+            'previous': np.minimum(previous, PREVIOUS_LEVELS - 1),
+            'recency': recency_level(snapshot - history['last_month'].to_numpy(dtype=np.float64)),
+            'reason': history['last_reason'].to_numpy(),
+            'label': population.index.isin(positive),
+        }))
+
+    return pd.concat(parts, ignore_index=True)
+
+
+async def load_cases(repos: Repositories, chunk_size: int) -> pd.DataFrame:
+    columns = [[], [], [], []]
+    # Кейсы контракта лежат на одном шарде, а архивные старше горячих — порядок истории контракта
+    # сохраняется, когда архив и горячая таблица читаются с шардов подряд
+    for query in (ARCHIVED_CASE_HISTORY, CASE_HISTORY):
+        async for rows in repos.shards.stream(query, chunk_size=chunk_size):
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+
+    return case_history(*columns)
+
+
+async def load_contracts(repos: Repositories, chunk_size: int) -> pd.DataFrame:
+    columns = [[], [], []]
+    async for rows in repos.shards.stream(CONTRACTS, chunk_size=chunk_size):
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+
+    return contract_frame(*columns)
+
+
+async def score_contracts(repos: Repositories, chunk_size: int = 50_000, now: Optional[int] = None) -> dict:
+    """
+    Обучает модель на срезах контрактов и переписывает contract_risk для всех активных контрактов.
+    Возвращает сводку прогона. Вызывается внутри `async with database`; контракты читаются с каждого шарда,
+    оценки пишутся в contract_risk на primary.
+    """
+    started = time.perf_counter()
+    scored_at = datetime.datetime.now().replace(microsecond=0)
+    if now is None:
+        now = month_key(scored_at.year, scored_at.month)
+
+    cases = await load_cases(repos, chunk_size)
+    # Последний срез — HORIZON_MONTHS месяцев назад: окно его метки уже закончилось
+    snapshots = range(now - HORIZON_MONTHS - SNAPSHOTS + 1, now - HORIZON_MONTHS + 1)
+    samples = training_samples(cases, await load_contracts(repos, chunk_size), snapshots)
+    model = ChurnRiskModel.fit(samples)
+
+    history = contract_history(cases)
+    reason_codes = model.reasons.get_indexer(history['last_reason'])
+    logger.info("Модель риска оттока: %d кейсов, %d строк срезов, доля кейса или ухода за %d мес. %.3f",
+                len(cases), len(samples), HORIZON_MONTHS, model.base)
+
+    scored = 0
+    for shard in repos.shards.shards:
+        after = ""
+        while True:
+            async with shard:
+                rows = await shard.select_all(ACTIVE_CONTRACTS, after, chunk_size)
+            if not rows:
+                break
+
+            after = rows[-1][0]
+            contract_ids, profit, can_be_retained = zip(*rows)
+            position = history.index.get_indexer(contract_ids)
+            seen = position >= 0
+
+            previous = np.where(seen, history['cases'].to_numpy()[position], 0)
+            months_since = np.where(seen, now - history['last_month'].to_numpy()[position], np.nan)
+            reasons = np.where(seen, reason_codes[position], -1)
+
+            scores = model.score(
+                profit_tier(np.asarray(profit, dtype=np.float64)),
+                np.asarray(can_be_retained, dtype=np.int64),
+                np.minimum(previous, PREVIOUS_LEVELS - 1),
+                recency_level(months_since),
+                reasons,
+            )
+
+            await repos.risks.upsert_many(zip(
+                contract_ids,
+                np.round(scores, 6).tolist(),
+                previous.tolist(),
+                [None if np.isnan(m) else int(m) for m in months_since],
+                [scored_at] * len(rows),
+            ))
+            scored += len(rows)
+
+    await repos.risks.remove_stale(scored_at)
+
+    return {
+        'cases': len(cases),
+        'samples': len(samples),
+        'contracts': scored,
+        'base_rate': model.base,
+        'seconds': time.perf_counter() - started,
+    }
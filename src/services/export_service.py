@@ -0,0 +1,105 @@
+import csv
+from dataclasses import fields
+from pathlib import Path
+from typing import AsyncIterator, List, Sequence
+
+from src.models import Contract, RetentionCase
+from src.repositories import Repositories
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+EXPORT_ENTITIES = {
+    "contracts": [field.name for field in fields(Contract)],
+    "cases": [field.name for field in fields(RetentionCase)],
+}
+
+
+def _parquet_schema(entity: str):
+    import pyarrow as pa
+
+    if entity == "contracts":
+        return pa.schema([
+            ("contract_id", pa.string()),
+            ("client_telegram_id", pa.int64()),
+            ("last_name", pa.string()),
+            ("first_name", pa.string()),
+            ("middle_name", pa.string()),
+            ("email", pa.string()),
+            ("phone", pa.string()),
+            ("can_be_retained", pa.bool_()),
+            ("monthly_profit", pa.decimal128(10, 2)),
+            ("active", pa.bool_()),
+        ])
+
+    return pa.schema([
+        ("case_id", pa.int64()),
+        ("contract_id", pa.string()),
+        ("initial_reason", pa.string()),
+        ("proposed_offer_id", pa.int64()),
+        ("assigned_manager_id", pa.int64()),
+        ("created_at", pa.timestamp("s")),
+        ("completed_at", pa.timestamp("s")),
+        ("status", pa.string()),
+    ])
+
+
+class ExportService:
+    """Потоковая выгрузка таблиц в CSV/Parquet: в памяти держится не больше одной пачки строк."""
+
+    def __init__(self, repositories: Repositories, chunk_size: int = 5000):
+        self._repos = repositories
+        self._chunk_size = chunk_size
+
+    def _stream(self, entity: str) -> AsyncIterator[List]:
+        if entity == "contracts":
+            return self._repos.contracts.stream_all(self._chunk_size)
+        elif entity == "cases":
+            return self._repos.cases.stream_all(self._chunk_size)
+
+        raise ValueError(f"Неизвестная сущность для выгрузки: {entity}")
+
+    async def export(self, entity: str, fmt: str, output_path: str | Path) -> int:
+        """Выгружает сущность в файл и возвращает количество записанных строк. Вызывать внутри `async with database`."""
+        if entity not in EXPORT_ENTITIES:
+            raise ValueError(f"Неизвестная сущность для выгрузки: {entity}")
+
+        if fmt == "csv":
+            return await self._export_csv(entity, Path(output_path))
+        elif fmt == "parquet":
+            return await self._export_parquet(entity, Path(output_path))
+
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+
+    async def _export_csv(self, entity: str, output_path: Path) -> int:
+        written = 0
+
+        with output_path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_ENTITIES[entity])
+
+            async for chunk in self._stream(entity):
+                writer.writerows(item.tuple() for item in chunk)
+                written += len(chunk)
+
+        return written
+
+    async def _export_parquet(self, entity: str, output_path: Path) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Для выгрузки в Parquet установите пакет pyarrow")
+
+        schema = _parquet_schema(entity)
+        written = 0
+
+        with pq.ParquetWriter(output_path, schema) as writer:
+            async for chunk in self._stream(entity):
+                columns: Sequence = list(zip(*(item.tuple() for item in chunk)))
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                written += len(chunk)
+
+        return written
@@ -0,0 +1,46 @@
+import logging
+from typing import Optional
+
+from aiohttp import web
+
+from src.metrics import MetricsRegistry, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics с агрегатами реестра в текстовом формате Prometheus и /healthz для супервизора."""
+
+    def __init__(self, host: str, port: int, registry: MetricsRegistry = REGISTRY):
+        self._host = host
+        self._port = port
+        self._registry = registry
+
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self._registry.render(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"}
+        )
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        # Отвечает event loop бота: зависший цикл не ответит, и супервизор перезапустит процесс
+        return web.json_response({"status": "ok"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        app.router.add_get("/healthz", self._handle_health)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+
+        logger.info("Метрики доступны на http://%s:%s/metrics", self._host, self._port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from src.models import Offer
+from src.repositories import Repositories
+
+logger = logging.getLogger(__name__)
+
+# Полосы прибыли по степеням двойки: полоса b — monthly_profit в [2^b, 2^(b+1)), последняя — всё выше
+PROFIT_BUCKETS = 24
+
+# На сколько месяцев вперёд считается прибыль удержанного клиента при сравнении с ценой оффера
+HORIZON_MONTHS = 12
+
+# Вес априорной доли удержаний в псевдокейсах: мало данных по полосе — оценка ближе к доле оффера в целом
+PRIOR_WEIGHT = 20
+
+
+def profit_bucket(monthly_profit: float) -> int:
+    return int(min(max(np.floor(np.log2(max(float(monthly_profit), 1.0))), 0), PROFIT_BUCKETS - 1))
+
+
+class OfferTable:
+    """
+    Компактная таблица выбора офферов: пороги и стоимость офферов (вектор длины K) и сглаженная
+    доля удержаний по полосам прибыли (матрица PROFIT_BUCKETS x K).
+    """
+
+    __slots__ = ("offers", "thresholds", "costs", "acceptance", "built_at")
+
+    def __init__(self, offers: List[Offer], thresholds: np.ndarray, costs: np.ndarray, acceptance: np.ndarray):
+        self.offers = offers
+        self.thresholds = thresholds
+        self.costs = costs
+        self.acceptance = acceptance
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, offers: List[Offer], stats) -> "OfferTable":
+        index = {offer.offer_id: k for k, offer in enumerate(offers)}
+
+        cases = np.zeros((PROFIT_BUCKETS, len(offers)))
+        retained = np.zeros((PROFIT_BUCKETS, len(offers)))
+
+        # Статистика удалённых офферов не нужна
+        rows = [(index[offer_id], bucket, total, kept) for offer_id, bucket, total, kept in stats if offer_id in index]
+        if rows:
+            k, bucket, total, kept = (np.asarray(column, dtype=np.float64) for column in zip(*rows))
+            k = k.astype(np.int64)
+            bucket = np.clip(bucket, 0, PROFIT_BUCKETS - 1).astype(np.int64)
+            np.add.at(cases, (bucket, k), total)
+            np.add.at(retained, (bucket, k), kept)
+
+        # Двухуровневое сглаживание: общая доля → доля оффера → доля оффера в полосе
+        overall = (retained.sum() + 1) / (cases.sum() + 2)
+        per_offer = (retained.sum(axis=0) + PRIOR_WEIGHT * overall) / (cases.sum(axis=0) + PRIOR_WEIGHT)
+        acceptance = (retained + PRIOR_WEIGHT * per_offer) / (cases + PRIOR_WEIGHT)
+
+        return cls(
+            offers=offers,
+            thresholds=np.array([float(offer.min_profit_threshold) for offer in offers]),
+            costs=np.array([float(offer.cost) for offer in offers]),
+            acceptance=acceptance,
+        )
+
+    def scores(self, monthly_profit: float) -> np.ndarray:
+        """Ожидаемая чистая прибыль от каждого оффера; неподходящие по порогу — -inf."""
+        profit = float(monthly_profit)
+        scores = self.acceptance[profit_bucket(profit)] * (profit * HORIZON_MONTHS - self.costs)
+
+        return np.where(self.thresholds <= profit, scores, -np.inf)
+
+    def best(self, monthly_profit: float, rng: np.random.Generator, exploration: float = 0.0) -> Optional[Offer]:
+        """Оффер с наибольшей ожидаемой чистой прибылью; None, если ни один оффер не окупается."""
+        scores = self.scores(monthly_profit)
+        # Убыточные офферы (стоимость выше ожидаемой прибыли удержания) не предлагаются и при исследовании
+        suitable = np.flatnonzero(scores >= 0)
+        if not len(suitable):
+            return None
+
+        # Небольшая доля случайных выборов, чтобы у новых и редких офферов копилась статистика
+        if exploration and rng.random() < exploration:
+            return self.offers[int(rng.choice(suitable))]
+
+        best = int(np.argmax(scores))
+        return self.offers[best] if scores[best] > 0 else None
+
+
+class OfferSelector:
+    """
+    Выбор оффера для клиента по истории исходов кейсов: максимум ожидаемой чистой прибыли
+    (доля удержаний * прибыль за HORIZON_MONTHS - стоимость оффера) среди офферов с подходящим порогом;
+    если ни один оффер не даёт положительной ожидаемой прибыли, оффер не предлагается.
+
+    Таблица пересчитывается из БД не чаще раза в refresh_interval секунд или после invalidate()
+    (администратор изменил офферы), выбор на запрос — векторный просмотр одной строки таблицы.
+    Пересчёт статистики идёт в фоновой задаче, клиент получает выбор по прежней таблице; ждут только самый
+    первый запрос (таблицы ещё нет) и первый запрос после invalidate() — он перечитывает лишь список офферов,
+    чтобы удалённый оффер не был предложен.
+    """
+
+    def __init__(self, repositories: Repositories, refresh_interval: float = 300, exploration: float = 0.05,
+                 seed: Optional[int] = None):
+        self._repos = repositories
+        self.refresh_interval = refresh_interval
+        self.exploration = exploration
+
+        self._table: Optional[OfferTable] = None
+        self._stats = []
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._refreshing: Optional[asyncio.Task] = None
+        self._rng = np.random.default_rng(seed)
+
+    def invalidate(self):
+        # Может вызываться из обработчика шины событий в другом потоке — только выставляет флаг
+        self._stale = True
+
+    async def select(self, monthly_profit: float) -> Optional[Offer]:
+        table = await self.table()
+        return table.best(monthly_profit, self._rng, self.exploration)
+
+    async def table(self) -> OfferTable:
+        if self._table is None or self._stale:
+            async with self._lock:
+                if self._table is None:
+                    await self._refresh()
+                elif self._stale:
+                    await self._reload_offers()
+
+        # Агрегация исходов по всем кейсам — не в запросе клиента
+        elif self._expired() and (self._refreshing is None or self._refreshing.done()):
+            self._refreshing = asyncio.create_task(self._refresh_in_background())
+
+        return self._table
+
+    async def _refresh_in_background(self):
+        async with self._lock:
+            if self._expired():
+                await self._refresh()
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._table.built_at >= self.refresh_interval
+
+    async def _reload_offers(self):
+        """Новый список офферов со старой статистикой; возраст статистики не сбрасывается."""
+        self._stale = False
+
+        try:
+            async with self._repos.database:
+                offers = await self._repos.offers.get_all()
+        except Exception as e:
+            logger.error("Ошибка при обновлении списка офферов: %s", e)
+            return
+
+        built_at = self._table.built_at
+        self._table = OfferTable.build(offers, self._stats)
+        self._table.built_at = built_at
+
+    async def _refresh(self):
+        self._stale = False
+
+        try:
+            async with self._repos.database:
+                offers = await self._repos.offers.get_all()
+                stats = await self._repos.offers.get_outcome_stats()
+        except Exception as e:
+            # Старая таблица лучше, чем отказ клиенту; без таблицы ошибка уходит в обработчик
+            if self._table is None:
+                raise
+
+            logger.error("Ошибка при обновлении таблицы выбора офферов: %s", e)
+            self._table.built_at = time.monotonic()
+            return
+
+        self._stats = stats
+        self._table = OfferTable.build(offers, stats)
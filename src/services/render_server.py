@@ -0,0 +1,71 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Optional
+
+from aiohttp import web
+
+from src.services.screenshot_service import DashboardScreenshotService
+
+logger = logging.getLogger(__name__)
+
+# Имя блока — CSS-класс из разметки дашборда
+BLOCK_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class RenderServer:
+    """
+    HTTP-сервис скриншотов дашборда для отдельного процесса-рендерера:
+    POST /render?block=<css-класс> — PNG блока, GET /healthz — проверка живости.
+
+    У процесса один Chrome, поэтому скриншоты снимаются по одному в отдельном потоке:
+    event loop остаётся свободным для проверок здоровья.
+    """
+
+    def __init__(self, host: str, port: int, screenshot_service: DashboardScreenshotService):
+        self._host = host
+        self._port = port
+        self._screenshot_service = screenshot_service
+
+        self._lock = asyncio.Lock()
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle_render(self, request: web.Request) -> web.Response:
+        block = request.query.get("block", "")
+        if not BLOCK_NAME.match(block):
+            return web.json_response({"error": "block: ожидается CSS-класс блока"}, status=400,
+                                     dumps=lambda body: json.dumps(body, ensure_ascii=False))
+
+        async with self._lock:
+            try:
+                png = await asyncio.to_thread(self._screenshot_service.render_png, block)
+            except Exception as e:
+                logger.error("Ошибка при снятии скриншота блока %s: %s", block, e)
+                return web.json_response({"error": str(e)}, status=502,
+                                         dumps=lambda body: json.dumps(body, ensure_ascii=False))
+
+        return web.Response(body=png, content_type="image/png")
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/render", self._handle_render)
+        app.router.add_get("/healthz", self._handle_health)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+
+        logger.info("Рендерер скриншотов доступен на http://%s:%s", self._host, self._port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+        # Дожидаемся текущего скриншота и закрываем Chrome
+        async with self._lock:
+            await asyncio.to_thread(self._screenshot_service.close)
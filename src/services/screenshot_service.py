@@ -1,29 +1,152 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import List
+
+from src.metrics import REGISTRY, record_phase
+
+logger = logging.getLogger(__name__)
+
+RENDER_DURATION = REGISTRY.histogram("screenshot_render_duration_seconds", "Время снятия скриншота блока дашборда", ["block"])
+CHROME_START_DURATION = REGISTRY.histogram("screenshot_chrome_start_seconds", "Время запуска headless Chrome")
 
 
 class DashboardScreenshotService:
+    """
+    Скриншоты блоков дашборда через headless Chrome. Selenium импортируется и Chrome запускается
+    при первом скриншоте или заранее в фоне (warm_up), чтобы не задерживать запуск бота.
+    Драйвер не потокобезопасен: запуск, скриншоты и закрытие идут под одним локом.
+    """
+
     def __init__(self, dashboard_url: str):
         self.dashboard_url = dashboard_url
 
+        self._driver = None
+        self._lock = threading.RLock()
+
+    @property
+    def driver(self):
+        with self._lock:
+            if self._driver is None:
+                self._driver = self._start_driver()
+
+            return self._driver
+
+    @staticmethod
+    def _start_driver():
+        started = time.perf_counter()
+
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
         chrome_options = Options()
         chrome_options.add_argument("--headless")
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--window-size=1920,1080")
 
-        self.driver = webdriver.Chrome(options=chrome_options)
+        driver = webdriver.Chrome(options=chrome_options)
+        CHROME_START_DURATION.observe(time.perf_counter() - started)
+        return driver
+
+    def warm_up(self):
+        """Запускает Chrome в фоновом потоке: первый скриншот не будет ждать его старта."""
+        threading.Thread(target=self._warm_up, name="chrome-warm-up", daemon=True).start()
+
+    def _warm_up(self):
+        try:
+            self.driver
+        except Exception as e:
+            # Следующий скриншот попробует запустить Chrome ещё раз и покажет ошибку администратору
+            logger.error("Не удалось заранее запустить Chrome: %s", e)
+
+    async def screenshot_graph(self, class_name: str, output_path: str):
+        # Selenium блокирующий — в отдельном потоке, чтобы не останавливать event loop бота
+        png = await asyncio.to_thread(self.render_png, class_name)
+        Path(output_path).write_bytes(png)
+
+    def render_png(self, class_name: str) -> bytes:
+        """PNG блока дашборда с CSS-классом class_name (блокирующий вызов Selenium)."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.wait import WebDriverWait
+
+        with self._lock:
+            driver = self.driver
+            started = time.perf_counter()
+
+            try:
+                driver.get(self.dashboard_url)
+
+                element = WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CLASS_NAME, class_name))
+                )
+
+                return element.screenshot_as_png
+            finally:
+                elapsed = time.perf_counter() - started
+                RENDER_DURATION.observe(elapsed, block=class_name)
+                record_phase("render", elapsed)
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None:
+                self._driver.quit()
+                self._driver = None
+
+
+class RemoteScreenshotService:
+    """
+    Тот же интерфейс, что у DashboardScreenshotService, но скриншоты снимают процессы-рендереры
+    (src.services.render_server) по HTTP: Chrome не живёт в процессе бота. Реплики перебираются
+    по кругу, при ошибке запрос уходит следующей.
+    """
+
+    def __init__(self, renderer_urls: List[str], timeout: float = 30):
+        self.renderer_urls = [url.rstrip("/") for url in renderer_urls]
+        self.timeout = timeout
+        self._next = itertools.cycle(range(len(self.renderer_urls)))
 
     async def screenshot_graph(self, class_name: str, output_path: str):
-        self.driver.get(self.dashboard_url)
+        started = time.perf_counter()
+        first = next(self._next)
+        error = None
+
+        try:
+            for shift in range(len(self.renderer_urls)):
+                url = self.renderer_urls[(first + shift) % len(self.renderer_urls)]
+                try:
+                    png = await asyncio.to_thread(self._fetch, url, class_name)
+                except Exception as e:
+                    error = e
+                    continue
+
+                Path(output_path).write_bytes(png)
+                return
+        finally:
+            record_phase("render", time.perf_counter() - started)
+
+        raise RuntimeError(f"Ни один рендерер не снял скриншот блока {class_name}: {error}")
 
-        element = WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, class_name))
+    def _fetch(self, url: str, class_name: str) -> bytes:
+        request = urllib.request.Request(
+            f"{url}/render?block={urllib.parse.quote(class_name)}",
+            method="POST"
         )
 
-        element.screenshot(output_path)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b"{}").get("error", e.reason)
+            raise RuntimeError(f"{url}: {e.code} {message}") from None
 
     def close(self):
-        self.driver.quit()
+        # Соединения открываются на каждый запрос — закрывать нечего
+        pass
@@ -0,0 +1 @@
+from src.supervisor.supervisor import Component, Supervisor, create_supervisor
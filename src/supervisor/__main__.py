@@ -0,0 +1,4 @@
+from src.supervisor.supervisor import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Точки входа процессов под супервизором. Каждая функция запускается в отдельном процессе (spawn),
+сама читает настройки из .env и корректно завершается по SIGTERM/SIGINT.
+"""
+import asyncio
+import logging
+import signal
+import sys
+from typing import List
+
+from src.config import Settings
+from src.events import CASE_RESOLVED, EVENTS, EventForwarder
+from src.repositories import Database, Repositories, create_shard_router, ensure_schema
+
+
+def local_url(host, port: int) -> str:
+    # Сервер, слушающий все интерфейсы, доступен с этой же машины по loopback
+    if not host or host in ('0.0.0.0', '::'):
+        host = '127.0.0.1'
+
+    return f"http://{host}:{port}"
+
+
+def dashboard_port(settings: Settings, index: int) -> int:
+    return int(settings.dash_port or 8050) + index
+
+
+def dashboard_urls(settings: Settings) -> List[str]:
+    return [local_url(settings.dash_host, dashboard_port(settings, i)) for i in range(settings.dash_replicas)]
+
+
+def renderer_urls(settings: Settings) -> List[str]:
+    return [local_url(settings.renderer_host, settings.renderer_port + i) for i in range(settings.renderer_replicas)]
+
+
+def setup_logging(name: str, index: int):
+    logging.basicConfig(level=logging.INFO,
+                        format=f"%(asctime)s %(levelname)s [{name}-{index}] %(name)s: %(message)s")
+
+#
+
+def run_bot(index: int):
+    setup_logging("bot", index)
+    asyncio.run(bot_main(Settings()))
+
+
+async def bot_main(settings: Settings):
+    # Импорт здесь: процессам дашборда и рендерера aiogram не нужен
+    from src.services import MetricsServer, RemoteScreenshotService
+    from src.telegram.tg_app import TelegramApp
+
+    database = Database(settings)
+    repositories = Repositories(database, create_shard_router(settings, database))
+
+    await database.open_pool()
+    await repositories.shards.open_pool()
+
+    # Обычно один запрос к schema_version; DDL — только если схема отстала от кода
+    await ensure_schema(repositories)
+
+    # Chrome живёт в процессах-рендерерах; завершённые кейсы пересылаются в шины реплик дашборда
+    screenshot_service = RemoteScreenshotService(renderer_urls(settings))
+    forwarder = EventForwarder(dashboard_urls(settings), topics=(CASE_RESOLVED,), token=settings.events_token)
+    EVENTS.add_handler(forwarder)
+    forwarder.start()
+
+    metrics_server = None
+    if settings.metrics_port:
+        metrics_server = MetricsServer(settings.metrics_host, int(settings.metrics_port))
+        await metrics_server.start()
+
+    try:
+        # aiogram сам останавливает пуллинг по SIGTERM/SIGINT и закрывает сессию бота
+        await TelegramApp(repositories, screenshot_service, settings).start()
+    finally:
+        if metrics_server is not None:
+            await metrics_server.stop()
+
+        forwarder.close()
+        screenshot_service.close()
+        await repositories.shards.close()
+        await database.close()
+
+#
+
+def run_dashboard(index: int):
+    setup_logging("dashboard", index)
+    settings = Settings()
+
+    # Dev-сервер Flask не обрабатывает SIGTERM: выход через SystemExit, чтобы отработали atexit-обработчики
+    # (пул процессов расчётов и его общая память)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    from src.dashboard.dash_app import init_dashboard
+
+    # Дашборд подключается к БД без пула — закрывать при остановке нечего
+    database = Database(settings)
+    init_dashboard(Repositories(database, create_shard_router(settings, database)), settings,
+                   port=dashboard_port(settings, index))
+
+#
+
+def run_renderer(index: int):
+    setup_logging("renderer", index)
+    asyncio.run(renderer_main(Settings(), index))
+
+
+async def renderer_main(settings: Settings, index: int):
+    from src.services import DashboardScreenshotService, RenderServer
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    screenshot_service = DashboardScreenshotService(settings.dashboard_url)
+    if settings.screenshot_warmup:
+        screenshot_service.warm_up()
+
+    server = RenderServer(settings.renderer_host, settings.renderer_port + index, screenshot_service)
+    await server.start()
+
+    try:
+        await stop.wait()
+    finally:
+        await server.stop()
@@ -0,0 +1,209 @@
+"""
+Супервизор процессов: бот, реплики дашборда и рендереры скриншотов в отдельных процессах.
+
+    python -m src.supervisor
+
+Упавший процесс перезапускается с экспоненциальной задержкой; процесс, который не отвечает на
+проверку здоровья (GET /healthz) HEALTH_CHECK_FAILURES раз подряд, останавливается и запускается
+заново. По SIGTERM/SIGINT сначала останавливается бот (перестают приходить запросы к дашборду и
+рендерерам), затем остальные; через SHUTDOWN_TIMEOUT секунд оставшиеся процессы убиваются.
+"""
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import urllib.request
+from typing import Callable, List, Optional
+
+from src.config import Settings
+from src.supervisor.components import dashboard_urls, local_url, renderer_urls, run_bot, run_dashboard, \
+    run_renderer
+
+logger = logging.getLogger(__name__)
+
+# Процессу даётся время подняться (Chrome, подключение к БД), прежде чем его начнут проверять
+STARTUP_GRACE = 60
+# Процесс, проживший дольше, считается стабильным: задержка перезапуска сбрасывается
+STABLE_AFTER = 60
+MAX_RESTART_DELAY = 60
+
+
+class Component:
+    """Тип процесса: точка входа target(index), число реплик, адрес проверки здоровья реплики и очередь остановки."""
+
+    __slots__ = ("name", "target", "replicas", "health_url", "stop_order")
+
+    def __init__(self, name: str, target: Callable[[int], None], replicas: int = 1,
+                 health_url: Optional[Callable[[int], Optional[str]]] = None, stop_order: int = 1):
+        self.name = name
+        self.target = target
+        self.replicas = replicas
+        self.health_url = health_url
+        self.stop_order = stop_order
+
+
+class Replica:
+    __slots__ = ("component", "index", "process", "started_at", "checked_at", "failures", "restarts", "restart_at")
+
+    def __init__(self, component: Component, index: int):
+        self.component = component
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.checked_at = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.restart_at = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.component.name}-{self.index}"
+
+    @property
+    def health_url(self) -> Optional[str]:
+        return self.component.health_url(self.index) if self.component.health_url else None
+
+
+class Supervisor:
+    def __init__(self, components: List[Component], health_interval: float = 10, max_failures: int = 3,
+                 shutdown_timeout: float = 20):
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.shutdown_timeout = shutdown_timeout
+
+        self._replicas = [Replica(component, i) for component in components for i in range(component.replicas)]
+        # spawn: у дочернего процесса чистое состояние, а дашборд сам запускает пул процессов расчётов
+        self._context = multiprocessing.get_context('spawn')
+        self._stopping = threading.Event()
+
+    def run(self):
+        """Запускает все реплики и следит за ними до SIGTERM/SIGINT."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self._stopping.set())
+
+        for replica in self._replicas:
+            self._start(replica)
+
+        try:
+            while not self._stopping.wait(1):
+                for replica in self._replicas:
+                    self._watch(replica)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stopping.set()
+
+    def shutdown(self):
+        for order in sorted({replica.component.stop_order for replica in self._replicas}):
+            self._terminate([replica for replica in self._replicas if replica.component.stop_order == order])
+
+    def _start(self, replica: Replica):
+        replica.process = self._context.Process(target=replica.component.target, args=(replica.index,),
+                                                name=replica.name)
+        replica.process.start()
+
+        replica.started_at = replica.checked_at = time.monotonic()
+        replica.failures = 0
+        logger.info("Запущен %s (pid %s)", replica.name, replica.process.pid)
+
+    def _watch(self, replica: Replica):
+        now = time.monotonic()
+        process = replica.process
+
+        if process is None:
+            if now >= replica.restart_at:
+                self._start(replica)
+            return
+
+        if not process.is_alive():
+            logger.error("%s завершился с кодом %s", replica.name, process.exitcode)
+            self._schedule_restart(replica)
+            return
+
+        url = replica.health_url
+        if (url is None or now - replica.started_at < STARTUP_GRACE
+                or now - replica.checked_at < self.health_interval):
+            return
+
+        replica.checked_at = now
+        if self._healthy(url):
+            replica.failures = 0
+            return
+
+        replica.failures += 1
+        logger.warning("%s не ответил на проверку здоровья (%d/%d)", replica.name, replica.failures,
+                       self.max_failures)
+
+        if replica.failures >= self.max_failures:
+            logger.error("%s перезапускается: не отвечает на %s", replica.name, url)
+            self._terminate([replica])
+            self._schedule_restart(replica)
+
+    def _schedule_restart(self, replica: Replica):
+        now = time.monotonic()
+        if now - replica.started_at >= STABLE_AFTER:
+            replica.restarts = 0
+
+        delay = min(2 ** replica.restarts, MAX_RESTART_DELAY)
+        replica.restarts += 1
+        replica.restart_at = now + delay
+        replica.process = None
+
+        logger.info("%s будет перезапущен через %d с", replica.name, delay)
+
+    def _healthy(self, url: str) -> bool:
+        try:
+            with urllib.request.urlopen(url, timeout=min(self.health_interval, 5)) as response:
+                return response.status == 200
+        except Exception:
+            return False
+
+    def _terminate(self, replicas: List[Replica]):
+        """SIGTERM всем процессам группы, ожидание корректного выхода, затем SIGKILL оставшимся."""
+        processes = [(replica, replica.process) for replica in replicas
+                     if replica.process is not None and replica.process.is_alive()]
+
+        for replica, process in processes:
+            logger.info("Останавливаю %s", replica.name)
+            process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for replica, process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.error("%s не остановился за %.0f с, завершаю принудительно", replica.name,
+                             self.shutdown_timeout)
+                process.kill()
+                process.join()
+
+
+def create_supervisor(settings: Settings) -> Supervisor:
+    bot_health = None
+    if settings.metrics_port:
+        bot_health = lambda index: local_url(settings.metrics_host, int(settings.metrics_port)) + "/healthz"
+
+    dashboards = dashboard_urls(settings)
+    renderers = renderer_urls(settings)
+
+    components = [
+        # Long polling допускает только одного получателя обновлений — бот всегда в одном экземпляре
+        Component("bot", run_bot, 1, bot_health, stop_order=0),
+        Component("dashboard", run_dashboard, settings.dash_replicas,
+                  lambda index: dashboards[index] + "/healthz"),
+        Component("renderer", run_renderer, settings.renderer_replicas,
+                  lambda index: renderers[index] + "/healthz"),
+    ]
+
+    return Supervisor(
+        [component for component in components if component.replicas > 0],
+        health_interval=settings.health_check_interval,
+        max_failures=settings.health_check_failures,
+        shutdown_timeout=settings.shutdown_timeout,
+    )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [supervisor] %(name)s: %(message)s")
+    create_supervisor(Settings()).run()
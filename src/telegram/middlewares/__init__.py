@@ -1,3 +1,5 @@
+from src.telegram.middlewares.offer_selector_middleware import OfferSelectorMiddleware
 from src.telegram.middlewares.repo_middleware import RepoMiddleware
 from src.telegram.middlewares.screenshot_middleware import DashboardScreenshotMiddleware
+from src.telegram.middlewares.timing_middleware import TimingMiddleware, TelegramRequestTimingMiddleware
 from src.telegram.middlewares.user_middleware import UserMiddleware
@@ -0,0 +1,20 @@
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import types
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+
+from src.services import OfferSelector
+
+
+class OfferSelectorMiddleware(BaseMiddleware):
+    def __init__(self, offer_selector: OfferSelector):
+        self._offer_selector = offer_selector
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["offer_selector"] = self._offer_selector
+        return await handler(event, data)
\ No newline at end of file
@@ -0,0 +1,83 @@
+import time
+from typing import Callable, Dict, Any, Awaitable
+
+from aiogram import types, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.methods import TelegramMethod, Response
+
+from src.metrics import REGISTRY, HandlerTrace, current_trace, record_phase
+
+HANDLER_DURATION = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Время обработки апдейта бота по фазам", ["handler", "phase"]
+)
+HANDLER_LATENCY = REGISTRY.summary(
+    "bot_handler_latency_seconds", "p50/p95/p99 времени обработки апдейта по последним вызовам", ["handler", "phase"]
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Апдейты, обработка которых завершилась исключением", ["handler"]
+)
+
+
+class TimingMiddleware(BaseMiddleware):
+    """
+    Замеряет время обработки апдейта и раскладывает его на БД, Telegram API, рендер и остальное.
+
+    Подключается дважды: как outer middleware раньше остальных (замеряет весь апдейт, включая
+    загрузку пользователя) и как inner middleware (узнаёт, какой обработчик сработал).
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: types.TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        trace = current_trace.get()
+
+        # Inner-вызов: aiogram кладёт в data выбранный обработчик
+        handler_object = data.get("handler")
+        if trace is not None and handler_object is not None:
+            trace.handler = getattr(handler_object.callback, "__name__", "unknown")
+            return await handler(event, data)
+
+        trace = HandlerTrace()
+        token = current_trace.set(trace)
+        started = time.perf_counter()
+
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=trace.handler or "unhandled")
+            raise
+        finally:
+            current_trace.reset(token)
+            self._record(trace, time.perf_counter() - started)
+
+    @staticmethod
+    def _record(trace: HandlerTrace, total: float):
+        name = trace.handler or "unhandled"
+
+        phases = dict(trace.phases)
+        phases["other"] = max(total - sum(phases.values()), 0.0)
+        phases["total"] = total
+
+        for phase, seconds in phases.items():
+            HANDLER_DURATION.observe(seconds, handler=name, phase=phase)
+            HANDLER_LATENCY.observe(seconds, handler=name, phase=phase)
+
+
+class TelegramRequestTimingMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время запросов к Telegram API попадает в фазу telegram текущего апдейта."""
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType,
+            bot: Bot,
+            method: TelegramMethod
+    ) -> Response:
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            record_phase("telegram", time.perf_counter() - started)
@@ -1,4 +1,5 @@
 import datetime
+import tempfile
 from pathlib import Path
 from typing import List, Dict, Any
 
@@ -8,9 +9,11 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, FSInputFile
 
+from src.events import EVENTS, CASE_RESOLVED, OFFERS_CHANGED
 from src.models import Contract, Offer
 from src.repositories import Repositories
-from src.services import DashboardScreenshotService
+from src.repositories.contract_risk_repository import HORIZON_MONTHS
+from src.services import DashboardScreenshotService, ExportService, EXPORT_FORMATS, EXPORT_ENTITIES
 
 PAGE_SIZE = 10
 
@@ -84,9 +87,11 @@ def admin_main_menu() -> InlineKeyboardMarkup:
         ],
         [
             InlineKeyboardButton(text="🛑 Кейсы удержания", callback_data="retention:list:1"),
+            InlineKeyboardButton(text="⚠️ Риск оттока", callback_data="risk:list"),
         ],
         [
             InlineKeyboardButton(text="📊 Статистика", callback_data="stats"),
+            InlineKeyboardButton(text="📤 Экспорт", callback_data="export"),
         ]
     ])
 
@@ -102,6 +107,33 @@ def stats_keyboard():
         [InlineKeyboardButton(text="🌐 Открыть дашборд", callback_data="stat:open-dashboard")],
     ])
 
+def export_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📄 Контракты CSV", callback_data="export:contracts:csv"),
+         InlineKeyboardButton(text="📄 Контракты Parquet", callback_data="export:contracts:parquet")],
+        [InlineKeyboardButton(text="🛑 Кейсы CSV", callback_data="export:cases:csv"),
+         InlineKeyboardButton(text="🛑 Кейсы Parquet", callback_data="export:cases:parquet")],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_back")],
+    ])
+
+def risk_page_keyboard(rows, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
+    kb_rows = [
+        [InlineKeyboardButton(text=f"{contract_id} | {score:.0%}", callback_data=f"entity:open:contract:{contract_id}")]
+        for contract_id, score, *_ in rows
+    ]
+
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(text="⬅️", callback_data="risk:prev"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="➡️", callback_data="risk:next"))
+    if nav:
+        kb_rows.append(nav)
+
+    kb_rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="admin_back")])
+    return InlineKeyboardMarkup(inline_keyboard=kb_rows)
+
+
 def list_entities_keyboard(entity_type: str, items: List[Dict[str, Any]], page: int, total_pages: int) -> InlineKeyboardMarkup:
     kb_rows = []
     # кнопки для каждого элемента (кнопка текст = PK value)
@@ -214,7 +246,7 @@ def create_admin_router() -> Router:
             await callback.answer("Неизвестная сущность", show_alert=True)
             return
 
-        async with repos.database:
+        async with repos.database.replica():
             if entity_type == "contract":
                 all_items = await repos.contracts.get_all()
             else:
@@ -330,8 +362,12 @@ def create_admin_router() -> Router:
             # Сохраняем через репозиторий
             if entity_type == "contract":
                 await repos.contracts.update(ent)
+                if field == "monthly_profit":
+                    # Доход контракта входит в агрегат дашборда за все месяцы его кейсов
+                    await repos.cases.mark_changed(ent.contract_id)
             else:  # offer
                 await repos.offers.update(ent)
+                EVENTS.publish(OFFERS_CHANGED, {'offer_id': ent.offer_id})
 
         await message.answer("✔ Поле обновлено.")
 
@@ -363,6 +399,7 @@ def create_admin_router() -> Router:
                 await repos.contracts.remove(int(entity_id))
             else:
                 await repos.offers.remove(int(entity_id))
+                EVENTS.publish(OFFERS_CHANGED, {'offer_id': int(entity_id)})
 
         await callback.message.edit_text("🗑 Удалено.")
         await state.set_state(AdminStates.MAIN_MENU)
@@ -459,6 +496,7 @@ def create_admin_router() -> Router:
                     float(collected.get("cost", 0.0))
                 )
                 await repos.offers.insert(new_offer)
+                EVENTS.publish(OFFERS_CHANGED)
                 await message.answer("✔ Оффер создан.")
 
         await state.set_state(AdminStates.MAIN_MENU)
@@ -470,7 +508,7 @@ def create_admin_router() -> Router:
         _, _, page_str = callback.data.split(":")
         page = int(page_str)
 
-        async with repos.database:
+        async with repos.database.replica():
             cases = await repos.cases.get_all_escalated()
 
         if not cases:
@@ -516,14 +554,14 @@ def create_admin_router() -> Router:
         _, _, cid = callback.data.split(":")
 
         async with repos.database:
-            case = await repos.cases.get_one(cid)
+            case = await repos.cases.get_one(cid, data.get("current_retention_contract"))
             if not case:
                 await callback.answer("Кейс не найден", show_alert=True)
                 return
 
             contract = await repos.contracts.get_one(case.contract_id)
 
-        await state.update_data(current_retention_id=cid)
+        await state.update_data(current_retention_id=cid, current_retention_contract=case.contract_id)
 
         # Текст максимально подробный
         text = (
@@ -580,6 +618,8 @@ def create_admin_router() -> Router:
             case.status = "retained" if decision == "stay" else "churned"
             await repos.cases.update(case)
 
+            EVENTS.publish(CASE_RESOLVED, {'case_id': case.case_id, 'status': case.status})
+
             if decision == 'left':
                 contract = await repos.contracts.get_one(case.contract_id)
                 contract.active = False
@@ -623,4 +663,95 @@ def create_admin_router() -> Router:
             print("Ошибка при получении скриншота", e)
             await callback.message.answer(f"Ошибка при получении скриншота")
 
+    # Контракты с наибольшим риском оттока (таблица contract_risk, python -m src.cli.churn_risk):
+    # risk:list — первая страница, risk:next / risk:prev — соседние. В состоянии хранится стек курсоров
+    # (risk_score, contract_id) начала каждой открытой страницы, страница читается по индексу без OFFSET
+    @r.callback_query(F.data.startswith("risk:"))
+    async def risk_list(callback: CallbackQuery, state: FSMContext, repos: Repositories):
+        action = callback.data.split(":")[1]
+        data = await state.get_data()
+
+        cursors = data.get("risk_cursors") or [None]
+        if action == "list":
+            cursors = [None]
+        elif action == "next" and data.get("risk_next"):
+            cursors = cursors + [data["risk_next"]]
+        elif action == "prev" and len(cursors) > 1:
+            cursors = cursors[:-1]
+
+        async with repos.database.replica():
+            if action == "list":
+                total, scored_at = await repos.risks.count()
+                await state.update_data(risk_total=total, risk_scored_at=str(scored_at) if scored_at else None)
+                data = await state.get_data()
+
+            rows = await repos.risks.get_top(PAGE_SIZE + 1, cursors[-1])
+
+        if not rows:
+            await callback.message.edit_text(
+                "Оценок риска оттока нет. Запустите `python -m src.cli.churn_risk`.",
+                reply_markup=risk_page_keyboard([], False, False)
+            )
+            return
+
+        has_next = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+        last_id, last_score = rows[-1][0], rows[-1][1]
+        await state.update_data(risk_cursors=cursors, risk_next=[last_score, last_id] if has_next else None)
+
+        lines = [
+            f"`{contract_id}` — *{score:.1%}*, кейсов: {previous_cases}"
+            + (f", последний {months_since_case} мес. назад" if months_since_case is not None else "")
+            for contract_id, score, previous_cases, months_since_case, _ in rows
+        ]
+
+        await callback.message.edit_text(
+            f"*⚠️ Риск оттока — страница {len(cursors)}*\n"
+            f"Вероятность обращения или ухода за {HORIZON_MONTHS} мес.\n"
+            f"Активных контрактов с оценкой: {data.get('risk_total')}, расчёт от {data.get('risk_scored_at')}\n\n"
+            + "\n".join(lines),
+            reply_markup=risk_page_keyboard(rows, len(cursors) > 1, has_next)
+        )
+
+    @r.callback_query(F.data == 'export')
+    async def admin_export(callback: CallbackQuery, state: FSMContext):
+        await callback.message.edit_text(
+            "Выберите, что выгрузить:",
+            reply_markup=export_keyboard()
+        )
+
+    # Выгрузка: export:<contracts|cases>:<csv|parquet>
+    @r.callback_query(F.data.startswith("export:"))
+    async def export_selected(callback: CallbackQuery, state: FSMContext, repos: Repositories):
+        try:
+            _, entity, fmt = callback.data.split(":")
+        except Exception:
+            await callback.answer("Неверный формат", show_alert=True)
+            return
+
+        if entity not in EXPORT_ENTITIES or fmt not in EXPORT_FORMATS:
+            await callback.answer("Неизвестная выгрузка", show_alert=True)
+            return
+
+        await callback.answer()
+        await callback.message.edit_text("⏳ Выгружаю, подождите...")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = Path(tmp_dir) / f"{entity}.{fmt}"
+
+            try:
+                async with repos.database.replica():
+                    written = await ExportService(repos).export(entity, fmt, output_path)
+
+                await callback.message.answer_document(
+                    FSInputFile(output_path),
+                    caption=f"Выгружено строк: {written}"
+                )
+
+            except Exception as e:
+                print("Ошибка при выгрузке", e)
+                await callback.message.answer("Ошибка при выгрузке")
+
+        await callback.message.answer("Главное меню:", reply_markup=admin_main_menu())
+
     return r
@@ -8,8 +8,10 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, \
     CallbackQuery
 
+from src.events import EVENTS, CASE_RESOLVED
 from src.models import RetentionCase
 from src.repositories import Repositories
+from src.services import OfferSelector
 
 
 class States(StatesGroup):
@@ -88,21 +90,23 @@ def create_client_router():
     # Ввод причины отказа от услуг
 
     @r.message(States.WAITING_FOR_REASON)
-    async def process_reason(message: Message, state: FSMContext, repos: Repositories):
+    async def process_reason(message: Message, state: FSMContext, repos: Repositories, offer_selector: OfferSelector):
         reason = message.text
 
-        await create_case_and_send_offer(message, state, repos, reason)
+        await create_case_and_send_offer(message, state, repos, offer_selector, reason)
 
     @r.callback_query(F.data == 'skip_reason')
-    async def skip_reason(callback: CallbackQuery, state: FSMContext, repos: Repositories):
+    async def skip_reason(callback: CallbackQuery, state: FSMContext, repos: Repositories,
+                          offer_selector: OfferSelector):
         await callback.message.edit_text(
             f"{callback.message.text}\n\n*Причина: не указана*",
             reply_markup=None
         )
 
-        await create_case_and_send_offer(callback.message, state, repos, "Не указано (через бота)")
+        await create_case_and_send_offer(callback.message, state, repos, offer_selector, "Не указано (через бота)")
 
-    async def create_case_and_send_offer(message: Message, state: FSMContext, repos: Repositories, reason):
+    async def create_case_and_send_offer(message: Message, state: FSMContext, repos: Repositories,
+                                         offer_selector: OfferSelector, reason):
         async with repos.database:
             contract_id = (await state.get_data()).get("contract_id")
 
@@ -117,11 +121,12 @@ def create_client_router():
                 await message.answer("Ваш контракт не найден, попробуйте ещё раз")
                 return
 
-            # Подбираем предложение для клиента
-            offers = await repos.offers.get_suitable_offers(contract.monthly_profit)
+            # Подбираем предложение для клиента: среди офферов с подходящим порогом — с наибольшей
+            # ожидаемой чистой прибылью по истории исходов кейсов
+            offer = await offer_selector.select(contract.monthly_profit) if contract.can_be_retained else None
 
-            # Доступных офферов нет или запрет на удержание, кейс можно сразу закрыть как "клиент ушел"
-            if not offers or not contract.can_be_retained:
+            # Доступных или окупающихся офферов нет либо запрет на удержание, кейс можно сразу закрыть как "клиент ушел"
+            if offer is None:
                 await state.clear()
 
                 case = RetentionCase(
@@ -143,9 +148,6 @@ def create_client_router():
                 await message.answer("Ваш договор отозван")
                 return
 
-            # С помощью рандома выберем случайный оффер если их несколько
-            offer = choice(offers)
-
             case_id = await repos.cases.insert(RetentionCase(
                 0,
                 contract_id,
@@ -175,14 +177,16 @@ def create_client_router():
     @r.callback_query(States.OFFER_DECISION)
     async def process_offer_decision(callback: CallbackQuery, state: FSMContext, repos: Repositories):
         async with repos.database:
-            case_id = (await state.get_data()).get("case_id")
+            data = await state.get_data()
+            case_id = data.get("case_id")
             await state.clear()
 
             if not case_id:
                 await callback.message.answer("Ошибка сессии. Начните с команды /start")
                 return
 
-            case = await repos.cases.get_one(case_id)
+            # contract_id из состояния направляет запрос на шард контракта
+            case = await repos.cases.get_one(case_id, data.get("contract_id"))
             if not case:
                 await callback.message.answer("Ваш кейс не найден, попробуйте ещё раз")
                 return
@@ -245,4 +249,8 @@ def create_client_router():
 
             await repos.cases.update(case)
 
+            if case.status in ('retained', 'churned'):
+                # Открытые дашборды получат обновление через SSE
+                EVENTS.publish(CASE_RESOLVED, {'case_id': case.case_id, 'status': case.status})
+
     return r
\ No newline at end of file
@@ -1,12 +1,17 @@
+from typing import Optional
+
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
 from aiogram.enums import ParseMode
 
 from src.config import Settings
+from src.events import EVENTS, OFFERS_CHANGED, Event
 from src.repositories import Repositories
-from src.services import DashboardScreenshotService
+from src.services import DashboardScreenshotService, OfferSelector
 from src.telegram.filters import RoleFilter
-from src.telegram.middlewares import RepoMiddleware, UserMiddleware, DashboardScreenshotMiddleware
+from src.telegram.middlewares import RepoMiddleware, UserMiddleware, DashboardScreenshotMiddleware, TimingMiddleware, \
+    TelegramRequestTimingMiddleware, OfferSelectorMiddleware
 from src.telegram.router import create_admin_router, create_client_router
 
 
@@ -16,16 +21,43 @@ class TelegramApp:
         self._screenshot_service = screenshot_service
         self._settings = settings
 
-    async def start(self):
-        # Инициализация бота
-        bot = Bot(token=self._settings.telegram_bot_token, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN))
+        # Таблица выбора офферов общая для всех апдейтов; правки офферов в админке сбрасывают её через шину событий
+        self._offer_selector = OfferSelector(repositories, settings.offer_table_refresh, settings.offer_exploration)
+        EVENTS.add_handler(self._on_event)
+
+    def _on_event(self, event: Event):
+        if event.topic == OFFERS_CHANGED:
+            self._offer_selector.invalidate()
+
+    def create_bot(self, session: Optional[BaseSession] = None) -> Bot:
+        bot = Bot(
+            token=self._settings.telegram_bot_token,
+            session=session,
+            default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
+        )
+
+        # Время запросов к Telegram API учитывается в трассе текущего апдейта
+        bot.session.middleware(TelegramRequestTimingMiddleware())
+
+        return bot
+
+    def create_dispatcher(self) -> Dispatcher:
         dp = Dispatcher()
 
         # Создание middleware
+        timing_middleware = TimingMiddleware()
         repo_middleware = RepoMiddleware(self._repos)
         screenshot_middleware = DashboardScreenshotMiddleware(self._screenshot_service)
+        offer_selector_middleware = OfferSelectorMiddleware(self._offer_selector)
         user_middleware = UserMiddleware()
 
+        # Подключение TimingMiddleware первым, чтобы замер охватывал всю обработку апдейта,
+        # и inner-middleware, чтобы узнать имя сработавшего обработчика
+        dp.message.outer_middleware(timing_middleware)
+        dp.callback_query.outer_middleware(timing_middleware)
+        dp.message.middleware(timing_middleware)
+        dp.callback_query.middleware(timing_middleware)
+
         # Подключение RepoMiddleware для инжекта repositories
         dp.message.outer_middleware(repo_middleware)
         dp.callback_query.outer_middleware(repo_middleware)
@@ -34,6 +66,10 @@ class TelegramApp:
         dp.message.outer_middleware(screenshot_middleware)
         dp.callback_query.outer_middleware(screenshot_middleware)
 
+        # Подключение OfferSelectorMiddleware для инжекта OfferSelector
+        dp.message.outer_middleware(offer_selector_middleware)
+        dp.callback_query.outer_middleware(offer_selector_middleware)
+
         # Подключение UserMiddleware для инжекта информации о пользователе
         dp.message.outer_middleware(user_middleware)
         dp.callback_query.outer_middleware(user_middleware)
@@ -57,6 +93,13 @@ class TelegramApp:
         dp.include_router(admin_router)
         dp.include_router(client_router)
 
+        return dp
+
+    async def start(self):
+        # Инициализация бота
+        bot = self.create_bot()
+        dp = self.create_dispatcher()
+
         try:
             print("Запускаю пуллинг...")
             await dp.start_polling(bot)